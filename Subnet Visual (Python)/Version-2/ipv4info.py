@@ -1,6 +1,7 @@
 from enum import IntEnum, unique
 import socket
 import struct
+from collections import OrderedDict
 from dataclasses import dataclass
 
 @unique
@@ -36,31 +37,89 @@ class MaskType(IntEnum):
     WILDCARD = 3
 
 
+class _LazySlot:
+    '''
+    Read only attribute computed the first time it is accessed and then cached in the
+    "_<name>" slot of the instance, like functools.cached_property but for __slots__ classes
+    '''
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.func(instance)
+            setattr(instance, self.slot, value)
+            return value
+
+
 class IPv4Address:
+    '''
+    Only the 32-bit integer is stored when an address is created. The other representations
+    are computed on first access and cached in their slot
+    '''
+    __slots__ = ('long', 'subnets', '_packed', '_ip_address', '_binary_quad', '_binary_bits',
+                 '_decimal_octets', '_hex_octets', '_ip_class', '_is_private')
+
     def __init__(self, packed_ip):
-        self.packed = packed_ip
-        self.ip_address = '.'.join(map(str, self.packed))
-        self.long = struct.unpack('!I', self.packed)[0]
-        self.binary_quad = '.'.join(bin(byte)[2:].zfill(8) for byte in self.packed)
-        self.binary_bits = tuple(b for b in ''.join(bin(byte)[2:].zfill(8) for byte in self.packed))
-        self.decimal_octets = tuple(str(int(byte)) for byte in self.packed)
-        self.hex_octets = tuple((hex(byte)[2:].zfill(2)).upper() for byte in self.packed)
+        self.long = int.from_bytes(packed_ip, 'big')
+        self.subnets = None
 
+    @classmethod
+    def from_long(cls, long: int):
+        ip = cls.__new__(cls)
+        ip.long = long
+        ip.subnets = None
+        return ip
+
+    @_LazySlot
+    def packed(self):
+        return self.long.to_bytes(4, 'big')
+
+    @_LazySlot
+    def ip_address(self):
+        return '.'.join(self.decimal_octets)
+
+    @_LazySlot
+    def binary_quad(self):
+        return Octets.quad(self.long, Octets.BINARY)
+
+    @_LazySlot
+    def binary_bits(self):
+        return tuple(Octets.quad(self.long, Octets.BINARY, ''))
+
+    @_LazySlot
+    def decimal_octets(self):
+        return Octets.split(self.long, Octets.DECIMAL)
+
+    @_LazySlot
+    def hex_octets(self):
+        return Octets.split(self.long, Octets.HEX)
+
+    @_LazySlot
+    def ip_class(self):
         # https://en.wikipedia.org/wiki/Classful_network
-        self.ip_class = 'A' if self.binary_quad[0] == '0' else \
-                        'B' if self.binary_quad[0:2] == '10' else \
-                        'C' if self.binary_quad[0:3] == '110' else\
-                        'D' if self.binary_quad[0:4] == '1110' else\
-                        'E' if self.binary_quad[0:4] == '1111' else \
-                        'Unknown'
-        
+        first_octet = self.long >> 24
+        return 'A' if first_octet < 128 else \
+               'B' if first_octet < 192 else \
+               'C' if first_octet < 224 else \
+               'D' if first_octet < 240 else \
+               'E'
+
+    @_LazySlot
+    def is_private(self):
         # 10.0.0.0/8 or 172.16.0.0/12 or 192.168.0.0/16
         # https://www.arin.net/reference/research/statistics/address_filters/
-        self.is_private = (self.long & 4278190080) == 167772160 or \
-                          (self.long & 4293918720) == 2886729728 or \
-                          (self.long & 4294901760) == 3232235520
-
-        self.subnets = None
+        return (self.long & 4278190080) == 167772160 or \
+               (self.long & 4293918720) == 2886729728 or \
+               (self.long & 4294901760) == 3232235520
     
     
 class Masks:
@@ -71,6 +130,24 @@ class Masks:
     BITMAPS = tuple(['N'] * prefix_length + ['H'] * (32 - prefix_length) for prefix_length in range(33))
 
 
+class Octets:
+    '''
+    The text of every octet value in each format, so an address is formatted with four lookups
+    '''
+    DECIMAL = tuple(str(value) for value in range(256))
+    HEX = tuple(format(value, '02X') for value in range(256))
+    BINARY = tuple(format(value, '08b') for value in range(256))
+    OCTAL = tuple(format(value, 'o') for value in range(256))
+
+    @classmethod
+    def split(cls, long: int, table: tuple) -> tuple:
+        return (table[long >> 24], table[(long >> 16) & 0xFF], table[(long >> 8) & 0xFF], table[long & 0xFF])
+
+    @classmethod
+    def quad(cls, long: int, table: tuple, separator: str = '.') -> str:
+        return separator.join(cls.split(long, table))
+
+
 class Subnets:
     TOTAL = tuple(1 << (32 - prefix_length) for prefix_length in range(33))
     USABLE_HOSTS = tuple(t - 2 if t > 2 else 0 for t in TOTAL)
@@ -113,19 +190,90 @@ class IPv4Summary:
     usable_ips: int
 
 
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+    pinned: int
+
+
+class LRUCache:
+    '''
+    Dictionary bounded to max_size entries which evicts the least recently used entry when full.
+    Pinned entries are kept outside of the bound and are never evicted.
+
+    Membership tests and get() count as lookups for the hit/miss counters and mark the entry as
+    recently used, since IPv4Info always checks "in" before reading or creating an entry
+    '''
+    def __init__(self, max_size: int):
+        assert(max_size > 0)
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def pin(self, key, value):
+        self._entries.pop(key, None)
+        self._pinned[key] = value
+
+    def __contains__(self, key):
+        if key in self._pinned:
+            self.hits += 1
+            return True
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __getitem__(self, key):
+        if key in self._pinned:
+            return self._pinned[key]
+        value = self._entries[key]
+        self._entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._pinned:
+            self._pinned[key] = value
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._pinned) + len(self._entries)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self.max_size, len(self._pinned))
+
+
 class IPv4Info:
-    def __init__(self):
-        self.ip_addresses = {}
-        self.subnets = {}
+    def __init__(self, max_addresses: int = 4096, max_subnets: int = 1024):
+        self.ip_addresses = LRUCache(max_addresses)
+        self.subnets = LRUCache(max_subnets)
 
+        # The netmasks and wildcards are needed for every lookup so they are pinned in the cache
         for cidr in range(33):
             n = Masks.NETMASKS[cidr]
             w = Masks.WILDCARDS[cidr]
-            self.ip_addresses[n] = IPv4Address(socket.inet_pton(socket.AF_INET, n))
+            self.ip_addresses.pin(n, IPv4Address(socket.inet_pton(socket.AF_INET, n)))
 
             # Avoid constructing an object for duplicative addresses
             if w not in ['0.0.0.0', '255.255.255.255']:
-                self.ip_addresses[w] = IPv4Address(socket.inet_pton(socket.AF_INET, w))
+                self.ip_addresses.pin(w, IPv4Address(socket.inet_pton(socket.AF_INET, w)))
 
     @classmethod
     def strip_ip_quad_leading_zeros(cls, ip_quad: str):
@@ -192,60 +340,85 @@ class IPv4Info:
         info = None
 
         if ip_err == ErrorMsg.SUCCESS and mask_err == ErrorMsg.SUCCESS:
-            self._populate_subnet_info(ip_address)
+            # Keep a reference since populating the subnets can evict the address from the cache
+            ip = self._get_address(ip_address)
+            self._populate_subnet_info(ip)
             # populate dataclass to return
-            info = self._generate_ip_info(ip_address, bits)
+            info = self._generate_ip_info(ip, bits)
 
         return ip_err, mask_err, info
             
-    def _populate_subnet_info(self, ip_address: str):
-        if not self.ip_addresses[ip_address].subnets:
-            long = self.ip_addresses[ip_address].long
+    def _populate_subnet_info(self, ip: IPv4Address):
+        if not ip.subnets:
             subnets = []
             for bits in range(33):
-                network = long & self.ip_addresses[Masks.NETMASKS[bits]].long
-                network_quad = socket.inet_ntoa(struct.pack('!I', network))
-                s = network_quad + '/' + str(bits)
+                network = ip.long & self.ip_addresses[Masks.NETMASKS[bits]].long
+                s = socket.inet_ntoa(struct.pack('!I', network)) + '/' + str(bits)
 
                 if s not in self.subnets:
-                    broadcast = long | self.ip_addresses[Masks.WILDCARDS[bits]].long
-                    start_ip = None if Subnets.USABLE_HOSTS[bits] == 0 else (network + 1)
-                    end_ip = None if Subnets.USABLE_HOSTS[bits] == 0 else (broadcast - 1)
+                    self._create_subnet(ip.long, bits)
+
+                subnets.append(s)
 
-                    broadcast_quad = socket.inet_ntoa(struct.pack('!I', broadcast))
-                    start_ip_quad = None if not start_ip else socket.inet_ntoa(struct.pack('!I', start_ip))
-                    end_ip_quad = None if not end_ip else socket.inet_ntoa(struct.pack('!I', end_ip))
+            ip.subnets = tuple(subnets)
 
-                    subnet = IPv4Subnet(s, bits, network_quad, broadcast_quad, start_ip_quad, end_ip_quad)
 
-                    self.subnets[s] = subnet
+    def _create_subnet(self, long: int, bits: int) -> IPv4Subnet:
+        network = long & self.ip_addresses[Masks.NETMASKS[bits]].long
+        network_quad = socket.inet_ntoa(struct.pack('!I', network))
+        s = network_quad + '/' + str(bits)
 
-                    if network_quad not in self.ip_addresses:
-                        self.ip_addresses[network_quad] = IPv4Address(struct.pack('!I', network))
+        broadcast = long | self.ip_addresses[Masks.WILDCARDS[bits]].long
+        start_ip = None if Subnets.USABLE_HOSTS[bits] == 0 else (network + 1)
+        end_ip = None if Subnets.USABLE_HOSTS[bits] == 0 else (broadcast - 1)
 
-                    if broadcast_quad not in self.ip_addresses:
-                        self.ip_addresses[broadcast_quad] = IPv4Address(struct.pack('!I', broadcast))
+        broadcast_quad = socket.inet_ntoa(struct.pack('!I', broadcast))
+        start_ip_quad = None if not start_ip else socket.inet_ntoa(struct.pack('!I', start_ip))
+        end_ip_quad = None if not end_ip else socket.inet_ntoa(struct.pack('!I', end_ip))
 
-                    if start_ip_quad and start_ip_quad not in self.ip_addresses:
-                        self.ip_addresses[start_ip_quad] = IPv4Address(struct.pack('!I', start_ip))
+        subnet = IPv4Subnet(s, bits, network_quad, broadcast_quad, start_ip_quad, end_ip_quad)
 
-                    if end_ip_quad and end_ip_quad not in self.ip_addresses:
-                        self.ip_addresses[end_ip_quad] = IPv4Address(struct.pack('!I', end_ip))
+        self.subnets[s] = subnet
+
+        if network_quad not in self.ip_addresses:
+            self.ip_addresses[network_quad] = IPv4Address.from_long(network)
+
+        if broadcast_quad not in self.ip_addresses:
+            self.ip_addresses[broadcast_quad] = IPv4Address.from_long(broadcast)
+
+        if start_ip_quad and start_ip_quad not in self.ip_addresses:
+            self.ip_addresses[start_ip_quad] = IPv4Address.from_long(start_ip)
+
+        if end_ip_quad and end_ip_quad not in self.ip_addresses:
+            self.ip_addresses[end_ip_quad] = IPv4Address.from_long(end_ip)
+
+        return subnet
+
+
+    def _get_address(self, ip_address: str) -> IPv4Address:
+        # Entries can be evicted between calls, so rebuild them if they are missing
+        ip = self.ip_addresses.get(ip_address)
+        if ip is None:
+            ip = IPv4Address(socket.inet_pton(socket.AF_INET, ip_address))
+            self.ip_addresses[ip_address] = ip
+        return ip
 
-                subnets.append(s)
 
-            self.ip_addresses[ip_address].subnets = tuple(subnets)
+    def _get_subnet(self, ip: IPv4Address, bits: int) -> IPv4Subnet:
+        subnet = self.subnets.get(ip.subnets[bits])
+        if subnet is None:
+            subnet = self._create_subnet(ip.long, bits)
+        return subnet
 
 
-    def _generate_ip_info(self, ip_address: str, bits: int):
-        ip = self.ip_addresses[ip_address]
+    def _generate_ip_info(self, ip: IPv4Address, bits: int):
         netmask = self.ip_addresses[Masks.NETMASKS[bits]]
         wildcard = self.ip_addresses[Masks.WILDCARDS[bits]]
-        subnet = self.subnets[ip.subnets[bits]]
-        start = None if not subnet.start_ip else self.ip_addresses[subnet.start_ip]
-        end = None if not subnet.end_ip else self.ip_addresses[subnet.end_ip]
-        network = self.ip_addresses[subnet.network_ip]
-        broadcast = self.ip_addresses[subnet.broadcast_ip]
+        subnet = self._get_subnet(ip, bits)
+        start = None if not subnet.start_ip else self._get_address(subnet.start_ip)
+        end = None if not subnet.end_ip else self._get_address(subnet.end_ip)
+        network = self._get_address(subnet.network_ip)
+        broadcast = self._get_address(subnet.broadcast_ip)
 
         return IPv4Summary(
             IPv4SummaryAddress(ip.ip_address, ip.binary_quad, ip.long, ip.binary_bits, ip.decimal_octets, ip.hex_octets),
@@ -5,6 +5,8 @@ from dataclasses import dataclass
 from imports.widgets import *
 from imports.ip_fields_dataclasses import *
 from imports.ip_constants import *
+from imports.reactive import ReactiveGraph, Node
+from imports.workers import TkJobRunner, ip_ranges_to_blocks_job
 
 _PINK_ON = '#FF89B2'
 _PINK_OFF = '#99556F'
@@ -106,8 +108,9 @@ class _InputBase(IntEnum):
     HEX = 16
 
 class InputHandler(tk.Frame):
-    def __init__(self, parent):
+    def __init__(self, parent, jobs: TkJobRunner):
         super().__init__(parent)
+        self.jobs = jobs
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
 
@@ -128,6 +131,15 @@ class InputHandler(tk.Frame):
         entry = self._init_block_to_ip_frame()
         entry.grid(row=2, column=0, pady=(5, 15), sticky="NSEW")
 
+        range_entry = self._init_ip_range_to_block_frame()
+        range_entry.grid(row=2, column=0, pady=(5, 15), sticky="NSEW")
+        range_entry.grid_remove()
+
+        self.mode_frames = {
+            _InputMode.BLOCK_TO_IP_RANGE: entry,
+            _InputMode.IP_RANGE_TO_BLOCK: range_entry
+        }
+
         self.footer = tk.Frame(self.inner, height=25, width=900, background=_BACKGROUND)
         self.footer.grid(column=0, row=2, sticky="SEW")
 
@@ -182,6 +194,45 @@ class InputHandler(tk.Frame):
         #prefix_frame.grid(row=0, column=1, sticky='NSEW')
 
         return frame
+
+
+    def _init_ip_range_to_block_frame(self):
+        frame = tk.Frame(self.inner, height=250, width=900, background=_BACKGROUND)
+
+        self.range_entries = []
+        for row, name in enumerate(("Start IP:", "End IP:")):
+            tk.Label(frame, text=name, font=_FONT, background=_BACKGROUND, foreground=_TEXT).grid(row=row, column=0, padx=(15, 0), sticky="E")
+            entry = IPv4EntryFrame(frame, input_base_var=self.input_fields.base_mode)
+            entry.grid(row=row, column=1, pady=(0, 10), sticky='NSEW')
+            self.range_entries.append(entry)
+
+        self.range_status = tk.StringVar()
+        tk.Label(frame, textvariable=self.range_status, font=_FONT, background=_BACKGROUND, foreground=_TEXT).grid(row=2, column=1, sticky="W")
+
+        self.range_blocks = VirtualListView(frame, visible_rows=8, font=_FONT, foreground=_TEXT, background=_DARKER_ACCENT, highlight=_BLUE_OFF, search_bar=False)
+        self.range_blocks.grid(row=0, column=2, rowspan=3, padx=15, sticky="NSEW")
+
+        for entry in self.range_entries:
+            entry.graph.effect(lambda numeric: self._submit_range_to_block(), entry.numeric)
+
+        return frame
+
+
+    def _submit_range_to_block(self):
+        '''
+        Decomposes the range between the two addresses on the job runner. Every edit supersedes the job of the
+        previous one, so blocks which arrive late for an older range are never shown
+        '''
+        start_ip, end_ip = sorted(entry.numeric.value for entry in self.range_entries)
+        self.range_status.set("Calculating...")
+        self.jobs.submit("range_to_block", ip_ranges_to_blocks_job, [(start_ip, end_ip)],
+                         on_result=self._show_range_blocks,
+                         on_error=lambda error: self.range_status.set(f"Error: {error}"))
+
+
+    def _show_range_blocks(self, blocks: list):
+        self.range_status.set(f"{len(blocks)} block" + ("" if len(blocks) == 1 else "s"))
+        self.range_blocks.set_rows(blocks)
     
 
     def _set_mode(self, event, mode):
@@ -199,6 +250,14 @@ class InputHandler(tk.Frame):
         
         self.input_fields.input_mode.set(mode)
 
+        # Practice has no frame yet, the last one stays up
+        if mode in self.mode_frames:
+            for frame_mode, frame in self.mode_frames.items():
+                if frame_mode == mode:
+                    frame.grid()
+                else:
+                    frame.grid_remove()
+
     def _color_header_buttons(self, *args, button_value, off_color, on_color):
         if button_value == self.input_fields.input_mode.get():
             self.header_buttons[button_value].config(background=on_color)
@@ -238,20 +297,28 @@ class InputHandler(tk.Frame):
 
 
 class IPv4EntryFrame(tk.Frame):
-    def __init__(self, parent, input_base_var: tk.IntVar, **kwargs):
+    '''
+    Shows an address as four octets (in the selected input base) and 32 bit buttons.
+
+    The address is the numeric node of a ReactiveGraph and everything shown is derived from it, so an edit
+    only writes the Tk variables and labels whose value changed. Without a numeric node the frame creates
+    its own graph and the address is edited through the octet entries and bit buttons. Given one
+    (e.g. a mask derived from the prefix length), the frame only displays it
+    '''
+    def __init__(self, parent, input_base_var: tk.IntVar, numeric: Node = None, **kwargs):
         tk.Frame.__init__(self, parent, background=_BACKGROUND)
-        self.fields = IPv4EntryFields(numeric=tk.StringVar(), 
+        self.fields = IPv4EntryFields(numeric=tk.StringVar(value='0'), 
                                       binary_bits=[tk.StringVar(value='0') for _ in range(32)],
                                       octets=[tk.StringVar(value='0') for _ in range(4)],
                                       _input_base = input_base_var)
         
-        self.fields._input_base.trace("w", lambda *args: self._update_input_type(*args))
+        self.editable = numeric is None
+        self.graph = ReactiveGraph() if self.editable else numeric.graph
+        self.numeric = self.graph.source(0) if self.editable else numeric
 
-        for i in range(32):
-            self.fields.binary_bits[i].trace("w", lambda *args, i=i: self._color_binary_button(*args, bit_index=i))
-
-        for i in range(4):
-            self.fields.octets[i].trace("w", lambda *args, i=i: self._update_octet(*args, octet=i))
+        # What the Tk variables and labels currently show, so only changes are written
+        self._shown_bits = ['00000000'] * 4
+        self._editing_octet = None
 
         self.inner = tk.Frame(self, background=_BACKGROUND)
         self.inner.grid(row=1, column=0)
@@ -267,8 +334,7 @@ class IPv4EntryFrame(tk.Frame):
         idx = 1
         for i in range(0, 32, 8):
             binary_octet_num = i // 8
-            binary_octet = CombFrame(self.inner,
-                              widget=FixedSizeFramedLabel,
+            binary_octet = CanvasCombFrame(self.inner,
                               varslist=self.fields.binary_bits[i:i+8], 
                               bordercolor=_OCTET_COLORS[binary_octet_num][1].enabled.accent,
                               width=_BINARY_BUTTON_WIDTH, 
@@ -286,15 +352,16 @@ class IPv4EntryFrame(tk.Frame):
                 idx += 1
             
         for i in range(8):
-            self.widgets['binary'].frames[0].cells[i].interior.label.bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, i, 0, 7-i, 31-i))
-            self.widgets['binary'].frames[1].cells[i].interior.label.bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 8+i,1, 7-i, 31-8-i))
-            self.widgets['binary'].frames[2].cells[i].interior.label.bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 16+i, 2, 7-i, 31-16-i))
-            self.widgets['binary'].frames[3].cells[i].interior.label.bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 24+i, 3, 7-i, 31-24-i))
+            if self.editable:
+                self.widgets['binary'].frames[0].cells[i].bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 31-i))
+                self.widgets['binary'].frames[1].cells[i].bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 31-8-i))
+                self.widgets['binary'].frames[2].cells[i].bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 31-16-i))
+                self.widgets['binary'].frames[3].cells[i].bind("<Button-1>", lambda event, i=i: self._toggle_bit(event, 31-24-i))
 
-            Tooltip(self.widgets['binary'].frames[0].cells[i].interior.label, (1 << (7-i)))
-            Tooltip(self.widgets['binary'].frames[1].cells[i].interior.label, (1 << (7-i)))
-            Tooltip(self.widgets['binary'].frames[2].cells[i].interior.label, (1 << (7-i)))
-            Tooltip(self.widgets['binary'].frames[3].cells[i].interior.label, (1 << (7-i)))
+            Tooltip(self.widgets['binary'].frames[0].cells[i], (1 << (7-i)))
+            Tooltip(self.widgets['binary'].frames[1].cells[i], (1 << (7-i)))
+            Tooltip(self.widgets['binary'].frames[2].cells[i], (1 << (7-i)))
+            Tooltip(self.widgets['binary'].frames[3].cells[i], (1 << (7-i)))
 
         idx = 1
         validate_octet = self.register(self._validate_octet)
@@ -303,9 +370,10 @@ class IPv4EntryFrame(tk.Frame):
             decimal_octet.grid(row=self.widgets['octet'].row, column=idx, padx=self.label_pad_x, pady=self.label_pad_y, sticky="NSEW")
             self.widgets['octet'].frames.append(decimal_octet)
             
-            self.fields.octets[i].trace("w", lambda *args, i=i: self._update_octet(*args, octet=i))
-            decimal_octet.bind("<FocusOut>", lambda event, i=i: self._set_default_octet(event, i))
-            decimal_octet.bind("<FocusIn>", lambda event, i=i: self._remove_default_octet_focusin(event, i))
+            if self.editable:
+                self.fields.octets[i].trace("w", lambda *args, i=i: self._update_octet(*args, octet=i))
+                decimal_octet.bind("<FocusOut>", lambda event, i=i: self._set_default_octet(event, i))
+                decimal_octet.bind("<FocusIn>", lambda event, i=i: self._remove_default_octet_focusin(event, i))
 
             decimal_octet.tooltip = Tooltip(self.widgets['octet'].frames[i], f"{_OCTET_COLORS[i][0]} Octet (Decimal)")
 
@@ -315,30 +383,48 @@ class IPv4EntryFrame(tk.Frame):
                 tk.Label(self.inner, text=".", font=_HEADING_FONT, background=_BACKGROUND, foreground=_TEXT).grid(row=self.widgets['octet'].row, column=idx, sticky="S")
                 idx += 1
 
-        
-    def _toggle_bit(self, event, bit_index, octet, bit_position, absolute_bit_position):
-        bit = self.fields.binary_bits[bit_index].get()
+        self._init_graph()
 
-        octet_value = self._get_octet(octet)
-        numeric = self._get_numeric_ip()
         
-        if bit == '1':
-            self.fields.binary_bits[bit_index].set(0)
-            octet_value &= ~(1 << bit_position)
-            self.fields.numeric.set((numeric & ~(1 << absolute_bit_position)))
-        else:
-            self.fields.binary_bits[bit_index].set(1)
-            octet_value |= (1 << bit_position)
-            self.fields.numeric.set((numeric | (1 << absolute_bit_position)))
-        
-        base = self.fields._input_base.get()
+    def _init_graph(self):
+        '''
+        Derives what the frame shows from the numeric node: the octets, their text in the input base and their bits.
+        Each octet is its own node so changing one bit only rewrites that octet
+        '''
+        input_base = self.graph.variable_source(self.fields._input_base)
+        octets = self.graph.derived(lambda numeric: tuple(numeric.to_bytes(4, 'big')), self.numeric)
+
+        self.octet_texts = []
+        for i in range(4):
+            octet = self.graph.derived(lambda octets, i=i: octets[i], octets)
+            octet_text = self.graph.derived(lambda base, value: self._get_octet_table(base)[value], input_base, octet)
+            octet_bits = self.graph.derived(lambda value: IPv4Utility._BINARY_OCTETS[value], octet)
+
+            self.graph.effect(lambda text, i=i: self._show_octet(text, octet=i), octet_text)
+            self.graph.effect(lambda bits, i=i: self._show_octet_bits(bits, octet=i), octet_bits)
+            self.octet_texts.append(octet_text)
+
+        self.graph.effect(lambda numeric: self.fields.numeric.set(numeric), self.numeric)
+        self.graph.effect(self._update_input_type, input_base)
+
+
+    def _toggle_bit(self, event, absolute_bit_position):
+        self.numeric.set(self.numeric.value ^ (1 << absolute_bit_position))
+
+
+    def _get_octet_table(self, base=None):
+        '''
+        Returns the IPv4Utility octet table matching the input base (the selected one by default)
+        '''
+        if base is None:
+            base = self.fields._input_base.get()
 
         if base == _InputBase.HEX:
-            self.fields.octets[octet].set(format(octet_value, '02X'))
+            return IPv4Utility._HEX_OCTETS
         elif base == _InputBase.OCTAL:
-            self.fields.octets[octet].set(format(octet_value, 'o'))
+            return IPv4Utility._OCTAL_OCTETS
         else:
-            self.fields.octets[octet].set(octet_value)
+            return IPv4Utility._DECIMAL_OCTETS
 
 
     def _get_decimal_octet(self, octet):
@@ -373,10 +459,7 @@ class IPv4EntryFrame(tk.Frame):
     
 
     def _get_numeric_ip(self):
-        try:
-            return int(self.fields.numeric.get(), 10)
-        except ValueError:
-            return 0
+        return self.numeric.value
 
         
     def _validate_decimal_octet(self, P):
@@ -416,23 +499,19 @@ class IPv4EntryFrame(tk.Frame):
         
     
     def _update_octet(self, *args, octet: int):
-        value = self._get_octet(octet)
-
-        bits = bin(value)[2:].zfill(8)
-        for i in range(8):
-            self.fields.binary_bits[(octet * 8) + i].set(bits[i])
+        shift = 24 - (octet * 8)
+        numeric = (self.numeric.value & ~(0xFF << shift)) | (self._get_octet(octet) << shift)
 
-        self.fields.numeric.set((self._get_octet(0) << 24) 
-                        | (self._get_octet(1)<< 16) 
-                        | (self._get_octet(2)<< 8) 
-                        | (self._get_octet(3)))        
+        # The entry being typed in is left as typed ("", "a", ...) until it loses focus
+        self._editing_octet = octet
+        try:
+            self.numeric.set(numeric)
+        finally:
+            self._editing_octet = None
 
 
     def _set_default_octet(self, event, octet):
-        if self.fields._input_base.get() == _InputBase.HEX:
-            self.fields.octets[octet].set(format(self._get_octet(octet), '02X'))
-        else:
-            self.fields.octets[octet].set(self._get_octet(octet))
+        self.fields.octets[octet].set(self.octet_texts[octet].value)
 
 
     def _remove_default_octet_focusin(self, event, octet):
@@ -442,34 +521,46 @@ class IPv4EntryFrame(tk.Frame):
             self.fields.octets[octet].set(format(self._get_octet(octet), 'X'))
 
 
-    def _color_binary_button(self, *args, bit_index):
-        octet = bit_index // 8
-        bit = bit_index % 8
-        if self.fields.binary_bits[bit_index].get() == '1':
-            self.widgets['binary'].frames[octet].cells[bit].interior.label.config(foreground=_OCTET_COLORS[octet][1].enabled.text)
-        else:
-            self.widgets['binary'].frames[octet].cells[bit].interior.label.config(foreground=_OCTET_COLORS[octet][1].disabled.accent)
+    def _show_octet(self, text, octet):
+        if octet != self._editing_octet and self.fields.octets[octet].get() != text:
+            self.fields.octets[octet].set(text)
 
 
-    def _update_input_type(self, *args):
-        base = self.fields._input_base.get()
-        
-        octets = self._get_numeric_ip().to_bytes(4, 'big')
+    def _show_octet_bits(self, bits, octet):
+        '''
+        Writes only the bits of the octet which changed and recolors them with one canvas call per color
+        '''
+        shown_bits = self._shown_bits[octet]
+        self._shown_bits[octet] = bits
 
+        set_bits = []
+        cleared_bits = []
+        for i in range(8):
+            if bits[i] == shown_bits[i]:
+                continue
+
+            self.fields.binary_bits[(octet * 8) + i].set(bits[i])
+            if bits[i] == '1':
+                set_bits.append(i)
+            else:
+                cleared_bits.append(i)
+
+        self.widgets['binary'].frames[octet].configure_cells(set_bits, foreground=_OCTET_COLORS[octet][1].enabled.text)
+        self.widgets['binary'].frames[octet].configure_cells(cleared_bits, foreground=_OCTET_COLORS[octet][1].disabled.accent)
+
+
+    def _update_input_type(self, base):
         if base == _InputBase.HEX:
             self.widgets['octet'].label.config(text="Hex:")
             for i in range(4):
-                self.fields.octets[i].set(format(octets[i], '02X'))
                 self.widgets['octet'].frames[i].tooltip.change_text(text=f"{_OCTET_COLORS[i][0]} Octet (Hex)")
         elif base == _InputBase.OCTAL:
             self.widgets['octet'].label.config(text="Octal:")
             for i in range(4):
-                self.fields.octets[i].set(format(octets[i], 'o'))
                 self.widgets['octet'].frames[i].tooltip.change_text(text=f"{_OCTET_COLORS[i][0]} Octet (Octal)")
         else:
             self.widgets['octet'].label.config(text="Decimal:")
             for i in range(4):
-                self.fields.octets[i].set(octets[i])
                 self.widgets['octet'].frames[i].tooltip.change_text(text=f"{_OCTET_COLORS[i][0]} Octet (Decimal)")
         
 
@@ -491,9 +582,15 @@ class IPv4MaskInputFrame(tk.Frame):
 
         self._input_base = input_base_var
 
-        self.netmask_visual = IPv4EntryFrame(self.inner, input_base_var=self._input_base)
+        # Both masks are derived from the slider, so moving it is a single propagation for both frames
+        self.graph = ReactiveGraph()
+        self.prefix_length = self.graph.variable_source(self.slider.slider_pos)
+        netmask = self.graph.derived(lambda prefix_len: IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric, self.prefix_length)
+        wildcard = self.graph.derived(lambda prefix_len: IPv4Utility._CIDR_INFO[prefix_len].wildcard.numeric, self.prefix_length)
+
+        self.netmask_visual = IPv4EntryFrame(self.inner, input_base_var=self._input_base, numeric=netmask)
         self.netmask_visual.grid(row=1, column=0, pady=(5, 0))
-        self.wildcard_visual = IPv4EntryFrame(self.inner, input_base_var=self._input_base)
+        self.wildcard_visual = IPv4EntryFrame(self.inner, input_base_var=self._input_base, numeric=wildcard)
         self.wildcard_visual.grid(row=2, column=0)
 
         self.fields = IPv4MaskEntryFields(prefix_length=self.slider.slider_pos,
@@ -501,19 +598,8 @@ class IPv4MaskInputFrame(tk.Frame):
                                           wildcard=self.wildcard_visual.fields)
         
 
-        # Unbinding what I do not need, but should make another class or add an option that does what I want
         for i in range(4):
-            for j in range(8):
-                self.netmask_visual.widgets['binary'].frames[i].cells[j].interior.label.unbind("<Button-1>")
-                self.wildcard_visual.widgets['binary'].frames[i].cells[j].interior.label.unbind("<Button-1>")
-
-            self.netmask_visual.widgets['octet'].frames[i].unbind("<FocusOut>")
-            self.netmask_visual.widgets['octet'].frames[i].unbind("<FocusIn>")
             self.netmask_visual.widgets['octet'].frames[i].readonly_entry()
-            
-
-            self.wildcard_visual.widgets['octet'].frames[i].unbind("<FocusOut>")
-            self.wildcard_visual.widgets['octet'].frames[i].unbind("<FocusIn>")
             self.wildcard_visual.widgets['octet'].frames[i].readonly_entry()
         
         self.netmask_dropdown = LabeledMaskComboboxFrame(self.inner, label_text="Netmask", styles=_OCTET_COLORS[1][1], value=self.fields.prefix_length, input_base_var=self._input_base, display_field="netmask")
@@ -530,23 +616,8 @@ class IPv4MaskInputFrame(tk.Frame):
         self.arrow_frames[0].grid(row=1, column=1, padx=10, sticky="NSEW")
         self.arrow_frames[1].grid(row=2, column=1, padx=10, sticky="NSEW")
 
-        self.fields.prefix_length.trace("w", lambda *args: self._update_masks(*args))
-
+        # Fills in the combobox choices
         self.fields.prefix_length.set(0)
-
-
-    def _update_masks(self, *args):
-        prefix_len = self.fields.prefix_length.get()
-        mask_info = IPv4Utility._CIDR_INFO[prefix_len]
-
-        if self.fields.netmask.numeric.get() == mask_info.netmask.numeric:
-            return
-        
-        self.fields.netmask.numeric.set(mask_info.netmask.numeric)
-        self.fields.wildcard.numeric.set(mask_info.wildcard.numeric)
-
-        # Trigger the update method for the IPv4EntryFrames by updating the base with the same value
-        self._input_base.set(self._input_base.get())
         
 
 
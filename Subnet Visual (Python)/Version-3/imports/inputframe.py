@@ -9,6 +9,9 @@ from dataclasses import dataclass
 from functools import cached_property
 
 from widgets import *
+from ip_constants import *
+from shadow_vars import *
+from ip_sequences import IPv4SubnetSequence
 
 
 @dataclass
@@ -45,7 +48,7 @@ class CIDRInfo:
     
     @cached_property
     def netmask_hex_list(self):
-        return [hex(value)[2:].zfill(2).upper() for value in self.netmask_quad_list]
+        return [IPv4Utility._HEX_OCTETS[value] for value in self.netmask_quad_list]
     
     @cached_property
     def netmask_hex_quad(self):
@@ -53,7 +56,7 @@ class CIDRInfo:
     
     @cached_property
     def netmask_binary_list(self):
-        return [bin(value)[2:].zfill(8) for value in self.netmask_quad_list]
+        return [IPv4Utility._BINARY_OCTETS[value] for value in self.netmask_quad_list]
     
     @cached_property
     def netmask_binary_quad(self):
@@ -77,7 +80,7 @@ class CIDRInfo:
     
     @cached_property
     def wildcard_hex_list(self):
-        return [hex(value)[2:].zfill(2).upper() for value in self.wildcard_quad_list]
+        return [IPv4Utility._HEX_OCTETS[value] for value in self.wildcard_quad_list]
     
     @cached_property
     def wildcard_hex_quad(self):
@@ -85,7 +88,7 @@ class CIDRInfo:
     
     @cached_property
     def wildcard_binary_list(self):
-        return [bin(value)[2:].zfill(8) for value in self.wildcard_quad_list]
+        return [IPv4Utility._BINARY_OCTETS[value] for value in self.wildcard_quad_list]
     
     @cached_property
     def wildcard_binary_quad(self):
@@ -220,6 +223,8 @@ class IPv4EntryFrame(tk.Frame):
         self.bin_octet_frames = []
         self.dec_octet_frames = []
 
+        self.prefix_table = IPv4PrefixTable(0)
+
         self.mask = tk.StringVar()
         self.mask.trace("w", lambda *args: self._set_mask(*args))
 
@@ -354,19 +359,19 @@ class IPv4EntryFrame(tk.Frame):
     def update_decimal_octet(self, *args, octet: int):
         value = self._get_decimal_octet(octet)
 
-        bits = bin(value)[2:].zfill(8)
+        bits = IPv4Utility._BINARY_OCTETS[value]
         for i in range(8):
             self.fields.ip.binary_bits[(octet * 8) + i].set(bits[i])
 
-        self.fields.ip.hex_octets[octet].set((hex(value)[2:].zfill(2)).upper())
+        self.fields.ip.hex_octets[octet].set(IPv4Utility._HEX_OCTETS[value])
         self.fields.ip.long.set((self._get_decimal_octet(0) << 24) 
                         | (self._get_decimal_octet(1)<< 16) 
                         | (self._get_decimal_octet(2)<< 8) 
                         | (self._get_decimal_octet(3)))
         
-        packed = self._get_long_ip().to_bytes(4, byteorder="big")
-        self.fields.ip.dotted_quad.set('.'.join([str(byte) for byte in packed]))
-        self.fields.ip.hex_quad.set('.'.join([hex(byte)[2:].zfill(2).upper() for byte in packed]))
+        long_ip = self._get_long_ip()
+        self.fields.ip.dotted_quad.set(IPv4Utility._format_dotted_decimal(long_ip))
+        self.fields.ip.hex_quad.set(IPv4Utility._format_dotted_hex(long_ip))
         self._is_public_or_private()
         self._is_special()
         
@@ -396,71 +401,13 @@ class IPv4EntryFrame(tk.Frame):
     def _is_special(self):
         ip = self._get_long_ip()
         # https://www.iana.org/assignments/iana-ipv4-special-registry/iana-ipv4-special-registry.xhtml
-        # 0.0.0.0/32
-        if ip == 0:
-            self.fields.special_notes.set('"This host on this network"')
-        # 192.0.0.8/32
-        elif ip == 3221225480:
-            self.fields.special_notes.set('IPv4 dummy address')
-        # 192.0.0.9/32
-        elif ip == 3221225481:
-            self.fields.special_notes.set('Port Control Protocol Anycast')
-        # 192.0.0.10/32
-        elif ip == 3221225482:
-            self.fields.special_notes.set('Traversal Using Relays around NAT Anycast')
-        # 192.0.0.170/32 or 192.0.0.171/32
-        elif ip == 3221225642 or ip == 3221225643:
-            self.fields.special_notes.set('NAT64/DNS64 Discovery')
-        # 255.255.255.255/32
-        elif ip == 4294967295:
-            self.fields.special_notes.set('Limited Broadcast')
-        elif (ip & 4294967288) == 3221225472:
-            self.fields.special_notes.set('IPv4 Service Continuity Prefix')
-        else:
-            # Input IP /24
-            block24 = ip & 4294967040
-
-            # 192.0.0.0/24
-            if block24 == 3221225472:
-                self.fields.special_notes.set('IETF Protocol Assignments')
-            # 192.0.2.0/24
-            elif block24 == 3221225984:
-                self.fields.special_notes.set('Documentation (TEST-NET-1)')
-            # 192.31.196.0/24
-            elif block24 == 3223307264:
-                self.fields.special_notes.set('AS112-v4')
-            # 192.52.193.0/24
-            elif block24 == 3224682752:
-                self.fields.special_notes.set('AMT')
-            # 192.175.48.0/24
-            elif block24 == 3232706560:
-                self.fields.special_notes.set('Direct Delegation AS112 Service')
-            # 198.51.100.0/24
-            elif block24 == 3325256704:
-                self.fields.special_notes.set('Documentation (TEST-NET-2)')
-            # 203.0.113.0/24
-            elif block24 == 3405803776:
-                self.fields.special_notes.set('Documentation (TEST-NET-3)')
-            # 169.254.0.0/16
-            elif (ip & 4294901760) == 2851995648:
-                self.fields.special_notes.set('Link Local')
-            # 198.18.0.0/15
-            elif (ip & 4294836224) == 3323068416:
-                self.fields.special_notes.set('Benchmarking')
-            # 100.64.0.0/10
-            elif (ip & 4290772992) == 1681915904:
-                self.fields.special_notes.set('Shared Address Space')
-            # 0.0.0.0/8
-            elif (ip & 4278190080) == 0:
-                self.fields.special_notes.set('"This network"')
-            # 127.0.0.0/8
-            elif (ip & 4278190080) == 2130706432:
-                self.fields.special_notes.set('Loopback')
-            # 240.0.0.0/4
-            elif (ip & 4026531840) == 4026531840:
-                self.fields.special_notes.set('Reserved')
-            else:
-                self.fields.special_notes.set('N/A')
+        # Private-Use blocks are already reported by _is_public_or_private
+        for block in IPv4Utility._get_special_iana_ip_notes(ip):
+            if block[1] != 'Private-Use':
+                self.fields.special_notes.set(block[1])
+                return
+
+        self.fields.special_notes.set('N/A')
 
 
     def _get_long_masks(self):
@@ -551,20 +498,22 @@ class IPv4EntryFrame(tk.Frame):
     
     def _set_network(self, *args):
         ip = self._get_long_ip()
-        netmask, wildcard = self._get_long_masks()
+        netmask, _ = self._get_long_masks()
+        prefix_len = netmask.bit_count()
 
         self.fields.cidr_notation.set(self.fields.ip.dotted_quad.get() + '/' + str(self.fields.network_bits.get()))
 
-        network = ip & netmask
-        broadcast = ip | wildcard
+        # All 33 prefix lengths are computed when the address changes, moving the mask only looks them up
+        if self.prefix_table.ip_addr != ip:
+            self.prefix_table = IPv4PrefixTable(ip)
 
-        network_fields = self._calculate_fields(network)
+        network_fields = self.prefix_table.get_fields('network', prefix_len)
         self.fields.network.dotted_quad.set(network_fields[0])
         self.fields.network.binary_quad.set(network_fields[1])
         self.fields.network.hex_quad.set(network_fields[2])
         self.fields.network.long.set(network_fields[3])
 
-        broadcast_fields = self._calculate_fields(broadcast)
+        broadcast_fields = self.prefix_table.get_fields('broadcast', prefix_len)
         self.fields.broadcast.dotted_quad.set(broadcast_fields[0])
         self.fields.broadcast.binary_quad.set(broadcast_fields[1])
         self.fields.broadcast.hex_quad.set(broadcast_fields[2])
@@ -581,10 +530,10 @@ class IPv4EntryFrame(tk.Frame):
             self.fields.broadcast.decimal_octets[i].set(broadcast_fields[5][i])
             self.fields.broadcast.hex_octets[i].set(broadcast_fields[6][i])
 
-        if broadcast - network > 1:
-            start_fields = self._calculate_fields(network + 1)
-            end_fields = self._calculate_fields(broadcast - 1)
+        start_fields = self.prefix_table.get_fields('start_ip', prefix_len)
+        end_fields = self.prefix_table.get_fields('end_ip', prefix_len)
 
+        if start_fields is not None:
             for i in range(32):
                 self.fields.start_ip.binary_bits[i].set(start_fields[4][i])
                 self.fields.end_ip.binary_bits[i].set(end_fields[4][i])
@@ -610,9 +559,8 @@ class IPv4EntryFrame(tk.Frame):
         self.fields.end_ip.long.set(end_fields[3])
 
         # Valid IP for next subnet
-        if broadcast + 1 <= 4294967295:
-            next_subnet = self._calculate_fields(broadcast + 1)
-
+        next_subnet = self.prefix_table.get_fields('next_subnet', prefix_len)
+        if next_subnet is not None:
             for i in range(32):
                 self.fields.next_subnet.binary_bits[i].set(next_subnet[4][i])
 
@@ -627,16 +575,6 @@ class IPv4EntryFrame(tk.Frame):
         self.fields.next_subnet.hex_quad.set(next_subnet[2])
         self.fields.next_subnet.long.set(next_subnet[3])
 
-
-    def _calculate_fields(self, ip: int):
-        packed = ip.to_bytes(4, 'big')
-        decimal_octets = [str(b) for b in packed]
-        hex_octets = [hex(b)[2:].zfill(2).upper() for b in packed]
-        binary_octets = [bin(b)[2:].zfill(8) for b in packed]
-
-        #dotted_quad binary_quad hex_quad long binary_bits decimal_octets hex_octets
-
-        return ['.'.join(decimal_octets), '.'.join(binary_octets), '.'.join(hex_octets), ip, ''.join(binary_octets), decimal_octets, hex_octets]
     
 
 class InputSummaryImageFrame(tk.Frame):
@@ -727,8 +665,7 @@ class InputSummaryImageFrame(tk.Frame):
                 canvas.grid(row=1, column=0, sticky="NSEW", ipadx=5, ipady=0, pady=0)
                 canvas.bind("<Configure>", lambda event, canvas=canvas, arrow=tk.BOTH: self._draw_arrow(event, canvas, arrow))
     
-                octet = CombFrame(self.inner,
-                                widget=FixedSizeFramedLabel,
+                octet = CanvasCombFrame(self.inner,
                                 varslist=ip.binary_bits[i:i+8], 
                                 bordercolor=bordercolor, 
                                 outerborderwidths=outerborderwidths, 
@@ -742,8 +679,7 @@ class InputSummaryImageFrame(tk.Frame):
                 octet.grid(row=input_ip_row, column=idx, pady=0, sticky="NSEW")
                 self.ip_octet_frames.append(octet)
 
-                mask_octet = CombFrame(self.inner,
-                                widget=FixedSizeFramedLabel,
+                mask_octet = CanvasCombFrame(self.inner,
                                 varslist=mask.binary_bits[i:i+8], 
                                 bordercolor=bordercolor, 
                                 outerborderwidths=outerborderwidths, 
@@ -757,8 +693,7 @@ class InputSummaryImageFrame(tk.Frame):
                 mask_octet.grid(row=mask_row, column=idx, pady=0, sticky="NSEW")
                 self.ip_mask_frames.append(mask_octet)
 
-                bitmap_comb = CombFrame(self.inner,
-                                widget=FixedSizeFramedLabel,
+                bitmap_comb = CanvasCombFrame(self.inner,
                                 varslist=self.fields.mask_map[i:i+8], 
                                 bordercolor=bordercolor, 
                                 outerborderwidths=outerborderwidths, 
@@ -772,8 +707,7 @@ class InputSummaryImageFrame(tk.Frame):
                 bitmap_comb.grid(row=bitmap_row, column=idx, pady=0, sticky="NSEW")
                 self.ip_bitmap_frames.append(bitmap_comb)
 
-                bitmap_subnet_comb = CombFrame(self.inner,
-                                widget=FixedSizeFramedLabel,
+                bitmap_subnet_comb = CanvasCombFrame(self.inner,
                                 varslist=self.fields.subnet_map[i:i+8], 
                                 bordercolor=bordercolor, 
                                 outerborderwidths=outerborderwidths, 
@@ -884,6 +818,17 @@ class InputSummaryImageFrame(tk.Frame):
             number_of_subnets = BorderedFrame(subnet_frame, borderwidths=(2,2,2,2), bordercolor="systemTextColor", interior=tk.Entry, width=15, justify=tk.CENTER, textvariable=self.fields.subnet.number_of_subnets, font=font, state="readonly", readonlybackground="systemTextBackgroundColor")
             number_of_subnets.grid(column=1, row=4, pady=5, sticky="W", columnspan=3)
 
+            # Rows are computed from the block arithmetic while scrolling, so a /8 split into /30s lists fine
+            tk.Label(subnet_frame, text="Subnets: ", font=font).grid(column=0, row=5, sticky="NE")
+            self.subnet_list = VirtualListView(subnet_frame, visible_rows=6, font=font, on_select=self._show_subnet_hosts)
+            self.subnet_list.grid(column=1, row=5, pady=5, sticky="NSEW", columnspan=3)
+
+            tk.Label(subnet_frame, text="Hosts: ", font=font).grid(column=0, row=6, sticky="NE")
+            self.host_list = VirtualListView(subnet_frame, visible_rows=6, font=font)
+            self.host_list.grid(column=1, row=6, pady=5, sticky="NSEW", columnspan=3)
+            self._subnet_list_job = None
+            self._update_subnet_list()
+
             self.fields.subnet.subnet_bits.trace("w", lambda *args: self._set_subnet(*args))
             self.fields.ip.long.trace("w", lambda *args: self._reset_subnet(*args))
             self.fields.cidr_notation.trace("w", lambda *args: self._reset_subnet(*args))
@@ -972,6 +917,68 @@ class InputSummaryImageFrame(tk.Frame):
         self.fields.subnet.addresses_per_subnet.set(addresses - 2 if addresses > 2 else 0)
         self.fields.subnet.cidr_prefix.set('/' + str(self.fields.network_bits.get() + subnet_bits))
 
+        self._schedule_subnet_list()
+
+
+    def _schedule_subnet_list(self):
+        '''
+        Rebuilds the subnet list once the current change is done. A new address fires _reset_subnet twice and
+        every reset writes the subnet bits (and the spinbox) which fires _set_subnet, so the list is only built once
+        '''
+        if self._subnet_list_job is None:
+            self._subnet_list_job = self.after_idle(self._update_subnet_list)
+
+
+    def _update_subnet_list(self):
+        '''
+        Lists the subnets of the block for the current subnet bits, with the subnet holding the input IP selected
+        '''
+        self._subnet_list_job = None
+        prefix_len = self.fields.network_bits.get()
+        subnet_prefix_len = prefix_len + self._get_subnet_bits()
+        ip = int(self.fields.ip.long.get())
+
+        self.subnets = IPv4SubnetSequence(ip, prefix_len, subnet_prefix_len)
+
+        self.subnet_list.set_rows(self.subnets,
+                                  format_row=lambda subnet: IPv4Utility._format_cidr_block(*subnet),
+                                  find_row=lambda text: self._find_address(text, self.subnets.find),
+                                  selected=self.subnets.find(ip))
+        self._show_subnet_hosts(self.subnet_list.selected)
+
+
+    def _show_subnet_hosts(self, index: int):
+        '''
+        Lists the usable hosts of the subnet at index (none for /31 and /32, like Usable Hosts)
+        '''
+        hosts = self.subnets.hosts(index)
+
+        ip = int(self.fields.ip.long.get())
+        self.host_list.set_rows(hosts,
+                                format_row=IPv4Utility._numeric_ip_to_dotted_decimal,
+                                find_row=lambda text: self._find_address(text, lambda ip: hosts.index(ip) if ip in hosts else -1),
+                                selected=hosts.index(ip) if ip in hosts else None)
+
+
+    def _find_address(self, text: str, find) -> int:
+        '''
+        Returns find(ip) for the address typed in text (a.b.c.d, a.b.c.d/n or leading octets like a.b), or -1 if it is not one
+        '''
+        ip = self._parse_search_address(text)
+        if ip < 0:
+            return -1
+        return find(ip)
+
+
+    def _parse_search_address(self, text: str) -> int:
+        octets = text.split('/')[0].strip().split('.')
+        # isdigit alone accepts other digits like '²', which int() rejects
+        if not 1 <= len(octets) <= 4 or not all(octet.isascii() and octet.isdigit() and int(octet) <= 255 for octet in octets):
+            return -1
+
+        octets += ['0'] * (4 - len(octets))
+        return int.from_bytes(bytes(int(octet) for octet in octets), "big")
+
 
     def _get_subnet_bits(self):
         try:
@@ -1011,6 +1018,8 @@ class InputSummaryImageFrame(tk.Frame):
         self.fields.subnet.number_of_subnets.set(1)
         self.fields.subnet.cidr_prefix.set('/0')
 
+        self._schedule_subnet_list()
+
 
 class IPv4ClassFrame(tk.Frame):
     def __init__(self, 
@@ -1367,8 +1376,10 @@ class CIDRVisualizer(tk.Tk):
 
         self.title("CIDR Visualizer")
 
+        # Everything except the entries typed into is a shadowed variable, so recalculating the summary
+        # only writes (and fires the traces of) the values which changed
         self.fields = IPv4SummaryFields(
-            ip=self._init_fields(),
+            ip=self._init_fields(editable_octets=True),
             netmask=self._init_fields(),
             wildcard=self._init_fields(),
             network=self._init_fields(),
@@ -1376,21 +1387,21 @@ class CIDRVisualizer(tk.Tk):
             start_ip=self._init_fields(),
             end_ip=self._init_fields(),
             next_subnet=self._init_fields(),
-            public_or_private=tk.StringVar(value="Public"),
-            special_notes=tk.StringVar(value='"This host on this network"'),
-            subnet=IPv4SubnetFields(cidr_prefix=tk.StringVar(value='/0'),
-                                    addresses_per_subnet=tk.IntVar(value=4294967294),
+            public_or_private=ShadowStringVar(value="Public"),
+            special_notes=ShadowStringVar(value='"This host on this network"'),
+            subnet=IPv4SubnetFields(cidr_prefix=ShadowStringVar(value='/0'),
+                                    addresses_per_subnet=ShadowIntVar(value=4294967294),
                                     subnet_bits=tk.StringVar(value=0),
-                                    host_bits=tk.IntVar(value=32),
-                                    number_of_subnets=tk.IntVar(value=1)),
-            network_bits=tk.IntVar(value=0),
-            host_bits=tk.IntVar(value=32),
-            cidr_notation=tk.StringVar(value='0.0.0.0/0'),
-            ip_class=tk.StringVar(value='A'),
-            total_addresses=tk.IntVar(value=4294967296),
-            usable_hosts=tk.IntVar(value=4294967294),
-            mask_map=[tk.StringVar(value='H') for _ in range(32)],
-            subnet_map=[tk.StringVar(value='H') for _ in range(32)]
+                                    host_bits=ShadowIntVar(value=32),
+                                    number_of_subnets=ShadowIntVar(value=1)),
+            network_bits=ShadowIntVar(value=0),
+            host_bits=ShadowIntVar(value=32),
+            cidr_notation=ShadowStringVar(value='0.0.0.0/0'),
+            ip_class=ShadowStringVar(value='A'),
+            total_addresses=ShadowIntVar(value=4294967296),
+            usable_hosts=ShadowIntVar(value=4294967294),
+            mask_map=[ShadowStringVar(value='H') for _ in range(32)],
+            subnet_map=[ShadowStringVar(value='H') for _ in range(32)]
         )
         self.cidr_info = [CIDRInfo(i) for i in range(33)]
 
@@ -1435,15 +1446,17 @@ class CIDRVisualizer(tk.Tk):
 
         self.mainloop()
 
-    def _init_fields(self):
+    def _init_fields(self, editable_octets=False):
+        decimal_octet_var = tk.StringVar if editable_octets else ShadowStringVar
+
         return IPv4SummaryAddressFields(
-            dotted_quad=tk.StringVar(value='0.0.0.0'),
-            binary_quad=tk.StringVar(value='00000000.00000000.00000000.00000000'),
-            hex_quad=tk.StringVar(value='00.00.00.00'),
-            long=tk.StringVar(value=0),
-            binary_bits=[tk.StringVar(value=0) for _ in range(32)],
-            decimal_octets=[tk.StringVar(value=0) for _ in range(4)],
-            hex_octets=[tk.StringVar(value='00') for _ in range(4)]
+            dotted_quad=ShadowStringVar(value='0.0.0.0'),
+            binary_quad=ShadowStringVar(value='00000000.00000000.00000000.00000000'),
+            hex_quad=ShadowStringVar(value='00.00.00.00'),
+            long=ShadowStringVar(value=0),
+            binary_bits=[ShadowStringVar(value=0) for _ in range(32)],
+            decimal_octets=[decimal_octet_var(value=0) for _ in range(4)],
+            hex_octets=[ShadowStringVar(value='00') for _ in range(4)]
         )
 
 if __name__ == "__main__":
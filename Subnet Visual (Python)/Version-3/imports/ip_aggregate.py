@@ -0,0 +1,197 @@
+import ipaddress
+import time
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+from imports.ip_batch import IPv4BatchUtility
+
+
+class IPv4Aggregator:
+    '''
+    Collapses arbitrary CIDR blocks or address ranges into the minimal set of CIDR blocks
+    covering exactly the same addresses.
+
+    Inputs are sorted by start address and swept once: a range joins the current run when it
+    overlaps, touches or is contained by it. Each merged run is then cut into aligned blocks
+    the same way IPv4Utility._iter_blocks_from_ip_range does, vectorized over all runs at once.
+    Ranges are kept as int64 so end + 1 never wraps at 255.255.255.255
+    '''
+
+    @classmethod
+    def blocks_to_ranges(cls, networks, prefix_lens) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the inclusive (start, end) address range of every <network>/<prefix_len> block.
+        Host bits set in a network are ignored
+        '''
+        starts = IPv4BatchUtility.get_network_ips(networks, prefix_lens)
+        ends = IPv4BatchUtility.get_broadcast_ips(networks, prefix_lens)
+        return starts.astype(np.int64), ends.astype(np.int64)
+
+
+    @classmethod
+    def merge_ranges(cls, starts, ends) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the sorted, disjoint and non-adjacent ranges covering the same addresses as the
+        inclusive (start, end) ranges given
+        '''
+        starts = np.asarray(starts, dtype=np.int64).ravel()
+        ends = np.asarray(ends, dtype=np.int64).ravel()
+        assert(starts.shape == ends.shape and np.all(starts <= ends))
+
+        if starts.size == 0:
+            return starts, ends
+
+        order = np.argsort(starts, kind="stable")
+        starts = starts[order]
+        reach = np.maximum.accumulate(ends[order])
+
+        # A new run starts when a range begins past everything seen so far (+1 so adjacent ranges join)
+        run_starts = np.empty(starts.size, dtype=bool)
+        run_starts[0] = True
+        np.greater(starts[1:], reach[:-1] + 1, out=run_starts[1:])
+
+        run_ends = np.empty(starts.size, dtype=bool)
+        run_ends[:-1] = run_starts[1:]
+        run_ends[-1] = True
+
+        return starts[run_starts], reach[run_ends]
+
+
+    @classmethod
+    def ranges_to_blocks(cls, starts, ends) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the (network, prefix_len) arrays of the CIDR blocks covering the disjoint inclusive
+        (start, end) ranges given, sorted by network. Every round emits the largest aligned block at
+        the front of each remaining range, so it takes at most 62 rounds regardless of the input size
+        '''
+        current = np.asarray(starts, dtype=np.int64).ravel()
+        ends = np.asarray(ends, dtype=np.int64).ravel()
+
+        networks = []
+        prefix_lens = []
+        while current.size:
+            # frexp gives the exact bit length of integers below 2^53
+            _, alignment = np.frexp(current & -current)
+            alignment = np.where(current == 0, 32, alignment - 1)
+            _, fit = np.frexp(ends - current + 1)
+            host_bits = np.minimum(alignment, fit - 1)
+
+            networks.append(current)
+            prefix_lens.append(32 - host_bits)
+
+            current = current + (np.int64(1) << host_bits)
+            remaining = current <= ends
+            current = current[remaining]
+            ends = ends[remaining]
+
+        if not networks:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint8)
+
+        networks = np.concatenate(networks)
+        prefix_lens = np.concatenate(prefix_lens)
+        order = np.argsort(networks, kind="stable")
+
+        return networks[order].astype(np.uint32), prefix_lens[order].astype(np.uint8)
+
+
+    @classmethod
+    def aggregate_blocks(cls, networks, prefix_lens) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the minimal (network, prefix_len) cover of the given CIDR blocks
+        '''
+        return cls.ranges_to_blocks(*cls.merge_ranges(*cls.blocks_to_ranges(networks, prefix_lens)))
+
+
+    @classmethod
+    def aggregate_ranges(cls, starts, ends) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the minimal (network, prefix_len) cover of the given inclusive (start, end) ranges
+        '''
+        return cls.ranges_to_blocks(*cls.merge_ranges(starts, ends))
+
+
+    @classmethod
+    def aggregate_block_chunks(cls, chunks) -> (np.ndarray, np.ndarray):
+        '''
+        Streaming variant for inputs larger than memory. chunks is any iterable of
+        (networks, prefix_lens) array pairs, e.g. read piece by piece from an export.
+
+        Each chunk is folded into the merged ranges of everything before it, so memory is bounded
+        by one chunk plus the size of the result, not by the size of the input
+        '''
+        cover_starts = np.empty(0, dtype=np.int64)
+        cover_ends = np.empty(0, dtype=np.int64)
+
+        for networks, prefix_lens in chunks:
+            starts, ends = cls.blocks_to_ranges(networks, prefix_lens)
+            cover_starts, cover_ends = cls.merge_ranges(np.concatenate((cover_starts, starts)),
+                                                        np.concatenate((cover_ends, ends)))
+
+        return cls.ranges_to_blocks(cover_starts, cover_ends)
+
+
+    @classmethod
+    def iter_aggregate_sorted(cls, blocks):
+        '''
+        Streaming variant for inputs already sorted by network (route table and firewall exports
+        usually are). blocks is any iterable of (network, prefix_len) pairs; the minimal cover is
+        yielded as (network, prefix_len) tuples as soon as each merged run closes, in constant memory
+        '''
+        run_start = None
+        run_end = None
+
+        for network, prefix_len in blocks:
+            # Rows of a uint32 array are numpy scalars, where run_end + 1 would wrap at 255.255.255.255
+            network, prefix_len = int(network), int(prefix_len)
+            start = IPv4Utility._get_network_ip(network, prefix_len)
+            end = IPv4Utility._get_broadcast_ip(network, prefix_len)
+
+            if run_start is None:
+                run_start, run_end = start, end
+                continue
+
+            assert(start >= run_start)
+            if start > run_end + 1:
+                yield from IPv4Utility._iter_blocks_from_ip_range(run_start, run_end)
+                run_start, run_end = start, end
+            elif end > run_end:
+                run_end = end
+
+        if run_start is not None:
+            yield from IPv4Utility._iter_blocks_from_ip_range(run_start, run_end)
+
+
+
+def _benchmark(count: int = 3_000_000, check_count: int = 20_000):
+    rng = np.random.default_rng(0)
+    networks = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    prefix_lens = rng.integers(16, 33, size=count, dtype=np.uint8)
+
+    start = time.perf_counter()
+    cover = IPv4Aggregator.aggregate_blocks(networks, prefix_lens)
+    aggregate_time = time.perf_counter() - start
+
+    # Cross-check a sample against the standard library, through the array and the streaming entry points.
+    # The sorted stream is fed a uint32 (n, 2) array and zipped numpy columns, as exports loaded with numpy are
+    sample = IPv4BatchUtility.get_network_ips(networks[:check_count], prefix_lens[:check_count])
+    # 255.255.255.255/32 inside 255.255.255.0/24, where a uint32 run end + 1 wraps around
+    sample = np.append(sample, np.array([0xFFFFFF00, 0xFFFFFFFF], dtype=np.uint32))
+    sample_lens = np.append(prefix_lens[:check_count], np.array([24, 32], dtype=np.uint8))
+    expected = [(int(block.network_address), block.prefixlen) for block in ipaddress.collapse_addresses(
+        ipaddress.IPv4Network((network, prefix_len)) for network, prefix_len in zip(sample.tolist(), sample_lens.tolist()))]
+
+    sample_networks, sample_prefix_lens = IPv4Aggregator.aggregate_blocks(sample, sample_lens)
+    assert(list(zip(sample_networks.tolist(), sample_prefix_lens.tolist())) == expected)
+
+    order = np.argsort(sample, kind="stable")
+    rows = np.column_stack((sample[order], sample_lens[order].astype(np.uint32)))
+    assert(list(IPv4Aggregator.iter_aggregate_sorted(rows)) == expected)
+    assert(list(IPv4Aggregator.iter_aggregate_sorted(zip(rows[:, 0], rows[:, 1]))) == expected)
+
+    print(f"aggregate: {count:>10,} blocks into {len(cover[0]):,} in {aggregate_time:.2f}s")
+
+
+# Run from the Version-3 directory: python -m imports.ip_aggregate
+if __name__ == "__main__":
+    _benchmark()
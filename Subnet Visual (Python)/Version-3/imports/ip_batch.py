@@ -0,0 +1,142 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+
+
+@dataclass
+class IPv4BatchBlockInfo:
+    network: np.ndarray
+    broadcast: np.ndarray
+    first_usable: np.ndarray
+    last_usable: np.ndarray
+    has_usable: np.ndarray
+    next_subnet: np.ndarray
+    has_next_subnet: np.ndarray
+    num_addresses: np.ndarray
+    num_hosts: np.ndarray
+
+
+class IPv4BatchUtility:
+    '''
+    Array versions of the IPv4Utility block math. Every table is indexed by prefix length
+    and built once from IPv4Utility._CIDR_INFO, so a whole batch is masked with a single gather.
+    '''
+    _NETMASKS = np.array([info.netmask.numeric for info in IPv4Utility._CIDR_INFO], dtype=np.uint32)
+    _WILDCARDS = np.array([info.wildcard.numeric for info in IPv4Utility._CIDR_INFO], dtype=np.uint32)
+    _NUM_ADDRESSES = np.array([info.num_addresses for info in IPv4Utility._CIDR_INFO], dtype=np.uint64)
+    _NUM_HOSTS = np.array([info.num_hosts for info in IPv4Utility._CIDR_INFO], dtype=np.uint64)
+
+    @classmethod
+    def _as_arrays(cls, ip_addrs, prefix_lens) -> (np.ndarray, np.ndarray):
+        '''
+        Internal function
+
+        Converts the inputs to uint32 addresses and uint8 prefix lengths of the same shape.
+        A single prefix length is broadcast over every address
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32)
+        prefix_lens = np.asarray(prefix_lens, dtype=np.uint8)
+        assert(prefix_lens.size == 0 or int(prefix_lens.max()) <= 32)
+
+        return np.broadcast_arrays(ip_addrs, prefix_lens)
+
+
+    @classmethod
+    def get_network_ips(cls, ip_addrs, prefix_lens) -> np.ndarray:
+        '''
+        Returns the network address of every <ip_addr>/<prefix_len> block
+        '''
+        ip_addrs, prefix_lens = cls._as_arrays(ip_addrs, prefix_lens)
+        return ip_addrs & cls._NETMASKS[prefix_lens]
+
+
+    @classmethod
+    def get_broadcast_ips(cls, ip_addrs, prefix_lens) -> np.ndarray:
+        '''
+        Returns the broadcast address of every <ip_addr>/<prefix_len> block
+        '''
+        ip_addrs, prefix_lens = cls._as_arrays(ip_addrs, prefix_lens)
+        return ip_addrs | cls._WILDCARDS[prefix_lens]
+
+
+    @classmethod
+    def get_block_info(cls, ip_addrs, prefix_lens) -> IPv4BatchBlockInfo:
+        '''
+        Returns every derived field of the <ip_addr>/<prefix_len> blocks as arrays.
+
+        Matching the single address summary, /31 and /32 blocks have no usable host range and
+        the block ending at 255.255.255.255 has no next subnet. Those entries are 0 and flagged
+        False in has_usable / has_next_subnet
+        '''
+        ip_addrs, prefix_lens = cls._as_arrays(ip_addrs, prefix_lens)
+
+        network = ip_addrs & cls._NETMASKS[prefix_lens]
+        broadcast = ip_addrs | cls._WILDCARDS[prefix_lens]
+
+        has_usable = prefix_lens <= 30
+        first_usable = np.where(has_usable, network + np.uint32(1), np.uint32(0))
+        last_usable = np.where(has_usable, broadcast - np.uint32(1), np.uint32(0))
+
+        # broadcast + 1 wraps to 0 for the last block of the address space
+        has_next_subnet = broadcast != np.uint32(0xFFFFFFFF)
+        next_subnet = broadcast + np.uint32(1)
+
+        return IPv4BatchBlockInfo(
+            network=network,
+            broadcast=broadcast,
+            first_usable=first_usable,
+            last_usable=last_usable,
+            has_usable=has_usable,
+            next_subnet=next_subnet,
+            has_next_subnet=has_next_subnet,
+            num_addresses=cls._NUM_ADDRESSES[prefix_lens],
+            num_hosts=cls._NUM_HOSTS[prefix_lens]
+        )
+
+
+
+def _scalar_block_info(ip_addrs, prefix_lens):
+    '''
+    Internal function
+
+    The one address at a time path, used as the benchmark baseline
+    '''
+    results = []
+    for ip_addr, prefix_len in zip(ip_addrs, prefix_lens):
+        network = IPv4Utility._get_network_ip(ip_addr, prefix_len)
+        broadcast = IPv4Utility._get_broadcast_ip(ip_addr, prefix_len)
+        start_ip, end_ip = (network + 1, broadcast - 1) if broadcast - network > 1 else (None, None)
+        next_subnet = broadcast + 1 if broadcast < 0xFFFFFFFF else None
+        results.append((network, broadcast, start_ip, end_ip, next_subnet))
+    return results
+
+
+def _benchmark(count: int = 1_000_000, scalar_count: int = 100_000):
+    rng = np.random.default_rng(0)
+    ip_addrs = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    prefix_lens = rng.integers(0, 33, size=count, dtype=np.uint8)
+
+    scalar_ips = ip_addrs[:scalar_count].tolist()
+    scalar_prefixes = prefix_lens[:scalar_count].tolist()
+
+    start = time.perf_counter()
+    _scalar_block_info(scalar_ips, scalar_prefixes)
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    IPv4BatchUtility.get_block_info(ip_addrs, prefix_lens)
+    batch_time = time.perf_counter() - start
+
+    scalar_rate = scalar_count / scalar_time
+    batch_rate = count / batch_time
+    print(f"scalar: {scalar_count:>10,} blocks in {scalar_time:8.3f}s  {scalar_rate:>14,.0f} blocks/s")
+    print(f"batch:  {count:>10,} blocks in {batch_time:8.3f}s  {batch_rate:>14,.0f} blocks/s")
+    print(f"speedup: {batch_rate / scalar_rate:.1f}x")
+
+
+# Run from the Version-3 directory: python -m imports.ip_batch
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,214 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+
+
+def _popcount(words: np.ndarray) -> int:
+    '''
+    Internal function
+
+    Returns the number of set bits in a uint64 array
+    '''
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+    return int(IPv4BitmapSet._BYTE_POPCOUNT[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+class IPv4BitmapSet:
+    '''
+    A set over the whole IPv4 address space, one bit per address, in a 512 MiB memory mapped file.
+
+    Address a is bit a & 63 of word a >> 6, so every /26 or larger block is a run of whole words and
+    counting a block is a popcount over its words, never a walk over its addresses. New files are
+    created sparse: pages the set never touches take no disk space and read as zero.
+
+    mode is the np.memmap mode: "w+" creates (or clears) the file, "r+" opens it for update, "r" read only.
+    Work over the whole file (counts of large blocks, union, intersection) runs chunk_words words at a time
+    so the temporaries stay small
+    '''
+    WORDS = 1 << 26
+    SIZE = WORDS * 8
+
+    _BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+    def __init__(self, path, mode: str = "r+", chunk_words: int = 1 << 20):
+        assert(mode in ("r", "r+", "w+"))
+        assert(chunk_words > 0)
+        if mode != "w+" and os.path.getsize(path) != self.SIZE:
+            raise ValueError(f"{path} is not a {self.SIZE:,} byte address bitmap")
+
+        self.path = path
+        self.chunk_words = chunk_words
+        self._words = np.memmap(path, dtype=np.uint64, mode=mode, shape=(self.WORDS,))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        if self._words is None:
+            return
+        self.flush()
+        self._words = None
+
+
+    def flush(self):
+        if self._words.mode != "r":
+            self._words.flush()
+
+
+    def add(self, ip_addrs):
+        '''
+        Adds one address or an array of addresses
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32).ravel()
+        if ip_addrs.size == 0:
+            return
+
+        # Several addresses can share a word, so OR their bits together first: a fancy index |= would keep only one
+        ip_addrs = np.sort(ip_addrs)
+        words = ip_addrs >> 6
+        bits = np.left_shift(np.uint64(1), (ip_addrs & 63).astype(np.uint64))
+        firsts = np.flatnonzero(np.concatenate(([True], words[1:] != words[:-1])))
+        words = words[firsts]
+        self._words[words] |= np.bitwise_or.reduceat(bits, firsts)
+
+
+    def contains(self, ip_addrs) -> np.ndarray:
+        '''
+        Returns which addresses are in the set, as a bool array of the same shape
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32)
+        words = self._words[ip_addrs >> 6]
+        return ((words >> (ip_addrs & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+    def __contains__(self, ip_addr: int) -> bool:
+        return bool((int(self._words[ip_addr >> 6]) >> (ip_addr & 63)) & 1)
+
+
+    def __len__(self):
+        return self.count_block(0, 0)
+
+
+    def count_block(self, network: int, prefix_len: int) -> int:
+        '''
+        Returns how many addresses of <network>/<prefix_len> are in the set
+        '''
+        info = IPv4Utility._CIDR_INFO[prefix_len]
+        start_ip = network & info.netmask.numeric
+
+        # Blocks smaller than a word are a masked part of a single word
+        if info.num_addresses < 64:
+            word = int(self._words[start_ip >> 6]) >> (start_ip & 63)
+            return (word & ((1 << info.num_addresses) - 1)).bit_count()
+
+        first_word = start_ip >> 6
+        last_word = first_word + (info.num_addresses >> 6)
+        return sum(_popcount(self._words[start:min(start + self.chunk_words, last_word)])
+                   for start in range(first_word, last_word, self.chunk_words))
+
+
+    def count_blocks(self, networks, prefix_len: int) -> np.ndarray:
+        '''
+        Returns count_block for every network of an array, all with the same prefix length
+        '''
+        return np.array([self.count_block(int(network), prefix_len) for network in np.asarray(networks, dtype=np.uint32)],
+                        dtype=np.int64)
+
+
+    def update(self, other: 'IPv4BitmapSet'):
+        '''
+        Adds every address of other (the union, in place)
+        '''
+        self._combine(other, np.bitwise_or)
+
+
+    def intersection_update(self, other: 'IPv4BitmapSet'):
+        '''
+        Keeps only the addresses which are in other as well (the intersection, in place)
+        '''
+        self._combine(other, np.bitwise_and)
+
+
+    def __ior__(self, other: 'IPv4BitmapSet'):
+        self.update(other)
+        return self
+
+
+    def __iand__(self, other: 'IPv4BitmapSet'):
+        self.intersection_update(other)
+        return self
+
+
+    def _combine(self, other: 'IPv4BitmapSet', operation):
+        '''
+        Internal function
+
+        Applies a word-wise ufunc with other, chunk by chunk, into this bitmap
+        '''
+        for start in range(0, self.WORDS, self.chunk_words):
+            words = self._words[start:start + self.chunk_words]
+            operation(words, other._words[start:start + self.chunk_words], out=words)
+
+
+
+def _benchmark(count: int = 10_000_000):
+    rng = np.random.default_rng(0)
+    addresses = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    others = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        seen = IPv4BitmapSet(os.path.join(directory, "seen.bitmap"), "w+")
+        other = IPv4BitmapSet(os.path.join(directory, "other.bitmap"), "w+")
+
+        start = time.perf_counter()
+        seen.add(addresses)
+        add_time = time.perf_counter() - start
+        other.add(others)
+
+        # The first add faults in most pages of the sparse file, a second one shows the cost of the bit math
+        start = time.perf_counter()
+        seen.add(addresses)
+        warm_add_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = seen.contains(addresses)
+        test_time = time.perf_counter() - start
+        assert(found.all())
+
+        start = time.perf_counter()
+        counts = seen.count_blocks(np.arange(256, dtype=np.uint32) << 24, 8)
+        count_time = time.perf_counter() - start
+
+        unique = np.unique(addresses)
+        assert(int(counts.sum()) == len(seen) == unique.size)
+        assert(seen.count_block(int(unique[0]), 32) == 1)
+
+        start = time.perf_counter()
+        seen &= other
+        and_time = time.perf_counter() - start
+        assert(len(seen) == np.intersect1d(unique, others).size)
+
+        print(f"add (new):    {count / add_time:>14,.0f} addresses/s")
+        print(f"add (again):  {count / warm_add_time:>14,.0f} addresses/s")
+        print(f"test:         {count / test_time:>14,.0f} addresses/s")
+        print(f"count 256 /8: {count_time * 1000:14.1f} ms")
+        print(f"intersection: {and_time * 1000:14.1f} ms")
+
+        seen.close()
+        other.close()
+
+
+# Run from the Version-3 directory: python -m imports.ip_bitmap
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,368 @@
+import socket
+import struct
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from imports.ip_constants import ErrorMsg, IPv4Utility
+
+
+@dataclass
+class IPv4BulkParseResult:
+    addresses: np.ndarray
+    valid: np.ndarray
+    errors: np.ndarray
+
+    def __len__(self):
+        return len(self.addresses)
+
+
+def _compile_octet_table(octet_strings: tuple) -> np.ndarray:
+    '''
+    Internal function
+
+    Turns one of the IPv4Utility octet tables into a (256, width) uint8 array of the ASCII text of every octet,
+    left aligned and padded with zero bytes
+    '''
+    width = max(len(text) for text in octet_strings)
+    table = np.zeros((256, width), dtype=np.uint8)
+    for value, text in enumerate(octet_strings):
+        table[value, :len(text)] = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    return table
+
+
+class IPv4BulkIO:
+    '''
+    Parses newline separated dotted decimal addresses straight from a bytes buffer, and formats uint32 arrays
+    back into text.
+
+    The buffer is viewed as a uint8 array and every step runs over all bytes at once: lines are cut at the
+    newlines, surrounding whitespace is trimmed, the digit runs between the dots become octets and the octets
+    of each line are packed into a uint32. No Python string is created for any line.
+
+    Lines are checked like socket.inet_pton(AF_INET, line.strip()) in IPv4Info._check_ip: exactly four
+    octets of 1 to 3 digits, each at most 255 and without leading zeros
+    '''
+    _WHITESPACE = np.zeros(256, dtype=bool)
+    _WHITESPACE[list(b" \t\r\v\f")] = True
+
+    _HEX_DIGITS = np.zeros(256, dtype=bool)
+    _HEX_DIGITS[list(b"0123456789abcdefABCDEF")] = True
+
+    _OCTET_TABLES = {
+        "decimal": _compile_octet_table(IPv4Utility._DECIMAL_OCTETS),
+        "hex": _compile_octet_table(IPv4Utility._HEX_OCTETS),
+        "binary": _compile_octet_table(IPv4Utility._BINARY_OCTETS),
+        "octal": _compile_octet_table(IPv4Utility._OCTAL_OCTETS)
+    }
+
+    _NEWLINE = ord('\n')
+    _DOT = ord('.')
+    _COLON = ord(':')
+    _ZERO = ord('0')
+
+    @classmethod
+    def parse_lines(cls, buffer) -> IPv4BulkParseResult:
+        '''
+        Returns the uint32 address, a validity mask and the ErrorMsg code (uint8) of every line in buffer,
+        a bytes like object (bytes, bytearray, memoryview, mmap). A final newline does not start another line.
+        Invalid lines have address 0 and INVALID_IP, IS_IPV6 (looks like an IPv6 address) or NO_INPUT (blank)
+        '''
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        newlines = np.flatnonzero(data == cls._NEWLINE)
+        if data.size and data[-1] != cls._NEWLINE:
+            # The last line ends at the end of the buffer: only its end position is added, the buffer is never copied
+            newlines = np.append(newlines, data.size)
+
+        line_count = newlines.size
+        if line_count == 0:
+            return IPv4BulkParseResult(addresses=np.zeros(0, dtype=np.uint32), valid=np.zeros(0, dtype=bool), errors=np.zeros(0, dtype=np.uint8))
+
+        line_starts = np.empty(line_count, dtype=np.int64)
+        line_starts[:1] = 0
+        line_starts[1:] = newlines[:-1] + 1
+
+        # Trim whitespace. Only the blank runs are looked at: a run at the start of a line moves the line's start
+        # past it, a run ending at the newline moves the line's end before it
+        starts = line_starts.copy()
+        ends = newlines.copy()
+        blank_firsts, blank_lengths = cls._get_runs(cls._WHITESPACE[data])
+        blank_ends = blank_firsts + blank_lengths
+        blank_lines = np.searchsorted(newlines, blank_firsts)
+        leading = blank_firsts == line_starts[blank_lines]
+        starts[blank_lines[leading]] = blank_ends[leading]
+        trailing = blank_ends == newlines[blank_lines]
+        ends[blank_lines[trailing]] = blank_firsts[trailing]
+        empty = starts >= ends
+        lengths = np.where(empty, 0, ends - starts)
+
+        # Per line counts are sums over each line's bytes, so no per byte line index is needed
+        digit = (data - np.uint8(cls._ZERO)) < 10
+        dot = data == cls._DOT
+        dots = cls._count_per_line(dot, line_starts)
+        others = lengths - cls._count_per_line(digit, line_starts) - dots
+
+        # Digit runs are the octets
+        run_firsts, run_lengths = cls._get_runs(digit)
+        digits = [data[np.minimum(run_firsts + i, data.size - 1)].astype(np.int16) - cls._ZERO for i in range(3)]
+        values = np.select([run_lengths == 1, run_lengths == 2],
+                           [digits[0], digits[0] * 10 + digits[1]],
+                           digits[0] * 100 + digits[1] * 10 + digits[2])
+        bad_run = (run_lengths > 3) | (values > 255) | ((run_lengths > 1) & (digits[0] == 0))
+
+        run_counts = cls._count_sorted_per_line(run_firsts, line_starts, data.size)
+        bad_firsts = run_firsts[bad_run]
+        bad_runs = cls._count_sorted_per_line(bad_firsts, line_starts, data.size)
+
+        # With only digits and dots, 3 dots and 4 digit runs means <run>.<run>.<run>.<run>
+        valid = ~empty & (others == 0) & (dots == 3) & (run_counts == 4) & (bad_runs == 0)
+
+        # The runs of the valid lines come 4 at a time, in line and octet order
+        octets = values[np.repeat(valid, run_counts)].reshape(-1, 4).astype(np.uint32)
+        addresses = np.zeros(line_count, dtype=np.uint32)
+        addresses[valid] = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+        errors = np.full(line_count, ErrorMsg.INVALID_IP, dtype=np.uint8)
+        errors[valid] = ErrorMsg.SUCCESS
+        errors[empty] = ErrorMsg.NO_INPUT
+
+        colon = data == cls._COLON
+        if colon.any():
+            ipv6 = ~valid & ~empty & cls._find_ipv6(data, colon, dot, line_starts, newlines, starts, ends, lengths, dots, bad_firsts)
+            errors[ipv6] = ErrorMsg.IS_IPV6
+
+        return IPv4BulkParseResult(addresses=addresses, valid=valid, errors=errors)
+
+
+    @classmethod
+    def format_lines(cls, addresses, base: str = "decimal") -> bytes:
+        '''
+        Returns the addresses as newline terminated dotted text in base ("decimal", "hex", "binary" or "octal"),
+        the same text as the IPv4Utility._format_dotted_* functions
+        '''
+        return cls._format_chunk(np.asarray(addresses, dtype=np.uint32).ravel(), base).tobytes()
+
+
+    @classmethod
+    def format_into(cls, addresses, buffer, base: str = "decimal") -> int:
+        '''
+        Writes the format_lines text into a preallocated writable buffer (bytearray, memoryview, mmap, ...)
+        and returns the number of bytes written. get_text_size gives the size needed
+        '''
+        text = cls._format_chunk(np.asarray(addresses, dtype=np.uint32).ravel(), base)
+        out = np.frombuffer(buffer, dtype=np.uint8)
+        assert(text.size <= out.size)
+        out[:text.size] = text
+        return text.size
+
+
+    @classmethod
+    def write_lines(cls, addresses, file, base: str = "decimal", chunk_size: int = 1 << 20) -> int:
+        '''
+        Writes the format_lines text to a binary file object, chunk_size addresses at a time so memory
+        stays bounded for any number of addresses. Returns the number of bytes written
+        '''
+        addresses = np.asarray(addresses, dtype=np.uint32).ravel()
+        written = 0
+        for start in range(0, addresses.size, chunk_size):
+            text = cls._format_chunk(addresses[start:start + chunk_size], base)
+            file.write(memoryview(text))
+            written += text.size
+        return written
+
+
+    @classmethod
+    def get_text_size(cls, addresses, base: str = "decimal") -> int:
+        '''
+        Returns the number of bytes format_lines produces for the addresses
+        '''
+        table = cls._OCTET_TABLES[base]
+        octets = np.asarray(addresses, dtype=np.uint32).ravel().view(np.uint8)
+        return int(np.count_nonzero(table, axis=1)[octets].sum()) + octets.size
+
+
+    @classmethod
+    def _format_chunk(cls, addresses: np.ndarray, base: str) -> np.ndarray:
+        '''
+        Internal function
+
+        Lays every address out as one fixed width row: the padded text of each octet from the lookup table,
+        the dots and the newline. Dropping the zero padding then leaves the text of all rows back to back
+        '''
+        table = cls._OCTET_TABLES[base]
+        width = table.shape[1]
+        octets = addresses.astype(">u4").view(np.uint8).reshape(-1, 4)
+
+        rows = np.empty((addresses.size, 4 * width + 4), dtype=np.uint8)
+        for i in range(4):
+            rows[:, i * (width + 1):i * (width + 1) + width] = table[octets[:, i]]
+            rows[:, i * (width + 1) + width] = cls._DOT
+        rows[:, -1] = cls._NEWLINE
+
+        # Hex and binary octets are fixed width, so there is no padding to drop
+        if np.all(table):
+            return rows.ravel()
+        return rows[rows != 0]
+
+
+    @classmethod
+    def _get_runs(cls, mask: np.ndarray) -> (np.ndarray, np.ndarray):
+        '''
+        Internal function
+
+        Returns the first position and the length of every run of True in mask
+        '''
+        edges = np.diff(mask.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+        firsts = np.flatnonzero(edges == 1)
+        return firsts, np.flatnonzero(edges == -1) - firsts
+
+
+    @classmethod
+    def _count_sorted_per_line(cls, positions: np.ndarray, line_starts: np.ndarray, size: int) -> np.ndarray:
+        '''
+        Internal function
+
+        Returns how many of the sorted byte positions fall in every line
+        '''
+        return np.diff(np.searchsorted(positions, np.append(line_starts, size)))
+
+
+    @classmethod
+    def _count_per_line(cls, mask: np.ndarray, line_starts: np.ndarray) -> np.ndarray:
+        '''
+        Internal function
+
+        Returns the number of set bytes of every line (each line owns the bytes up to and including its newline)
+        '''
+        return np.add.reduceat(mask, line_starts, dtype=np.int64)
+
+
+    @classmethod
+    def _find_ipv6(cls, data, colon, dot, line_starts, newlines, starts, ends, lengths, dots, bad_firsts) -> np.ndarray:
+        '''
+        Internal function
+
+        Returns which lines have the shape of an IPv6 address: hex groups of up to 4 digits separated by colons,
+        8 groups or fewer with a single "::", optionally ending in a dotted IPv4 part (counted as 2 groups).
+        The IPv4 part is checked like an IPv4 line: bad_firsts are the starts of the digit runs which are not an octet
+        '''
+        hex_digit = cls._HEX_DIGITS[data]
+
+        colons = cls._count_per_line(colon, line_starts)
+        foreign = lengths - colons - dots - cls._count_per_line(hex_digit, line_starts)
+        doubles = cls._count_per_line(np.append(colon[:-1] & colon[1:], False), line_starts)
+
+        run_firsts, run_lengths = cls._get_runs(hex_digit)
+        run_lines = np.searchsorted(newlines, run_firsts)
+        groups = np.bincount(run_lines, minlength=line_starts.size)
+        long_groups = np.bincount(run_lines[run_lengths > 4], minlength=line_starts.size)
+
+        # The IPv4 part comes after the last colon: four digit runs split by the dots, without hex letters
+        colon_positions = np.flatnonzero(colon)
+        dot_positions = np.append(np.flatnonzero(dot), data.size)
+        last_colon = np.append(-1, colon_positions)[np.searchsorted(colon_positions, ends)]
+        first_dot = dot_positions[np.searchsorted(dot_positions, starts)]
+        has_ipv4 = dots > 0
+        groups = np.where(has_ipv4, groups - 4 + 2, groups)
+
+        tail_runs = np.bincount(run_lines[run_firsts > last_colon[run_lines]], minlength=line_starts.size)
+        letter_positions = np.flatnonzero(hex_digit & (data > cls._ZERO + 9))
+        letter_lines = np.searchsorted(newlines, letter_positions)
+        tail_letters = np.bincount(letter_lines[letter_positions > last_colon[letter_lines]], minlength=line_starts.size)
+        bad_lines = np.searchsorted(newlines, bad_firsts)
+        tail_bad_runs = np.bincount(bad_lines[bad_firsts > last_colon[bad_lines]], minlength=line_starts.size)
+
+        # A lone colon can not start or end the address
+        first_bytes = data[np.minimum(starts, data.size - 1)]
+        second_bytes = data[np.minimum(starts + 1, data.size - 1)]
+        last_bytes = data[np.maximum(ends - 1, 0)]
+        before_last_bytes = data[np.maximum(ends - 2, 0)]
+        lone_edge = (((first_bytes == cls._COLON) & (second_bytes != cls._COLON))
+                     | ((last_bytes == cls._COLON) & (before_last_bytes != cls._COLON)))
+
+        return ((colons >= 2) & (foreign == 0) & (doubles <= 1) & (long_groups == 0) & ~lone_edge
+                & (~has_ipv4 | ((dots == 3) & (first_dot > last_colon) & (tail_runs == 4) & (tail_letters == 0) & (tail_bad_runs == 0)))
+                & np.where(doubles == 1, groups <= 7, groups == 8))
+
+
+
+def _scalar_parse_lines(buffer: bytes) -> list:
+    '''
+    Internal function
+
+    The one line at a time path of IPv4Info._check_ip, used as the benchmark baseline and reference
+    '''
+    results = []
+    for line in buffer.decode("ascii", "replace").splitlines():
+        line = line.strip()
+        if not line:
+            results.append((0, ErrorMsg.NO_INPUT))
+            continue
+        try:
+            results.append((struct.unpack('!I', socket.inet_pton(socket.AF_INET, line))[0], ErrorMsg.SUCCESS))
+        except OSError:
+            try:
+                socket.inet_pton(socket.AF_INET6, line)
+                results.append((0, ErrorMsg.IS_IPV6))
+            except OSError:
+                results.append((0, ErrorMsg.INVALID_IP))
+    return results
+
+
+def _scalar_format_lines(ip_addrs: list) -> bytes:
+    '''
+    Internal function
+
+    The one address at a time path, used as the benchmark baseline
+    '''
+    return ''.join(IPv4Utility._format_dotted_decimal(ip_addr) + '\n' for ip_addr in ip_addrs).encode()
+
+
+def _best_time(func, repeat: int) -> (float, object):
+    '''
+    Internal function
+
+    Best of a few runs, the first bulk run also pays for faulting in its working arrays
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _benchmark(count: int = 1_000_000, repeat: int = 3):
+    rng = np.random.default_rng(0)
+    ip_addrs = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    ip_list = ip_addrs.tolist()
+
+    scalar_format_time, buffer = _best_time(lambda: _scalar_format_lines(ip_list), repeat)
+    bulk_format_time, bulk_buffer = _best_time(lambda: IPv4BulkIO.format_lines(ip_addrs), repeat)
+    assert(buffer == bulk_buffer)
+
+    scalar_parse_time, _ = _best_time(lambda: _scalar_parse_lines(buffer), repeat)
+    bulk_parse_time, result = _best_time(lambda: IPv4BulkIO.parse_lines(buffer), repeat)
+    assert(np.array_equal(result.addresses, ip_addrs) and result.valid.all())
+
+    # Every kind of line, checked against the inet_pton reference, including IPv6 lines whose IPv4 part is not valid
+    pieces = ["1.2.3.4", " 10.0.0.1\t", "", "256.1.1.1", "01.2.3.4", "1.2.3", "1.2.3.4.5", "a.b.c.d", "::", "::1",
+              "fe80::1:2", "1:2:3:4:5:6:7:8", "1::2::3", "12345::", "::ffff:1.2.3.4", "::1.2.3.4", "::01.2.3.4",
+              "::1.2.3.2550", "::000.0.0.0", "::256.1.1.1", "::1.2.3", "::1.2.3.4.5", "1:2:3:4:5:6:1.2.3.4", "::a.2.3.4"]
+    lines = [pieces[index] for index in rng.integers(0, len(pieces), size=30_000)]
+    mixed = "\n".join(lines).encode()
+    result = IPv4BulkIO.parse_lines(mixed)
+    expected = _scalar_parse_lines(mixed)
+    assert(result.addresses.tolist() == [ip_addr for ip_addr, _ in expected])
+    assert(result.errors.tolist() == [error for _, error in expected])
+
+    for name, scalar_time, bulk_time in (("parse", scalar_parse_time, bulk_parse_time), ("format", scalar_format_time, bulk_format_time)):
+        print(f"{name} scalar: {count:>10,} lines in {scalar_time:8.3f}s  {count / scalar_time:>14,.0f} lines/s")
+        print(f"{name} bulk:   {count:>10,} lines in {bulk_time:8.3f}s  {count / bulk_time:>14,.0f} lines/s")
+        print(f"{name} speedup: {scalar_time / bulk_time:.1f}x")
+
+
+# Run from the Version-3 directory: python -m imports.ip_bulk_io
+if __name__ == "__main__":
+    _benchmark()
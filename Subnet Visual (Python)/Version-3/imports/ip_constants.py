@@ -1,45 +1,98 @@
 from dataclasses import dataclass
+from enum import IntEnum
 from functools import cached_property
 
+
+class ErrorMsg(IntEnum):
+    SUCCESS = 0
+    NO_INPUT = 1
+    INVALID_IP = 2
+    IS_IPV6 = 3
+    INVALID_CIDR = 4
+    CIDR_RANGE = 5
+    INVALID_MASK = 6
+    EMPTY_MASK_OR_PREFIX = 7
+    MASK_TYPE_MISMATCH = 8
+
+    @classmethod
+    def message(cls, member):
+        return {
+            ErrorMsg.SUCCESS: "",
+            ErrorMsg.NO_INPUT: "No IP address entered.",
+            ErrorMsg.INVALID_IP: "Invalid IPv4 address.",
+            ErrorMsg.IS_IPV6: "Invalid IPv4 address. This program only accepts IPv4 addresses and not IPv6 addresses.",
+            ErrorMsg.INVALID_CIDR: "Invalid CIDR Prefix. A valid CIDR Prefix is between 0 and 32 inclusive.",
+            ErrorMsg.CIDR_RANGE: "CIDR Prefix out of range. Enter a value between 0 and 32 inclusive.",
+            ErrorMsg.INVALID_MASK: "Invalid Netmask or Wildcard Mask.",
+            ErrorMsg.EMPTY_MASK_OR_PREFIX: "Missing Netmask, Wildcard Mask, or CIDR Prefix.",
+            ErrorMsg.MASK_TYPE_MISMATCH: "The given mask does not match the selected input type."
+        }.get(member, "Unknown error type.")
+
+
+
+class _LazySlot:
+    '''
+    Read only attribute computed the first time it is accessed and then cached in the
+    "_<name>" slot of the instance, like functools.cached_property but for __slots__ classes
+    '''
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.func(instance)
+            setattr(instance, self.slot, value)
+            return value
+
+
 @dataclass
 class IPv4MaskFormat:
+    '''
+    Only the numeric value is stored, every format is computed on first access and cached in its slot
+    '''
+    __slots__ = ('numeric', '_dotted_decimal', '_decimal_list', '_dotted_hex', '_hex_list',
+                 '_dotted_binary', '_binary_list', '_dotted_octal', '_octal_list')
     numeric: int
 
-    @cached_property
-    def _be_bytes(self):
-        return self.numeric.to_bytes(4, 'big')
-    
-    @cached_property
+    @_LazySlot
     def dotted_decimal(self):
-        return '.'.join(map(str, self._be_bytes))
+        return IPv4Utility._format_dotted_decimal(self.numeric)
     
-    @cached_property
+    @_LazySlot
     def decimal_list(self):
-        return list(map(int, self.numeric.to_bytes(4, 'big')))
+        return list(self.numeric.to_bytes(4, 'big'))
     
-    @cached_property
+    @_LazySlot
     def dotted_hex(self):
-        return '.'.join([hex(value)[2:].zfill(2).upper() for value in self._be_bytes])
+        return IPv4Utility._format_dotted_hex(self.numeric)
     
-    @cached_property
+    @_LazySlot
     def hex_list(self):
-        return [hex(value)[2:].zfill(2).upper() for value in self._be_bytes]
+        return IPv4Utility._get_octet_strings(self.numeric, IPv4Utility._HEX_OCTETS)
     
-    @cached_property
+    @_LazySlot
     def dotted_binary(self):
-        return '.'.join([bin(value)[2:].zfill(8) for value in self._be_bytes])
+        return IPv4Utility._format_dotted_binary(self.numeric)
     
-    @cached_property
+    @_LazySlot
     def binary_list(self):
-        return [int((self.numeric >> (31 - index)) & 1) for index in range(32)]
+        return [int(bit) for bit in IPv4Utility._format_binary(self.numeric)]
     
-    @cached_property
+    @_LazySlot
     def dotted_octal(self):
-        return '.'.join([oct(value)[2:] for value in self._be_bytes])
+        return IPv4Utility._format_dotted_octal(self.numeric)
     
-    @cached_property
+    @_LazySlot
     def octal_list(self):
-        return [oct(value)[2:] for value in self._be_bytes]
+        return IPv4Utility._get_octet_strings(self.numeric, IPv4Utility._OCTAL_OCTETS)
 
 
 @dataclass
@@ -106,7 +159,7 @@ class IPv4Utility:
         },
         16: { # 4294901760
             2851995648: ('169.254.0.0/16', 'Link Local', [('[RFC3927]', 'https://www.rfc-editor.org/rfc/rfc3927.html')]), # 169.254.0.0/16
-            3232235520: ('192.168.0.0/16', '172.16.0.0/12', 'Private-Use', [('[RFC1918]', 'https://www.rfc-editor.org/rfc/rfc1918.html')]) # 192.168.0.0/16
+            3232235520: ('192.168.0.0/16', 'Private-Use', [('[RFC1918]', 'https://www.rfc-editor.org/rfc/rfc1918.html')]) # 192.168.0.0/16
         },
         15: { # 4294836224
             3323068416: ('198.18.0.0/15', 'Benchmarking', [('[RFC2544]', 'https://www.rfc-editor.org/rfc/rfc2544.html')]) # 198.18.0.0/15
@@ -127,6 +180,20 @@ class IPv4Utility:
         }
     }
 
+    '''
+    _SPECIAL_IANA_IPS compiled once into (netmask, blocks) levels ordered from the most specific prefix.
+    Finding every block an address is part of takes one masked dictionary lookup per prefix length
+    '''
+    _SPECIAL_IANA_LEVELS = tuple((IPv4CIDRInfo(prefix_len).netmask.numeric, blocks) for prefix_len, blocks in sorted(_SPECIAL_IANA_IPS.items(), reverse=True))
+
+    '''
+    The text of every octet value (0 - 255) in each display format, so formatting an address takes four lookups
+    '''
+    _DECIMAL_OCTETS = tuple(str(value) for value in range(256))
+    _HEX_OCTETS = tuple(format(value, '02X') for value in range(256))
+    _BINARY_OCTETS = tuple(format(value, '08b') for value in range(256))
+    _OCTAL_OCTETS = tuple(format(value, 'o') for value in range(256))
+
     @classmethod
     def _get_bit_by_index(cls, ip_addr: int, index: int) -> int:
         '''
@@ -147,6 +214,66 @@ class IPv4Utility:
         return int((ip_addr >> (24 - (index * 8))) & 0xFF)
     
 
+    @classmethod
+    def _get_octet_strings(cls, ip_addr: int, octet_table: tuple) -> list:
+        '''
+        Internal function
+
+        Returns the four octets of an IPv4 address looked up in one of the octet tables (_DECIMAL_OCTETS, _HEX_OCTETS, ...)
+        '''
+        return [octet_table[ip_addr >> 24], octet_table[(ip_addr >> 16) & 0xFF], octet_table[(ip_addr >> 8) & 0xFF], octet_table[ip_addr & 0xFF]]
+    
+
+    @classmethod
+    def _format_dotted_decimal(cls, ip_addr: int) -> str:
+        '''
+        Internal function
+
+        Returns the IPv4 address as a dotted decimal quad (192.168.0.1)
+        '''
+        return '.'.join(IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._DECIMAL_OCTETS))
+    
+
+    @classmethod
+    def _format_dotted_hex(cls, ip_addr: int) -> str:
+        '''
+        Internal function
+
+        Returns the IPv4 address as a dotted, zero padded hex quad (C0.A8.00.01)
+        '''
+        return '.'.join(IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._HEX_OCTETS))
+    
+
+    @classmethod
+    def _format_dotted_binary(cls, ip_addr: int) -> str:
+        '''
+        Internal function
+
+        Returns the IPv4 address as a dotted quad of 8 bit binary octets
+        '''
+        return '.'.join(IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._BINARY_OCTETS))
+    
+
+    @classmethod
+    def _format_binary(cls, ip_addr: int) -> str:
+        '''
+        Internal function
+
+        Returns the IPv4 address as a 32 character string of bits
+        '''
+        return ''.join(IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._BINARY_OCTETS))
+    
+
+    @classmethod
+    def _format_dotted_octal(cls, ip_addr: int) -> str:
+        '''
+        Internal function
+
+        Returns the IPv4 address as a dotted octal quad (300.250.0.1)
+        '''
+        return '.'.join(IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._OCTAL_OCTETS))
+    
+
     @classmethod
     def _get_ip_class(cls, ip_addr: int) -> (str, str, int):
         '''
@@ -176,11 +303,10 @@ class IPv4Utility:
         Ranges and information based on: https://www.iana.org/assignments/iana-ipv4-special-registry/iana-ipv4-special-registry.xhtml
         '''
         special = []
-        for block in IPv4Utility._SPECIAL_IANA_IPS.keys():
-            try:
-                special.append(IPv4Utility._SPECIAL_IANA_IPS[block][ip_addr & IPv4Utility._CIDR_INFO[block].netmask.numeric])
-            except KeyError:
-                continue
+        for netmask, blocks in IPv4Utility._SPECIAL_IANA_LEVELS:
+            block = blocks.get(ip_addr & netmask)
+            if block:
+                special.append(block)
         
         return special
     
@@ -212,27 +338,53 @@ class IPv4Utility:
         
 
     @classmethod
-    def _get_blocks_from_ip_range(cls, start_ip: int, end_ip: int) -> list:
+    def _iter_blocks_from_ip_range(cls, start_ip: int, end_ip: int):
         '''
         Internal function
 
-        Returns a list of CIDR blocks which covers the range of ips between start_ip and end_ip (inclusive)
+        Yields the (network, prefix_len) CIDR blocks which cover the range of ips between start_ip and end_ip (inclusive).
+        Each block is the largest one aligned on start_ip (its trailing zero bits) that still fits in the rest of
+        the range (the bit length of the remaining size), so every block costs a constant amount of work
         '''
-        assert(start_ip <= end_ip)
-        blocks = []
+        # numpy integers (from the array based modules) would wrap around and have no bit_length
+        start_ip, end_ip = int(start_ip), int(end_ip)
+        assert(0 <= start_ip <= end_ip <= 0xFFFFFFFF)
         while start_ip <= end_ip:
-            if start_ip == end_ip:
-                blocks.append(f"{IPv4Utility._numeric_ip_to_dotted_decimal(start_ip)}/32")
-                break
-            prefix_len = 32 - IPv4Utility._get_closest_power_of_two(end_ip - start_ip + 1)
-            for i in range(prefix_len, 33):
-                network = IPv4Utility._get_network_ip(start_ip, i)
-                broadcast = IPv4Utility._get_broadcast_ip(start_ip, i)
-                if network == start_ip and broadcast <= end_ip:
-                    blocks.append(f"{IPv4Utility._numeric_ip_to_dotted_decimal(start_ip)}/{i}")
-                    start_ip = broadcast + 1
-                    break
-        return blocks
+            alignment = (start_ip & -start_ip).bit_length() - 1 if start_ip else 32
+            host_bits = min(alignment, (end_ip - start_ip + 1).bit_length() - 1)
+            yield start_ip, 32 - host_bits
+            start_ip += 1 << host_bits
+
+
+    @classmethod
+    def _iter_blocks_from_ip_ranges(cls, ip_ranges):
+        '''
+        Internal function
+
+        Yields the (network, prefix_len) CIDR blocks for every (start_ip, end_ip) range in ip_ranges, in order
+        '''
+        for start_ip, end_ip in ip_ranges:
+            yield from IPv4Utility._iter_blocks_from_ip_range(start_ip, end_ip)
+
+
+    @classmethod
+    def _get_blocks_from_ip_range(cls, start_ip: int, end_ip: int) -> list:
+        '''
+        Internal function
+
+        Returns a list of CIDR blocks (as strings) which covers the range of ips between start_ip and end_ip (inclusive)
+        '''
+        return [IPv4Utility._format_cidr_block(network, prefix_len) for network, prefix_len in IPv4Utility._iter_blocks_from_ip_range(start_ip, end_ip)]
+    
+
+    @classmethod
+    def _format_cidr_block(cls, network: int, prefix_len: int) -> str:
+        '''
+        Internal function
+
+        Formats a (network, prefix_len) block as <dotted decimal>/<prefix_len>
+        '''
+        return f"{IPv4Utility._numeric_ip_to_dotted_decimal(network)}/{prefix_len}"
     
 
     @classmethod
@@ -242,7 +394,7 @@ class IPv4Utility:
 
         Converts a numeric IPv4 address into dotted decimal notation
         '''
-        return '.'.join(map(str, ip.to_bytes(4, 'big')))
+        return IPv4Utility._format_dotted_decimal(ip)
     
 
     @classmethod
@@ -265,8 +417,68 @@ class IPv4Utility:
         '''
         assert(0 <= prefix_len <= 32)
         return numeric_ip | IPv4Utility._CIDR_INFO[prefix_len].wildcard.numeric
+    
+
+    @classmethod
+    def _get_address_fields(cls, ip_addr: int) -> list:
+        '''
+        Internal function
+
+        Returns every display format of an IPv4 address:
+        [dotted decimal, dotted binary, dotted hex, numeric, 32 bit string, decimal octets, hex octets]
+        '''
+        decimal_octets = IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._DECIMAL_OCTETS)
+        hex_octets = IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._HEX_OCTETS)
+        binary_octets = IPv4Utility._get_octet_strings(ip_addr, IPv4Utility._BINARY_OCTETS)
+
+        return ['.'.join(decimal_octets), '.'.join(binary_octets), '.'.join(hex_octets), ip_addr, ''.join(binary_octets), decimal_octets, hex_octets]
+
 
 
+class IPv4PrefixTable:
+    '''
+    The blocks of one address for every prefix length (/0 - /32), computed together when the address changes,
+    so scrubbing through prefix lengths is a lookup instead of a recalculation.
+
+    Each row is built from the masks in IPv4Utility._CIDR_INFO. Every distinct address in the table
+    (network, broadcast, first and last usable host, next subnet) is formatted once with IPv4Utility._get_address_fields
+    '''
+    _ADDRESS_KINDS = ('network', 'broadcast', 'start_ip', 'end_ip', 'next_subnet')
+
+    def __init__(self, ip_addr: int):
+        self.ip_addr = ip_addr
+
+        networks = [ip_addr & info.netmask.numeric for info in IPv4Utility._CIDR_INFO]
+        broadcasts = [ip_addr | info.wildcard.numeric for info in IPv4Utility._CIDR_INFO]
+        has_usable = [info.num_hosts > 0 for info in IPv4Utility._CIDR_INFO]
+
+        # None where the block has no usable hosts (/31, /32) or no next subnet (ends at 255.255.255.255)
+        self.addresses = {
+            'network': tuple(networks),
+            'broadcast': tuple(broadcasts),
+            'start_ip': tuple(network + 1 if usable else None for network, usable in zip(networks, has_usable)),
+            'end_ip': tuple(broadcast - 1 if usable else None for broadcast, usable in zip(broadcasts, has_usable)),
+            'next_subnet': tuple(broadcast + 1 if broadcast < 0xFFFFFFFF else None for broadcast in broadcasts)
+        }
+
+        distinct = {address for addresses in self.addresses.values() for address in addresses if address is not None}
+        self._fields = {address: IPv4Utility._get_address_fields(address) for address in distinct}
+
+
+    def get_address(self, kind: str, prefix_len: int) -> int | None:
+        '''
+        Returns the network, broadcast, start_ip, end_ip or next_subnet address of the /<prefix_len> block
+        '''
+        return self.addresses[kind][prefix_len]
+
+
+    def get_fields(self, kind: str, prefix_len: int) -> list | None:
+        '''
+        Returns the IPv4Utility._get_address_fields formats of get_address(kind, prefix_len), or None if there is no such address
+        '''
+        address = self.addresses[kind][prefix_len]
+        return None if address is None else self._fields[address]
+
 
 
 # --------- Testing -----------    
@@ -0,0 +1,191 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from imports.ip_batch import IPv4BatchUtility
+
+
+class IPv4Dir24Table:
+    '''
+    A DIR-24-8 longest prefix match table, compiled once from a static prefix list.
+
+    tbl24 has one entry per /24 (16M entries) and tbl8 one 256 entry chunk per /24 which holds a prefix
+    longer than /24. An entry is 0 for no match, the position of the matching prefix + 1, or, in tbl24 with
+    the top bit set, the number of the tbl8 chunk to look in. Both tables are uint16 while the prefix list
+    and the chunks fit in 15 bits and uint32 otherwise.
+
+    Building paints the prefixes from the shortest to the longest, one prefix length at a time: every /p
+    prefix is a row of a (2^p, 2^(24 - p)) view of tbl24 (or of the tbl8 chunks past /24), so each length is
+    a single fancy index assignment. A lookup is a gather from tbl24, plus a gather from tbl8 for the addresses
+    which landed on a chunk. save() writes the tables as .npy files which load() maps back read only
+    '''
+    _FILES = ("tbl24", "tbl8", "networks", "prefix_lens")
+
+    def __init__(self, tbl24: np.ndarray, tbl8: np.ndarray, networks: np.ndarray, prefix_lens: np.ndarray):
+        assert(tbl24.shape == (1 << 24,) and tbl8.ndim == 2 and tbl8.shape[1] == 256 and tbl24.dtype == tbl8.dtype)
+        self.tbl24 = tbl24
+        self.tbl8 = tbl8
+        self.networks = networks
+        self.prefix_lens = prefix_lens
+        self._chunk_flag = tbl24.dtype.type(1 << (8 * tbl24.dtype.itemsize - 1))
+
+
+    @classmethod
+    def build(cls, networks, prefix_lens) -> 'IPv4Dir24Table':
+        '''
+        Compiles the <network>/<prefix_len> prefixes (host bits are ignored). Lookups return positions in
+        this list; when a prefix is listed twice the later position wins
+        '''
+        networks, prefix_lens = IPv4BatchUtility._as_arrays(networks, prefix_lens)
+        networks = IPv4BatchUtility.get_network_ips(networks, prefix_lens).ravel()
+        prefix_lens = prefix_lens.ravel().copy()
+
+        long_prefixes = prefix_lens > 24
+        chunk_keys = np.unique(networks[long_prefixes] >> 8)
+        dtype = np.uint16 if networks.size < (1 << 15) - 1 and chunk_keys.size < (1 << 15) else np.uint32
+
+        tbl24 = np.zeros(1 << 24, dtype=dtype)
+        tbl8 = np.zeros((chunk_keys.size, 256), dtype=dtype)
+        entries = np.arange(1, networks.size + 1).astype(dtype)
+
+        for prefix_len in range(0, 33):
+            selected = np.flatnonzero(prefix_lens == prefix_len)
+            if selected.size == 0 and prefix_len != 25:
+                continue
+
+            if prefix_len == 25:
+                # Every chunk starts as a copy of what the prefixes up to /24 left in its tbl24 entry
+                tbl8[:] = tbl24[chunk_keys][:, np.newaxis]
+            if selected.size == 0:
+                continue
+
+            # The last of the duplicates wins, since fancy assignment order is not guaranteed
+            _, last = np.unique(networks[selected][::-1], return_index=True)
+            selected = selected[::-1][last]
+
+            if prefix_len <= 24:
+                rows = tbl24.reshape(1 << prefix_len, -1)
+                rows[networks[selected] >> np.uint32(32 - prefix_len) if prefix_len else 0] = entries[selected][:, np.newaxis]
+            else:
+                chunks = np.searchsorted(chunk_keys, networks[selected] >> 8)
+                rows = tbl8.reshape(chunk_keys.size, 1 << (prefix_len - 24), -1)
+                rows[chunks, (networks[selected] & np.uint32(0xFF)) >> np.uint32(32 - prefix_len)] = entries[selected][:, np.newaxis]
+
+        tbl24[chunk_keys] = np.arange(chunk_keys.size).astype(dtype) | dtype(1 << (8 * np.dtype(dtype).itemsize - 1))
+        return cls(tbl24, tbl8, networks, prefix_lens)
+
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True) -> 'IPv4Dir24Table':
+        '''
+        Loads a table written by save(). With mmap the files are mapped read only instead of read,
+        so loading takes the same time for any table size and the pages are shared between processes
+        '''
+        mmap_mode = 'r' if mmap else None
+        return cls(*(np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode) for name in cls._FILES))
+
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self._FILES:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+
+
+    def __len__(self):
+        return len(self.networks)
+
+
+    def __repr__(self):
+        size = self.tbl24.nbytes + self.tbl8.nbytes
+        return f"<{type(self).__name__} {len(self):,} prefixes, {len(self.tbl8):,} tbl8 chunks, {size / (1 << 20):,.1f} MiB {self.tbl24.dtype}>"
+
+
+    def lookup(self, ip_addrs) -> np.ndarray:
+        '''
+        Returns the position of the longest matching prefix of every address (an array of the same shape),
+        -1 where none matches
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32)
+        flat = ip_addrs.ravel()
+        entries = self.tbl24[flat >> np.uint32(8)]
+
+        chunked = np.flatnonzero(entries & self._chunk_flag)
+        if chunked.size:
+            entries[chunked] = self.tbl8[entries[chunked] & ~self._chunk_flag, flat[chunked] & np.uint32(0xFF)]
+
+        return (entries.astype(np.int64) - 1).reshape(ip_addrs.shape)
+
+
+    def lookup_prefixes(self, ip_addrs) -> (np.ndarray, np.ndarray):
+        '''
+        Returns the network and prefix length of the longest matching prefix of every address.
+        The prefix length is -1 where none matches
+        '''
+        positions = self.lookup(ip_addrs)
+        found = positions >= 0
+        networks = np.where(found, self.networks[np.maximum(positions, 0)], np.uint32(0)).astype(np.uint32)
+        prefix_lens = np.where(found, self.prefix_lens[np.maximum(positions, 0)], -1).astype(np.int8)
+        return networks, prefix_lens
+
+
+
+def _get_route_table(count: int, seed: int = 0) -> (np.ndarray, np.ndarray):
+    '''
+    Internal function
+
+    Returns a random table shaped like a full BGP view: mostly /24s, then /16 to /23, a few short and a few long prefixes
+    '''
+    rng = np.random.default_rng(seed)
+    prefix_lens = rng.choice([8, 12, 16, 19, 20, 21, 22, 23, 24, 26, 28, 30, 32], size=count,
+                             p=[0.001, 0.004, 0.02, 0.03, 0.04, 0.05, 0.1, 0.1, 0.6, 0.02, 0.015, 0.01, 0.01]).astype(np.uint8)
+    networks = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    return IPv4BatchUtility.get_network_ips(networks, prefix_lens), prefix_lens
+
+
+def _benchmark(prefixes: int = 1_000_000, count: int = 10_000_000, trie_count: int = 50_000):
+    from imports.ip_prefix_trie import IPv4PrefixTrie
+
+    networks, prefix_lens = _get_route_table(prefixes)
+    ip_addrs = np.random.default_rng(1).integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+
+    start = time.perf_counter()
+    table = IPv4Dir24Table.build(networks, prefix_lens)
+    build_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        table.save(directory)
+
+        start = time.perf_counter()
+        loaded = IPv4Dir24Table.load(directory)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        positions = loaded.lookup(ip_addrs)
+        lookup_time = time.perf_counter() - start
+        assert(np.array_equal(positions, table.lookup(ip_addrs)))
+        del loaded
+
+    trie = IPv4PrefixTrie()
+    for network, prefix_len in zip(networks.tolist(), prefix_lens.tolist()):
+        trie.insert(network, prefix_len)
+
+    start = time.perf_counter()
+    matches = trie.match_arrays(ip_addrs[:trie_count])
+    trie_time = time.perf_counter() - start
+
+    found_networks, found_prefix_lens = table.lookup_prefixes(ip_addrs[:trie_count])
+    assert(np.array_equal(found_prefix_lens, matches.prefix_len))
+    assert(np.array_equal(found_networks[found_prefix_lens >= 0], matches.network[matches.prefix_len >= 0]))
+
+    print(table)
+    print(f"build: {build_time:.2f}s, load (mmap): {load_time * 1000:.2f} ms")
+    print(f"trie:  {trie_count:>12,} addresses in {trie_time:8.3f}s  {trie_count / trie_time:>14,.0f} addresses/s")
+    print(f"table: {count:>12,} addresses in {lookup_time:8.3f}s  {count / lookup_time:>14,.0f} addresses/s")
+
+
+# Run from the Version-3 directory: python -m imports.ip_dir24 [prefix count]
+if __name__ == "__main__":
+    _benchmark(*(int(argument) for argument in sys.argv[1:2]))
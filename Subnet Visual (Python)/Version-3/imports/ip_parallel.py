@@ -0,0 +1,224 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from imports.ip_batch import IPv4BatchUtility
+from imports.ip_special import IPv4SpecialIndex
+from imports.log_ingest import IPv4LogIngest
+
+
+@dataclass
+class IPv4ParallelResult:
+    '''
+    The classified addresses of an address file, one column per field. The columns are views into a
+    shared memory block: call close() (or use the result as a context manager) to release it, after
+    copying out anything which is still needed
+    '''
+    ip_class: np.ndarray
+    private: np.ndarray
+    special: np.ndarray
+    network: np.ndarray
+    broadcast: np.ndarray
+    shared_memory: SharedMemory = None
+
+    def __len__(self):
+        return len(self.ip_class)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        if self.shared_memory is None:
+            return
+
+        # The block can only be closed once no array points into it anymore
+        for name, _ in IPv4ParallelClassifier._COLUMNS:
+            setattr(self, name, None)
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+        self.shared_memory = None
+
+
+
+class IPv4ParallelClassifier:
+    '''
+    Classifies a file of uint32 addresses (native byte order, as written by ndarray.tofile) on a pool of processes.
+
+    The file is memory mapped by every worker and split into chunks of chunk_size addresses. The result
+    columns live in one multiprocessing.shared_memory block which every worker attaches to by name, so a
+    worker writes its chunk straight into the result and only sends back how many addresses it did:
+    nothing but a few integers is pickled whatever the size of the file.
+
+    Each address gets the IPv4Utility class, the RFC1918 private flag, the most specific IANA special block
+    (-1 when the address is not special) and the network and broadcast addresses of its /prefix_len block
+    '''
+    # (name, dtype) of every result column, in shared memory order
+    _COLUMNS = (('ip_class', np.uint8), ('private', np.bool_), ('special', np.int8),
+                ('network', np.uint32), ('broadcast', np.uint32))
+
+    # Set in each worker by _attach_worker
+    _worker = None
+
+    @classmethod
+    def classify_file(cls, path, prefix_len: int, workers: int = None, chunk_size: int = 1 << 22) -> IPv4ParallelResult:
+        '''
+        Returns the classified addresses of the file at path. workers defaults to os.cpu_count(),
+        0 classifies in this process (the single process baseline)
+        '''
+        assert(0 <= prefix_len <= 32)
+        assert(chunk_size > 0)
+        count = os.path.getsize(path) // np.dtype(np.uint32).itemsize
+        workers = os.cpu_count() if workers is None else workers
+
+        shared_memory = SharedMemory(create=True, size=max(cls._get_block_size(count), 1))
+        ranges = [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+        try:
+            if not ranges:
+                done = 0
+            elif workers == 0:
+                # The same chunks one after the other, so the temporaries stay small
+                cls._attach_worker(path, count, shared_memory.name, prefix_len)
+                try:
+                    done = sum(cls._classify_range(start, stop) for start, stop in ranges)
+                finally:
+                    cls._worker = None
+            else:
+                with ProcessPoolExecutor(min(workers, len(ranges)), initializer=cls._attach_worker,
+                                         initargs=(path, count, shared_memory.name, prefix_len)) as pool:
+                    done = sum(pool.map(cls._classify_range, *zip(*ranges)))
+            assert(done == count)
+        except BaseException:
+            shared_memory.close()
+            shared_memory.unlink()
+            raise
+
+        return IPv4ParallelResult(**cls._get_columns(shared_memory.buf, count), shared_memory=shared_memory)
+
+
+    @classmethod
+    def classify(cls, addresses, prefix_len: int) -> dict:
+        '''
+        Returns the result columns of an address array, computed in this process
+        '''
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        columns = {name: np.empty(addresses.shape, dtype=dtype) for name, dtype in cls._COLUMNS}
+        cls._classify_into(addresses, prefix_len, columns)
+        return columns
+
+
+    @classmethod
+    def _classify_into(cls, addresses: np.ndarray, prefix_len: int, columns: dict):
+        '''
+        Internal function
+
+        Writes the classification of addresses into the (same length) column arrays
+        '''
+        columns['ip_class'][:] = IPv4LogIngest._CLASS_BY_FIRST_OCTET[addresses >> 24]
+        columns['private'][:] = IPv4LogIngest.get_private(addresses)
+        columns['special'][:] = IPv4SpecialIndex.get_most_specific(addresses)
+        np.bitwise_and(addresses, IPv4BatchUtility._NETMASKS[prefix_len], out=columns['network'])
+        np.bitwise_or(addresses, IPv4BatchUtility._WILDCARDS[prefix_len], out=columns['broadcast'])
+
+
+    @classmethod
+    def _get_block_size(cls, count: int) -> int:
+        '''
+        Internal function
+        '''
+        return sum(cls._align(count * np.dtype(dtype).itemsize) for _, dtype in cls._COLUMNS)
+
+
+    @staticmethod
+    def _align(size: int) -> int:
+        return (size + 7) & ~7
+
+
+    @classmethod
+    def _get_columns(cls, buffer, count: int) -> dict:
+        '''
+        Internal function
+
+        Returns the result columns as arrays over the shared memory buffer, each starting on an 8 byte boundary
+        '''
+        columns = {}
+        offset = 0
+        for name, dtype in cls._COLUMNS:
+            columns[name] = np.ndarray((count,), dtype=dtype, buffer=buffer, offset=offset)
+            offset += cls._align(count * np.dtype(dtype).itemsize)
+        return columns
+
+
+    @classmethod
+    def _attach_worker(cls, path, count: int, shared_memory_name: str, prefix_len: int):
+        '''
+        Internal function
+
+        Pool initializer: maps the address file and attaches to the result block once per worker process
+        '''
+        shared_memory = SharedMemory(name=shared_memory_name)
+        cls._worker = (np.memmap(path, dtype=np.uint32, mode='r', shape=(count,)),
+                       shared_memory, cls._get_columns(shared_memory.buf, count), prefix_len)
+
+
+    @classmethod
+    def _classify_range(cls, start: int, stop: int) -> int:
+        '''
+        Internal function
+
+        Runs in a worker, classifies the addresses from start to stop into the shared result
+        '''
+        addresses, _, columns, prefix_len = cls._worker
+        cls._classify_into(addresses[start:stop], prefix_len, {name: column[start:stop] for name, column in columns.items()})
+        return stop - start
+
+
+
+def _benchmark(count: int = 1 << 25, repeat: int = 3):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "addresses.bin")
+        rng = np.random.default_rng(0)
+        addresses = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+        addresses.tofile(path)
+        expected = IPv4ParallelClassifier.classify(addresses[:1 << 20], 20)
+        del addresses
+
+        def best_time(workers):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with IPv4ParallelClassifier.classify_file(path, 20, workers) as result:
+                    times.append(time.perf_counter() - start)
+                    for name, column in expected.items():
+                        assert(np.array_equal(getattr(result, name)[:1 << 20], column))
+            return min(times)
+
+        baseline = best_time(0)
+        print(f"{count:,} addresses, {os.cpu_count()} CPUs")
+        print(f"in process: {baseline:8.3f}s  {count / baseline:>14,.0f} addresses/s")
+
+        worker_counts = [1]
+        while worker_counts[-1] < max(os.cpu_count(), 4):
+            worker_counts.append(worker_counts[-1] * 2)
+
+        single = None
+        for workers in worker_counts:
+            elapsed = best_time(workers)
+            single = single or elapsed
+            print(f"{workers:>3} workers: {elapsed:8.3f}s  {count / elapsed:>14,.0f} addresses/s"
+                  f"  speedup {single / elapsed:5.2f}x  efficiency {single / elapsed / workers:4.0%}")
+
+
+# Run from the Version-3 directory: python -m imports.ip_parallel
+if __name__ == "__main__":
+    _benchmark()
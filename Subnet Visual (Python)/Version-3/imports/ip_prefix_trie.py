@@ -0,0 +1,380 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+
+
+class _TrieNode:
+    '''
+    Internal class
+
+    A (network, prefix_len) key with up to two children, indexed by the first bit after the prefix.
+    Nodes which were only created to join two branches hold no value (has_value False)
+    '''
+    __slots__ = ('network', 'prefix_len', 'netmask', 'children', 'value', 'has_value')
+
+    def __init__(self, network: int, prefix_len: int):
+        self.network = network
+        self.prefix_len = prefix_len
+        self.netmask = IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+        self.children = [None, None]
+        self.value = None
+        self.has_value = False
+
+    def contains(self, network: int, prefix_len: int) -> bool:
+        return self.prefix_len <= prefix_len and (network & self.netmask) == self.network
+
+    def get_branch(self, network: int) -> int:
+        '''
+        Returns the child a longer network belongs under
+        '''
+        return (network >> (31 - self.prefix_len)) & 1
+
+
+
+@dataclass
+class IPv4TrieMatches:
+    '''
+    Batched query results, one entry per address. prefix_len is -1 where no stored prefix contains the
+    address, count is how many stored prefixes contain it
+    '''
+    network: np.ndarray
+    prefix_len: np.ndarray
+    count: np.ndarray
+
+    def __len__(self):
+        return len(self.network)
+
+
+
+class IPv4PrefixTrie:
+    '''
+    A path compressed binary (Patricia) trie of (network, prefix_len) prefixes, each with an optional value.
+
+    Every node holds a whole prefix, so a chain of single children is one node and the trie never has more
+    than 2n - 1 nodes for n prefixes. Keys are masked with the IPv4CIDRInfo netmask of their prefix length
+    on the way in. A node which only joins two branches is added when a prefix splits a path and dropped
+    again when a delete leaves it with a single child.
+
+    containing() walks down from the root and collects every stored prefix on the way, so it answers
+    "which prefixes contain this address" from least to most specific. contained_in() finds the block and
+    returns its whole subtree. match_arrays() runs the walk for a whole address array at once over a flat
+    array copy of the trie, moving every address one level down per round
+    '''
+    def __init__(self):
+        self._root = None
+        self._size = 0
+        self._arrays = None
+
+
+    @classmethod
+    def from_special_registry(cls) -> 'IPv4PrefixTrie':
+        '''
+        Returns a trie of the IANA special-purpose registry (IPv4Utility._SPECIAL_IANA_IPS), with the registry
+        entries as values. containing(ip) in reverse is IPv4Utility._get_special_iana_ip_notes(ip)
+        '''
+        trie = cls()
+        for prefix_len, blocks in IPv4Utility._SPECIAL_IANA_IPS.items():
+            for network, block in blocks.items():
+                trie.insert(network, prefix_len, block)
+        return trie
+
+
+    def __len__(self):
+        return self._size
+
+
+    def __contains__(self, key) -> bool:
+        return self._find(*key) is not None
+
+
+    def __iter__(self):
+        '''
+        Yields (network, prefix_len, value) for every stored prefix, sorted by network then prefix length
+        '''
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                yield node.network, node.prefix_len, node.value
+            stack.extend(child for child in reversed(node.children) if child)
+
+
+    def insert(self, network: int, prefix_len: int, value=None):
+        '''
+        Stores <network>/<prefix_len> (host bits are ignored) with a value, replacing the value if it is already stored
+        '''
+        # Keys taken from arrays are numpy scalars, which have no bit_length and would be stored as is
+        network, prefix_len = int(network), int(prefix_len)
+        assert(0 <= prefix_len <= 32)
+        network &= IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+
+        parent, node = None, self._root
+        while node is not None and node.contains(network, prefix_len) and node.prefix_len < prefix_len:
+            parent, node = node, node.children[node.get_branch(network)]
+
+        if node is not None and node.prefix_len == prefix_len and node.network == network:
+            new_node = node
+        else:
+            new_node = _TrieNode(network, prefix_len)
+            if node is not None:
+                new_node = self._join(new_node, node)
+            self._replace_child(parent, node, new_node, network)
+
+            # _join may return a branch node above the new prefix
+            while new_node.prefix_len != prefix_len:
+                new_node = new_node.children[new_node.get_branch(network)]
+
+        if not new_node.has_value:
+            self._size += 1
+        new_node.value = value
+        new_node.has_value = True
+        self._arrays = None
+
+
+    def delete(self, network: int, prefix_len: int):
+        '''
+        Removes <network>/<prefix_len>, raises KeyError if it is not stored
+        '''
+        network, prefix_len = int(network), int(prefix_len)
+        network &= IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+        path = self._get_path(network, prefix_len)
+        if not path or path[-1].prefix_len != prefix_len or path[-1].network != network or not path[-1].has_value:
+            raise KeyError(IPv4Utility._format_cidr_block(network, prefix_len))
+
+        node = path[-1]
+        node.value = None
+        node.has_value = False
+        self._size -= 1
+        self._arrays = None
+
+        # A node without a value is only kept while it joins two branches
+        while path and not path[-1].has_value:
+            node = path.pop()
+            children = [child for child in node.children if child]
+            if len(children) == 2:
+                break
+            self._replace_child(path[-1] if path else None, node, children[0] if children else None, node.network)
+
+
+    def get(self, network: int, prefix_len: int, default=None):
+        node = self._find(network, prefix_len)
+        return node.value if node is not None else default
+
+
+    def containing(self, network: int, prefix_len: int = 32) -> list:
+        '''
+        Returns the (network, prefix_len, value) of every stored prefix which contains <network>/<prefix_len>
+        (an address by default), from the least to the most specific. The block itself counts if it is stored
+        '''
+        network, prefix_len = int(network), int(prefix_len)
+        network &= IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+        return [(node.network, node.prefix_len, node.value) for node in self._get_path(network, prefix_len) if node.has_value]
+
+
+    def longest_match(self, ip_addr: int):
+        '''
+        Returns the (network, prefix_len, value) of the most specific stored prefix containing ip_addr, None if there is none
+        '''
+        matches = self.containing(ip_addr)
+        return matches[-1] if matches else None
+
+
+    def contained_in(self, network: int, prefix_len: int) -> list:
+        '''
+        Returns the (network, prefix_len, value) of every stored prefix inside <network>/<prefix_len>
+        (including the block itself), sorted by network then prefix length
+        '''
+        network, prefix_len = int(network), int(prefix_len)
+        network &= IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+        node = self._root
+        while node is not None and node.prefix_len < prefix_len and node.contains(network, prefix_len):
+            node = node.children[node.get_branch(network)]
+
+        if node is None or not (node.prefix_len >= prefix_len and (node.network & IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric) == network):
+            return []
+
+        subtrie = IPv4PrefixTrie()
+        subtrie._root = node
+        return list(subtrie)
+
+
+    def match_arrays(self, ip_addrs) -> IPv4TrieMatches:
+        '''
+        Returns the most specific stored prefix and the number of stored prefixes containing each address of an array
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32)
+        flat = ip_addrs.ravel()
+        networks = np.zeros(flat.shape, dtype=np.uint32)
+        prefix_lens = np.full(flat.shape, -1, dtype=np.int8)
+        counts = np.zeros(flat.shape, dtype=np.uint8)
+
+        node_networks, node_netmasks, node_prefix_lens, node_has_value, node_children = self._get_arrays()
+
+        # Every address starts at the root and moves down one node per round, at most 33 rounds.
+        # A node is always reached after its parent, so a more specific match overwrites a less specific one
+        active = np.arange(flat.size) if node_networks.size else np.zeros(0, dtype=np.int64)
+        nodes = np.zeros(flat.size, dtype=np.int32)
+        while active.size:
+            addresses = flat[active]
+            ids = nodes[active]
+            inside = (addresses & node_netmasks[ids]) == node_networks[ids]
+            active, addresses, ids = active[inside], addresses[inside], ids[inside]
+
+            matched = node_has_value[ids]
+            networks[active[matched]] = node_networks[ids[matched]]
+            prefix_lens[active[matched]] = node_prefix_lens[ids[matched]]
+            counts[active[matched]] += 1
+
+            branches = (addresses >> (31 - np.minimum(node_prefix_lens[ids], 31)).astype(np.uint32)) & np.uint32(1)
+            children = node_children[ids, branches]
+            active = active[children >= 0]
+            nodes[active] = children[children >= 0]
+
+        return IPv4TrieMatches(networks.reshape(ip_addrs.shape), prefix_lens.reshape(ip_addrs.shape), counts.reshape(ip_addrs.shape))
+
+
+    def _get_arrays(self) -> tuple:
+        '''
+        Internal function
+
+        Returns the trie flattened for match_arrays: network, netmask, prefix length, has value and the two
+        child ids (-1 for none) of every node, the root first. Rebuilt on the first query after a change
+        '''
+        if self._arrays is None:
+            nodes = [self._root] if self._root else []
+            children = []
+            for node in nodes:
+                ids = []
+                for child in node.children:
+                    ids.append(len(nodes) if child else -1)
+                    if child:
+                        nodes.append(child)
+                children.append(ids)
+
+            self._arrays = (np.array([node.network for node in nodes], dtype=np.uint32),
+                            np.array([node.netmask for node in nodes], dtype=np.uint32),
+                            np.array([node.prefix_len for node in nodes], dtype=np.int8),
+                            np.array([node.has_value for node in nodes], dtype=bool),
+                            np.array(children, dtype=np.int32).reshape(-1, 2))
+        return self._arrays
+
+
+    def _find(self, network: int, prefix_len: int):
+        '''
+        Internal function
+
+        Returns the node storing <network>/<prefix_len>, None if it is not stored
+        '''
+        network, prefix_len = int(network), int(prefix_len)
+        network &= IPv4Utility._CIDR_INFO[prefix_len].netmask.numeric
+        path = self._get_path(network, prefix_len)
+        if path and path[-1].prefix_len == prefix_len and path[-1].network == network and path[-1].has_value:
+            return path[-1]
+        return None
+
+
+    def _get_path(self, network: int, prefix_len: int) -> list:
+        '''
+        Internal function
+
+        Returns the nodes from the root whose prefix contains <network>/<prefix_len> (a masked network)
+        '''
+        path = []
+        node = self._root
+        while node is not None and node.contains(network, prefix_len):
+            path.append(node)
+            if node.prefix_len == prefix_len:
+                break
+            node = node.children[node.get_branch(network)]
+        return path
+
+
+    def _join(self, new_node: _TrieNode, node: _TrieNode) -> _TrieNode:
+        '''
+        Internal function
+
+        Returns the subtree holding both new_node and the existing node, which is not inside new_node's parent path
+        '''
+        # The length of the prefix both networks share, capped by both prefix lengths
+        common = min(32 - (new_node.network ^ node.network).bit_length(), new_node.prefix_len, node.prefix_len)
+
+        if common == new_node.prefix_len:
+            new_node.children[new_node.get_branch(node.network)] = node
+            return new_node
+
+        branch = _TrieNode(new_node.network & IPv4Utility._CIDR_INFO[common].netmask.numeric, common)
+        branch.children[branch.get_branch(new_node.network)] = new_node
+        branch.children[branch.get_branch(node.network)] = node
+        return branch
+
+
+    def _replace_child(self, parent, old_node, new_node, network: int):
+        '''
+        Internal function
+
+        Puts new_node (or None) where old_node was under parent (the root if parent is None)
+        '''
+        if parent is None:
+            self._root = new_node
+        else:
+            parent.children[parent.get_branch(network if old_node is None else old_node.network)] = new_node
+
+
+
+def _scalar_longest_matches(trie: IPv4PrefixTrie, ip_addrs: list) -> list:
+    '''
+    Internal function
+
+    The one address at a time path, used as the benchmark baseline
+    '''
+    return [trie.longest_match(ip_addr) for ip_addr in ip_addrs]
+
+
+def _benchmark(prefixes: int = 200_000, count: int = 1_000_000, scalar_count: int = 50_000):
+    rng = np.random.default_rng(0)
+    prefix_lens = rng.integers(8, 25, size=prefixes)
+    networks = rng.integers(0, 1 << 32, size=prefixes, dtype=np.uint64) & (((1 << 32) - 1) << (32 - prefix_lens)).astype(np.uint64)
+    ip_addrs = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+
+    trie = IPv4PrefixTrie()
+    start = time.perf_counter()
+    for network, prefix_len in zip(networks.tolist(), prefix_lens.tolist()):
+        trie.insert(network, prefix_len, (network, prefix_len))
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for network, prefix_len in zip(networks[::2].tolist(), prefix_lens[::2].tolist()):
+        if (network, prefix_len) in trie:
+            trie.delete(network, prefix_len)
+    delete_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = _scalar_longest_matches(trie, ip_addrs[:scalar_count].tolist())
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = trie.match_arrays(ip_addrs)
+    batch_time = time.perf_counter() - start
+
+    for ip_index, match in enumerate(scalar):
+        assert(match is None if matches.prefix_len[ip_index] < 0 else match[:2] == (matches.network[ip_index], matches.prefix_len[ip_index]))
+
+    registry = IPv4PrefixTrie.from_special_registry()
+    for ip_addr in ip_addrs[:2000].tolist() + [0, 0xC0000008, 0xC00000AA, 0xFFFFFFFF, 0x7F000001]:
+        notes = [value for _, _, value in reversed(registry.containing(ip_addr))]
+        assert(notes == IPv4Utility._get_special_iana_ip_notes(ip_addr))
+
+    scalar_rate = scalar_count / scalar_time
+    batch_rate = count / batch_time
+    print(f"{len(trie):,} prefixes after {prefixes:,} inserts ({insert_time:.2f}s) and deletes ({delete_time:.2f}s)")
+    print(f"scalar: {scalar_count:>10,} addresses in {scalar_time:8.3f}s  {scalar_rate:>14,.0f} addresses/s")
+    print(f"batch:  {count:>10,} addresses in {batch_time:8.3f}s  {batch_rate:>14,.0f} addresses/s")
+    print(f"speedup: {batch_rate / scalar_rate:.1f}x")
+
+
+# Run from the Version-3 directory: python -m imports.ip_prefix_trie
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,411 @@
+import re
+import socket
+import struct
+import time
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+from imports.ip_aggregate import IPv4Aggregator
+
+
+class IPv4RangeSet:
+    '''
+    A set of IPv4 addresses stored as sorted, disjoint and non-adjacent inclusive (start, end) intervals.
+
+    The intervals are int64 arrays (like IPv4Aggregator, so end + 1 never wraps at 255.255.255.255) and
+    kept canonical, so two sets holding the same addresses compare equal. Union is one sweep over both
+    interval lists (IPv4Aggregator.merge_ranges; the stable sort merges the two sorted lists in linear time),
+    complement is the gaps between the intervals, and intersection and difference follow from those two.
+    Membership of a whole address array is one binary search per address
+    '''
+    _LAST_ADDRESS = 0xFFFFFFFF
+
+    def __init__(self, starts=(), ends=()):
+        '''
+        starts and ends are the inclusive bounds of any intervals (overlapping, adjacent or unsorted)
+        '''
+        starts = np.asarray(starts, dtype=np.int64).ravel()
+        ends = np.asarray(ends, dtype=np.int64).ravel()
+        assert(starts.shape == ends.shape)
+        assert(starts.size == 0 or (starts.min() >= 0 and ends.max() <= self._LAST_ADDRESS))
+        self.starts, self.ends = IPv4Aggregator.merge_ranges(starts, ends)
+
+
+    @classmethod
+    def _from_canonical(cls, starts: np.ndarray, ends: np.ndarray) -> 'IPv4RangeSet':
+        '''
+        Internal function
+
+        Wraps intervals which are already sorted, disjoint and non-adjacent without merging them again
+        '''
+        result = cls.__new__(cls)
+        result.starts, result.ends = starts, ends
+        return result
+
+
+    @classmethod
+    def from_blocks(cls, networks, prefix_lens) -> 'IPv4RangeSet':
+        '''
+        Returns the set of the <network>/<prefix_len> blocks (arrays, or a single prefix length for every network)
+        '''
+        return cls(*IPv4Aggregator.blocks_to_ranges(networks, prefix_lens))
+
+
+    @classmethod
+    def from_cidrs(cls, cidrs) -> 'IPv4RangeSet':
+        '''
+        Returns the set of CIDR blocks given as text, e.g. ["10.0.0.0/8", "192.0.2.1"]. A bare address is a /32
+        '''
+        networks, prefix_lens = [], []
+        for cidr in cidrs:
+            network, prefix_len = _parse_cidr(cidr)
+            networks.append(network)
+            prefix_lens.append(prefix_len)
+        return cls.from_blocks(networks, prefix_lens)
+
+
+    @classmethod
+    def all(cls) -> 'IPv4RangeSet':
+        return cls._from_canonical(np.array([0], dtype=np.int64), np.array([cls._LAST_ADDRESS], dtype=np.int64))
+
+
+    # --------- Set algebra -----------
+
+    def union(self, other: 'IPv4RangeSet') -> 'IPv4RangeSet':
+        return self._from_canonical(*IPv4Aggregator.merge_ranges(np.concatenate((self.starts, other.starts)),
+                                                                 np.concatenate((self.ends, other.ends))))
+
+
+    def complement(self) -> 'IPv4RangeSet':
+        '''
+        Returns every address which is not in the set: the gaps before, between and after the intervals
+        '''
+        starts = np.concatenate(([0], self.ends + 1))
+        ends = np.concatenate((self.starts - 1, [self._LAST_ADDRESS]))
+        keep = starts <= ends
+        return self._from_canonical(starts[keep], ends[keep])
+
+
+    def intersection(self, other: 'IPv4RangeSet') -> 'IPv4RangeSet':
+        return self.complement().union(other.complement()).complement()
+
+
+    def difference(self, other: 'IPv4RangeSet') -> 'IPv4RangeSet':
+        return self.complement().union(other).complement()
+
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __invert__ = complement
+
+
+    # --------- Queries -----------
+
+    def contains(self, ip_addrs) -> np.ndarray:
+        '''
+        Returns which addresses of an array are in the set, as a bool array of the same shape
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.int64)
+        index = np.searchsorted(self.starts, ip_addrs, side="right") - 1
+        return (index >= 0) & (ip_addrs <= self.ends[np.maximum(index, 0)] if self.ends.size else False)
+
+
+    def __contains__(self, ip_addr: int) -> bool:
+        index = int(np.searchsorted(self.starts, ip_addr, side="right")) - 1
+        return index >= 0 and ip_addr <= self.ends[index]
+
+
+    def __len__(self):
+        '''
+        The number of addresses in the set
+        '''
+        return int((self.ends - self.starts + 1).sum())
+
+
+    def __eq__(self, other):
+        if not isinstance(other, IPv4RangeSet):
+            return NotImplemented
+        return np.array_equal(self.starts, other.starts) and np.array_equal(self.ends, other.ends)
+
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self):,} addresses in {self.starts.size:,} ranges>"
+
+
+    # --------- Output -----------
+
+    def iter_ranges(self):
+        '''
+        Yields the (start_ip, end_ip) intervals in order
+        '''
+        return zip(self.starts.tolist(), self.ends.tolist())
+
+
+    def iter_blocks(self):
+        '''
+        Yields the fewest (network, prefix_len) CIDR blocks covering exactly the set, in order
+        '''
+        return IPv4Utility._iter_blocks_from_ip_ranges(self.iter_ranges())
+
+
+    def to_cidrs(self) -> list:
+        return [IPv4Utility._format_cidr_block(network, prefix_len) for network, prefix_len in self.iter_blocks()]
+
+
+
+def _parse_address(text: str) -> int:
+    '''
+    Internal function
+
+    Returns the numeric address of dotted decimal text, checked like IPv4Info._check_ip
+    '''
+    try:
+        return struct.unpack('!I', socket.inet_pton(socket.AF_INET, text))[0]
+    except OSError:
+        raise ValueError(f"{text!r} is not an IPv4 address") from None
+
+
+def _parse_cidr(text: str) -> (int, int):
+    '''
+    Internal function
+
+    Returns the (network, prefix_len) of "<address>/<prefix_len>" or of a bare address (a /32).
+    Host bits set in the address are ignored, like IPv4Utility._get_network_ip
+    '''
+    address, separator, prefix_len = text.strip().partition('/')
+    if not separator:
+        return _parse_address(address), 32
+    if not prefix_len.isdigit() or int(prefix_len) > 32:
+        raise ValueError(f"{text!r} does not have a prefix length between 0 and 32")
+    return IPv4Utility._get_network_ip(_parse_address(address), int(prefix_len)), int(prefix_len)
+
+
+
+class IPv4QueryError(ValueError):
+    '''
+    Raised for a query which can not be parsed, position is the offset of the problem in the query text
+    '''
+    def __init__(self, message: str, query: str, position: int):
+        super().__init__(f"{message} at position {position}: {query}")
+        self.query = query
+        self.position = position
+
+
+
+class IPv4RangeQuery:
+    '''
+    A set expression over CIDR blocks, compiled once into an IPv4RangeSet, e.g.
+
+        10.0.0.0/8 - 10.1.0.0/16 & private & !special
+
+    Operands are CIDR blocks, bare addresses (/32), named sets (NAMES) and parenthesized expressions.
+    "!" is the complement and binds tightest. "|" (union), "&" (intersection) and "-" (difference) have
+    the same precedence and apply from left to right, so the example reads
+    ((10.0.0.0/8 - 10.1.0.0/16) & private) & !special; use parentheses for anything else.
+
+    Matching a list of addresses against the compiled set is a vectorized binary search, instead of
+    running the _is_public_or_private / _get_special_iana_ip_notes checks on every address
+    '''
+    NAMES = ('all', 'none', 'private', 'special', 'class_a', 'class_b', 'class_c', 'class_d', 'class_e')
+
+    # 10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16 (https://datatracker.ietf.org/doc/html/rfc1918)
+    _PRIVATE_BLOCKS = ((167772160, 8), (2886729728, 12), (3232235520, 16))
+
+    _TOKEN = re.compile(r"\s*(?:(?P<cidr>\d+\.\d+\.\d+\.\d+(?:/\d+)?)|(?P<name>[A-Za-z_]\w*)|(?P<op>[|&!()-]))")
+
+    _named_sets = None
+
+    def __init__(self, text: str):
+        self.text = text
+        self._tokens = self._tokenize(text)
+        self._index = 0
+
+        self.range_set = self._parse_expression()
+        if self._index < len(self._tokens):
+            self._fail("Unexpected " + repr(self._tokens[self._index][1]))
+        del self._tokens
+
+
+    def matches(self, ip_addrs) -> np.ndarray:
+        '''
+        Returns which addresses of an array the query selects
+        '''
+        return self.range_set.contains(ip_addrs)
+
+
+    def __contains__(self, ip_addr: int) -> bool:
+        return ip_addr in self.range_set
+
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.text!r}: {len(self.range_set):,} addresses>"
+
+
+    @classmethod
+    def get_named_set(cls, name: str) -> IPv4RangeSet:
+        '''
+        Returns one of the NAMES as an IPv4RangeSet. They are compiled on first use:
+        private from the RFC1918 blocks, special from IPv4Utility._SPECIAL_IANA_IPS without the
+        Private-Use blocks (like the special notes next to Public / Private in the summary) and
+        the classes from IPv4Utility._get_ip_class of every first octet
+        '''
+        if cls._named_sets is None:
+            special = [(network, prefix_len) for prefix_len, blocks in IPv4Utility._SPECIAL_IANA_IPS.items()
+                       for network, block in blocks.items() if block[1] != 'Private-Use']
+            named_sets = {
+                'all': IPv4RangeSet.all(),
+                'none': IPv4RangeSet(),
+                'private': IPv4RangeSet.from_blocks(*zip(*cls._PRIVATE_BLOCKS)),
+                'special': IPv4RangeSet.from_blocks(*zip(*special)),
+            }
+            for ip_class in "ABCDE":
+                octets = [octet for octet in range(256) if IPv4Utility._get_ip_class(octet << 24)[0] == ip_class]
+                named_sets['class_' + ip_class.lower()] = IPv4RangeSet.from_blocks(np.array(octets, dtype=np.uint32) << 24, 8)
+            cls._named_sets = named_sets
+
+        return cls._named_sets[name]
+
+
+    def _tokenize(self, text: str) -> list:
+        '''
+        Internal function
+
+        Returns the (kind, text, position) tokens of the query
+        '''
+        tokens = []
+        position = 0
+        while text[position:].strip():
+            match = self._TOKEN.match(text, position)
+            if match is None:
+                self._fail("Unexpected " + repr(text[position:].split()[0]), len(text) - len(text[position:].lstrip()))
+            kind = match.lastgroup
+            tokens.append((kind, match.group(kind), match.start(kind)))
+            position = match.end()
+        return tokens
+
+
+    def _fail(self, message: str, position: int = None):
+        '''
+        Internal function
+        '''
+        if position is None:
+            position = self._tokens[self._index][2] if self._index < len(self._tokens) else len(self.text)
+        raise IPv4QueryError(message, self.text, position)
+
+
+    def _peek(self) -> (str, str):
+        '''
+        Internal function
+        '''
+        return self._tokens[self._index][:2] if self._index < len(self._tokens) else (None, None)
+
+
+    def _parse_expression(self) -> IPv4RangeSet:
+        '''
+        Internal function
+
+        expression := operand (("|" | "&" | "-") operand)*
+        '''
+        result = self._parse_operand()
+        while self._peek() in (('op', '|'), ('op', '&'), ('op', '-')):
+            operator = self._peek()[1]
+            self._index += 1
+            operand = self._parse_operand()
+            if operator == '|':
+                result = result | operand
+            elif operator == '&':
+                result = result & operand
+            else:
+                result = result - operand
+        return result
+
+
+    def _parse_operand(self) -> IPv4RangeSet:
+        '''
+        Internal function
+
+        operand := "!" operand | "(" expression ")" | cidr | name
+        '''
+        kind, text = self._peek()
+        if kind is None:
+            self._fail("Missing operand")
+        self._index += 1
+
+        if (kind, text) == ('op', '!'):
+            return ~self._parse_operand()
+
+        if (kind, text) == ('op', '('):
+            result = self._parse_expression()
+            if self._peek() != ('op', ')'):
+                self._fail("Missing ')'")
+            self._index += 1
+            return result
+
+        if kind == 'cidr':
+            try:
+                return IPv4RangeSet.from_blocks(*_parse_cidr(text))
+            except ValueError as error:
+                self._index -= 1
+                self._fail(str(error))
+
+        if kind == 'name':
+            if text.lower() not in self.NAMES:
+                self._index -= 1
+                self._fail(f"Unknown set {text!r} (known: {', '.join(self.NAMES)})")
+            return self.get_named_set(text.lower())
+
+        self._index -= 1
+        self._fail("Unexpected " + repr(text))
+
+
+
+def _scalar_matches(ip_addrs: list) -> list:
+    '''
+    Internal function
+
+    The one address at a time path for "10.0.0.0/8 - 10.1.0.0/16 & private & !special", as the benchmark baseline
+    '''
+    results = []
+    for ip in ip_addrs:
+        in_block = (ip & 4278190080) == 167772160 and not (ip & 4294901760) == 167837696
+        private = (ip & 4278190080) == 167772160 or (ip & 4293918720) == 2886729728 or (ip & 4294901760) == 3232235520
+        special = any(block[1] != 'Private-Use' for block in IPv4Utility._get_special_iana_ip_notes(ip))
+        results.append(in_block and private and not special)
+    return results
+
+
+def _benchmark(count: int = 10_000_000, scalar_count: int = 200_000):
+    rng = np.random.default_rng(0)
+    ip_addrs = np.concatenate([rng.integers(0, 1 << 32, size=count // 2, dtype=np.uint64),
+                               rng.integers(0x0A000000, 0x0B000000, size=count - count // 2, dtype=np.uint64)]).astype(np.uint32)
+    text = "10.0.0.0/8 - 10.1.0.0/16 & private & !special"
+
+    start = time.perf_counter()
+    scalar = _scalar_matches(ip_addrs[:scalar_count].tolist())
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    query = IPv4RangeQuery(text)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = query.matches(ip_addrs)
+    query_time = time.perf_counter() - start
+
+    assert(matches[:scalar_count].tolist() == scalar)
+    assert(query.range_set.to_cidrs() == ['10.0.0.0/16', '10.2.0.0/15', '10.4.0.0/14', '10.8.0.0/13', '10.16.0.0/12',
+                                          '10.32.0.0/11', '10.64.0.0/10', '10.128.0.0/9'])
+
+    scalar_rate = scalar_count / scalar_time
+    query_rate = count / query_time
+    print(f"{query!r}, compiled in {compile_time * 1000:.2f} ms")
+    print(f"scalar: {scalar_count:>12,} addresses in {scalar_time:8.3f}s  {scalar_rate:>14,.0f} addresses/s")
+    print(f"query:  {count:>12,} addresses in {query_time:8.3f}s  {query_rate:>14,.0f} addresses/s  ({int(matches.sum()):,} matched)")
+    print(f"speedup: {query_rate / scalar_rate:.1f}x")
+
+
+# Run from the Version-3 directory: python -m imports.ip_range_set
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,837 @@
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+from imports.ip_aggregate import IPv4Aggregator
+
+
+# Every container holds the low 16 bits of the addresses which share their high 16 bits
+_CONTAINER_VALUES = 1 << 16
+_BITMAP_BYTES = _CONTAINER_VALUES // 8
+
+# An array container only makes sense while it is smaller than a bitmap
+_ARRAY_MAX = _BITMAP_BYTES // 2
+
+_BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def _values_to_bitmap(values: np.ndarray) -> bytearray:
+    '''
+    Internal function
+
+    Returns the 8 KiB bitmap (bit v & 7 of byte v >> 3) of a uint16 array
+    '''
+    mask = np.zeros(_CONTAINER_VALUES, dtype=bool)
+    mask[values] = True
+    return bytearray(np.packbits(mask, bitorder="little").tobytes())
+
+
+def _bitmap_to_values(bitmap) -> np.ndarray:
+    '''
+    Internal function
+
+    Returns the sorted uint16 values set in a bitmap. Only the non zero bytes are unpacked
+    '''
+    data = np.frombuffer(bitmap, dtype=np.uint8)
+    nonzero = np.flatnonzero(data)
+    rows, columns = np.nonzero(np.unpackbits(data[nonzero], bitorder="little").reshape(-1, 8))
+    return (nonzero[rows] * 8 + columns).astype(np.uint16)
+
+
+def _values_to_runs(values: np.ndarray) -> (np.ndarray, np.ndarray):
+    '''
+    Internal function
+
+    Returns the first and last value of every run of consecutive values in a sorted uint16 array
+    '''
+    breaks = np.flatnonzero(np.diff(values.astype(np.int32)) != 1) + 1
+    return values[np.concatenate(([0], breaks))], values[np.concatenate((breaks - 1, [values.size - 1]))]
+
+
+def _runs_to_values(starts, lasts) -> np.ndarray:
+    '''
+    Internal function
+
+    Returns the sorted uint16 values covered by the runs from starts to lasts (inclusive)
+    '''
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lasts, dtype=np.int64) - starts + 1
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return (np.repeat(starts, lengths) + offsets).astype(np.uint16)
+
+
+def _to_array(values) -> array:
+    '''
+    Internal function
+    '''
+    result = array('H')
+    result.frombytes(np.asarray(values, dtype=np.uint16).tobytes())
+    return result
+
+
+
+class _ArrayContainer:
+    '''
+    Internal class
+
+    A sorted array('H') of values, 2 bytes per address
+    '''
+    __slots__ = ('values',)
+    kind = "array"
+
+    def __init__(self, values: array):
+        self.values = values
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return 2 * len(self.values)
+
+    def copy(self):
+        return _ArrayContainer(array('H', self.values))
+
+    def contains(self, value: int) -> bool:
+        index = bisect_left(self.values, value)
+        return index < len(self.values) and self.values[index] == value
+
+    def rank(self, value: int) -> int:
+        return bisect_right(self.values, value)
+
+    def select(self, index: int) -> int:
+        return self.values[index]
+
+    def to_numpy(self) -> np.ndarray:
+        return np.frombuffer(self.values, dtype=np.uint16)
+
+    def to_bits(self) -> int:
+        return int.from_bytes(_values_to_bitmap(self.to_numpy()), "little")
+
+    def iter_runs(self):
+        values = self.values
+        start = 0
+        for index in range(1, len(values) + 1):
+            if index == len(values) or values[index] != values[index - 1] + 1:
+                yield values[start], values[index - 1]
+                start = index
+
+    def add(self, value: int):
+        if self.contains(value):
+            return self
+        insort(self.values, value)
+        return self if len(self.values) <= _ARRAY_MAX else _make_container(self.to_numpy())
+
+    def discard(self, value: int):
+        index = bisect_left(self.values, value)
+        if index < len(self.values) and self.values[index] == value:
+            del self.values[index]
+        return self if self.values else None
+
+
+
+class _BitmapContainer:
+    '''
+    Internal class
+
+    A 65,536 bit bitmap, a fixed 8 KiB whatever the number of addresses
+    '''
+    __slots__ = ('bitmap', 'cardinality')
+    kind = "bitmap"
+    nbytes = _BITMAP_BYTES
+
+    def __init__(self, bitmap: bytearray, cardinality: int):
+        self.bitmap = bitmap
+        self.cardinality = cardinality
+
+    def copy(self):
+        return _BitmapContainer(bytearray(self.bitmap), self.cardinality)
+
+    def contains(self, value: int) -> bool:
+        return bool((self.bitmap[value >> 3] >> (value & 7)) & 1)
+
+    def rank(self, value: int) -> int:
+        whole_bytes = int.from_bytes(self.bitmap[:value >> 3], "little").bit_count()
+        return whole_bytes + (self.bitmap[value >> 3] & ((2 << (value & 7)) - 1)).bit_count()
+
+    def select(self, index: int) -> int:
+        counts = np.cumsum(_BYTE_POPCOUNT[np.frombuffer(self.bitmap, dtype=np.uint8)], dtype=np.int32)
+        byte_index = int(np.searchsorted(counts, index, side="right"))
+        index -= int(counts[byte_index - 1]) if byte_index else 0
+
+        byte = self.bitmap[byte_index]
+        for bit in range(8):
+            if (byte >> bit) & 1:
+                if index == 0:
+                    return byte_index * 8 + bit
+                index -= 1
+
+    def to_numpy(self) -> np.ndarray:
+        return _bitmap_to_values(self.bitmap)
+
+    def to_bits(self) -> int:
+        return int.from_bytes(self.bitmap, "little")
+
+    def iter_runs(self):
+        starts, lasts = _values_to_runs(self.to_numpy())
+        return zip(starts.tolist(), lasts.tolist())
+
+    def add(self, value: int):
+        if not self.contains(value):
+            self.bitmap[value >> 3] |= 1 << (value & 7)
+            self.cardinality += 1
+        return self
+
+    def discard(self, value: int):
+        if self.contains(value):
+            self.bitmap[value >> 3] &= ~(1 << (value & 7)) & 0xFF
+            self.cardinality -= 1
+        return self if self.cardinality > _ARRAY_MAX else _make_container(self.to_numpy())
+
+
+
+class _RunContainer:
+    '''
+    Internal class
+
+    Sorted runs of consecutive values, as their first and last value (array('H') each), 4 bytes per run
+    '''
+    __slots__ = ('starts', 'lasts', 'cardinality')
+    kind = "run"
+
+    def __init__(self, starts: array, lasts: array):
+        self.starts = starts
+        self.lasts = lasts
+        self.cardinality = sum(lasts) - sum(starts) + len(starts)
+
+    @property
+    def nbytes(self) -> int:
+        return 4 * len(self.starts)
+
+    def copy(self):
+        return _RunContainer(array('H', self.starts), array('H', self.lasts))
+
+    def contains(self, value: int) -> bool:
+        index = bisect_right(self.starts, value) - 1
+        return index >= 0 and value <= self.lasts[index]
+
+    def rank(self, value: int) -> int:
+        index = bisect_right(self.starts, value)
+        if index == 0:
+            return 0
+        before = sum(self.lasts[:index - 1]) - sum(self.starts[:index - 1]) + index - 1
+        return before + min(value, self.lasts[index - 1]) - self.starts[index - 1] + 1
+
+    def select(self, index: int) -> int:
+        for start, last in zip(self.starts, self.lasts):
+            if index <= last - start:
+                return start + index
+            index -= last - start + 1
+        raise IndexError("run container index out of range")
+
+    def to_numpy(self) -> np.ndarray:
+        return _runs_to_values(self.starts, self.lasts)
+
+    def to_bits(self) -> int:
+        bits = 0
+        for start, last in zip(self.starts, self.lasts):
+            bits |= ((1 << (last - start + 1)) - 1) << start
+        return bits
+
+    def iter_runs(self):
+        return zip(self.starts, self.lasts)
+
+    def add(self, value: int):
+        return self if self.contains(value) else _make_container(np.union1d(self.to_numpy(), np.uint16(value)))
+
+    def discard(self, value: int):
+        return _make_container(np.setdiff1d(self.to_numpy(), np.uint16(value))) if self.contains(value) else self
+
+
+
+def _join_arrays(keys: list, containers: list) -> np.ndarray:
+    '''
+    Internal function
+
+    Returns the sorted uint32 addresses of array containers with the given keys (in key order)
+    '''
+    values = np.frombuffer(b"".join(container.values.tobytes() for container in containers), dtype=np.uint16)
+    keys = np.repeat(np.array(keys, dtype=np.uint32), [len(container.values) for container in containers])
+    return (keys << np.uint32(16)) | values
+
+
+def _choose_kind(cardinality: int, runs: int) -> str:
+    '''
+    Internal function
+
+    Returns the smallest container kind for that many values and runs (array, then run, then bitmap on a tie)
+    '''
+    if 2 * cardinality <= min(4 * runs, _BITMAP_BYTES):
+        return "array"
+    return "run" if 4 * runs <= _BITMAP_BYTES else "bitmap"
+
+
+def _sorted_unique(ip_addrs: np.ndarray) -> np.ndarray:
+    '''
+    Internal function
+
+    np.unique by sorting, which beats its hash table on uint32 addresses
+    '''
+    ip_addrs = np.sort(ip_addrs)
+    return ip_addrs[np.concatenate(([True], ip_addrs[1:] != ip_addrs[:-1]))] if ip_addrs.size else ip_addrs
+
+
+def _make_container(values: np.ndarray):
+    '''
+    Internal function
+
+    Returns the smallest container holding a sorted, unique uint16 array, None when it is empty
+    '''
+    if values.size == 0:
+        return None
+
+    kind = _choose_kind(values.size, 1 + int(np.count_nonzero(np.diff(values) != 1)))
+    if kind == "array":
+        return _ArrayContainer(_to_array(values))
+    if kind == "run":
+        starts, lasts = _values_to_runs(values)
+        return _RunContainer(_to_array(starts), _to_array(lasts))
+    return _BitmapContainer(_values_to_bitmap(values), values.size)
+
+
+def _make_container_from_list(values: list):
+    '''
+    Internal function
+
+    _make_container for a sorted, unique list of ints, without numpy for the small lists of sparse sets
+    '''
+    if len(values) > _ARRAY_MAX:
+        return _make_container(np.array(values, dtype=np.uint16))
+    if not values:
+        return None
+
+    runs = 1 + sum(1 for previous, value in zip(values, values[1:]) if value != previous + 1)
+    if _choose_kind(len(values), runs) == "run":
+        return _make_container(np.array(values, dtype=np.uint16))
+    return _ArrayContainer(array('H', values))
+
+
+def _make_container_from_bits(bits: int):
+    '''
+    Internal function
+
+    _make_container for a 65,536 bit int
+    '''
+    cardinality = bits.bit_count()
+    if cardinality == 0:
+        return None
+
+    # A run starts at every set bit whose lower neighbour is clear
+    runs = (bits & ~(bits << 1)).bit_count()
+    bitmap = bytearray(bits.to_bytes(_BITMAP_BYTES, "little"))
+    if _choose_kind(cardinality, runs) == "bitmap":
+        return _BitmapContainer(bitmap, cardinality)
+    return _make_container(_bitmap_to_values(bitmap))
+
+
+def _make_container_from_runs(starts: list, lasts: list):
+    '''
+    Internal function
+
+    _make_container for sorted, disjoint and non-adjacent runs
+    '''
+    kind = _choose_kind(sum(lasts) - sum(starts) + len(starts), len(starts))
+    if kind == "run":
+        return _RunContainer(array('H', starts), array('H', lasts))
+    return _make_container(_runs_to_values(starts, lasts))
+
+
+def _combine_runs(first, second, operation: str):
+    '''
+    Internal function
+
+    Combines two run containers by sweeping the boundaries of their runs
+    '''
+    # Bit 1 flips at the boundaries of first, bit 2 at those of second
+    toggles = {}
+    for side, container in ((1, first), (2, second)):
+        for start, last in container.iter_runs():
+            toggles[start] = toggles.get(start, 0) ^ side
+            toggles[last + 1] = toggles.get(last + 1, 0) ^ side
+
+    keep = {"or": (False, True, True, True), "and": (False, False, False, True), "sub": (False, True, False, False)}[operation]
+    inside = 0
+    starts, lasts = [], []
+    for position in sorted(toggles):
+        was_kept = keep[inside]
+        inside ^= toggles[position]
+        if keep[inside] and not was_kept:
+            starts.append(position)
+        elif was_kept and not keep[inside]:
+            lasts.append(position - 1)
+
+    return _make_container_from_runs(starts, lasts) if starts else None
+
+
+def _combine(first, second, operation: str):
+    '''
+    Internal function
+
+    Returns the container of first | second, first & second or first - second (operation "or", "and", "sub"),
+    None when the result is empty
+    '''
+    if operation == "and" and second.kind == "array" and first.kind != "array":
+        first, second = second, first
+
+    # An array only has to test its own values, and the result is a subset of it
+    if first.kind == "array" and operation != "or":
+        keep = operation == "and"
+        return _make_container_from_list([value for value in first.values if second.contains(value) == keep])
+
+    if first.kind == "array" and second.kind == "array":
+        return _make_container_from_list(sorted(set(first.values).union(second.values)))
+
+    if first.kind == "run" and second.kind == "run":
+        return _combine_runs(first, second, operation)
+
+    if first.kind != "bitmap" and second.kind != "bitmap":
+        first_values, second_values = first.to_numpy(), second.to_numpy()
+        if operation == "or":
+            return _make_container(_sorted_unique(np.concatenate((first_values, second_values))))
+        return _make_container(first_values[np.isin(first_values, second_values, assume_unique=True, invert=operation == "sub")])
+
+    if operation == "or":
+        return _make_container_from_bits(first.to_bits() | second.to_bits())
+    if operation == "and":
+        return _make_container_from_bits(first.to_bits() & second.to_bits())
+    return _make_container_from_bits(first.to_bits() & ~second.to_bits())
+
+
+
+class IPv4RoaringSet:
+    '''
+    A compressed set of IPv4 addresses, partitioned on the high 16 bits of the address.
+
+    Each /16 which holds at least one address gets a container for the low 16 bits, in whichever of three
+    forms is smallest: a sorted array('H') (2 bytes per address), a 65,536 bit bitmap (8 KiB) or a list of
+    runs (4 bytes per run of consecutive addresses). Sparse data stays in arrays, dense /16s become
+    bitmaps and whole blocks or ranges become a single run, instead of about 60 bytes per address
+    in a set of ints.
+
+    Union, intersection and difference walk the two sorted key lists and combine containers pairwise.
+    rank and select use the running total of the container sizes, so count_in_block is two ranks.
+    Blocks and ranges go in and come out through the IPv4Utility CIDR helpers
+    '''
+    def __init__(self, ip_addrs=()):
+        self._keys = []
+        self._containers = []
+        self._cumulative = None
+
+        ip_addrs = np.asarray(ip_addrs, dtype=np.int64).ravel()
+        if ip_addrs.size:
+            assert(ip_addrs.min() >= 0 and ip_addrs.max() <= 0xFFFFFFFF)
+            self._build(_sorted_unique(ip_addrs.astype(np.uint32)))
+
+
+    @classmethod
+    def from_ranges(cls, ip_ranges) -> 'IPv4RoaringSet':
+        '''
+        Returns the set of every address in the inclusive (start_ip, end_ip) ranges
+        '''
+        ip_ranges = list(ip_ranges)
+        result = cls()
+        if not ip_ranges:
+            return result
+
+        starts, ends = IPv4Aggregator.merge_ranges(*zip(*ip_ranges))
+        runs = {}
+        for start_ip, end_ip in zip(starts.tolist(), ends.tolist()):
+            for key in range(start_ip >> 16, (end_ip >> 16) + 1):
+                key_starts, key_lasts = runs.setdefault(key, ([], []))
+                key_starts.append(max(start_ip, key << 16) & 0xFFFF)
+                key_lasts.append(min(end_ip, (key << 16) | 0xFFFF) & 0xFFFF)
+
+        for key, (key_starts, key_lasts) in runs.items():
+            result._keys.append(key)
+            result._containers.append(_make_container_from_runs(key_starts, key_lasts))
+        return result
+
+
+    @classmethod
+    def from_blocks(cls, blocks) -> 'IPv4RoaringSet':
+        '''
+        Returns the set of every address in the (network, prefix_len) blocks
+        '''
+        return cls.from_ranges((IPv4Utility._get_network_ip(network, prefix_len), IPv4Utility._get_broadcast_ip(network, prefix_len))
+                               for network, prefix_len in blocks)
+
+
+    def _build(self, ip_addrs: np.ndarray):
+        '''
+        Internal function
+
+        Fills the empty set from sorted, unique uint32 addresses. The container kinds are picked for every key at once
+        '''
+        if ip_addrs.size == 0:
+            return
+
+        highs = ip_addrs >> 16
+        firsts = np.flatnonzero(np.concatenate(([True], highs[1:] != highs[:-1])))
+        lasts = np.append(firsts[1:], ip_addrs.size)
+        lows = (ip_addrs & 0xFFFF).astype(np.uint16)
+        low_bytes = lows.tobytes()
+
+        # A run starts at the first value of a key and after every gap
+        run_starts = np.ones(ip_addrs.size, dtype=np.int64)
+        run_starts[1:] = np.diff(ip_addrs.astype(np.int64)) != 1
+        run_starts[firsts] = 1
+        runs = np.add.reduceat(run_starts, firsts)
+
+        counts = lasts - firsts
+        is_array = 2 * counts <= np.minimum(4 * runs, _BITMAP_BYTES)
+
+        for key, first, last, key_is_array in zip(highs[firsts].tolist(), firsts.tolist(), lasts.tolist(), is_array.tolist()):
+            if key_is_array:
+                values = array('H')
+                values.frombytes(low_bytes[2 * first:2 * last])
+                container = _ArrayContainer(values)
+            else:
+                container = _make_container(lows[first:last])
+            self._keys.append(key)
+            self._containers.append(container)
+
+
+    # --------- Single addresses -----------
+
+    def add(self, ip_addr: int):
+        assert(0 <= ip_addr <= 0xFFFFFFFF)
+        key, value = ip_addr >> 16, ip_addr & 0xFFFF
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            self._containers[index] = self._containers[index].add(value)
+        else:
+            self._keys.insert(index, key)
+            self._containers.insert(index, _ArrayContainer(array('H', [value])))
+        self._cumulative = None
+
+
+    def discard(self, ip_addr: int):
+        key, value = ip_addr >> 16, ip_addr & 0xFFFF
+        index = bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            return
+
+        container = self._containers[index].discard(value)
+        if container is None:
+            del self._keys[index]
+            del self._containers[index]
+        else:
+            self._containers[index] = container
+        self._cumulative = None
+
+
+    def add_range(self, start_ip: int, end_ip: int):
+        self |= IPv4RoaringSet.from_ranges([(start_ip, end_ip)])
+
+
+    def add_block(self, network: int, prefix_len: int):
+        self |= IPv4RoaringSet.from_blocks([(network, prefix_len)])
+
+
+    def __contains__(self, ip_addr: int) -> bool:
+        key = ip_addr >> 16
+        index = bisect_left(self._keys, key)
+        return index < len(self._keys) and self._keys[index] == key and self._containers[index].contains(ip_addr & 0xFFFF)
+
+
+    def __len__(self):
+        return self._get_cumulative()[-1]
+
+
+    def __iter__(self):
+        for key, container in zip(self._keys, self._containers):
+            for value in container.to_numpy().tolist():
+                yield (key << 16) | value
+
+
+    def __eq__(self, other):
+        if not isinstance(other, IPv4RoaringSet):
+            return NotImplemented
+        return self._keys == other._keys and all(np.array_equal(first.to_numpy(), second.to_numpy())
+                                                 for first, second in zip(self._containers, other._containers))
+
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self):,} addresses in {len(self._keys):,} containers, {self.get_size_in_bytes():,} bytes>"
+
+
+    # --------- Set algebra -----------
+
+    def union(self, other: 'IPv4RoaringSet') -> 'IPv4RoaringSet':
+        return self._merge(other, "or")
+
+
+    def intersection(self, other: 'IPv4RoaringSet') -> 'IPv4RoaringSet':
+        return self._merge(other, "and")
+
+
+    def difference(self, other: 'IPv4RoaringSet') -> 'IPv4RoaringSet':
+        return self._merge(other, "sub")
+
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+
+    def __ior__(self, other: 'IPv4RoaringSet'):
+        return self._replace(self.union(other))
+
+
+    def __iand__(self, other: 'IPv4RoaringSet'):
+        return self._replace(self.intersection(other))
+
+
+    def __isub__(self, other: 'IPv4RoaringSet'):
+        return self._replace(self.difference(other))
+
+
+    def _replace(self, other: 'IPv4RoaringSet') -> 'IPv4RoaringSet':
+        '''
+        Internal function
+        '''
+        self._keys, self._containers, self._cumulative = other._keys, other._containers, other._cumulative
+        return self
+
+
+    def _merge(self, other: 'IPv4RoaringSet', operation: str) -> 'IPv4RoaringSet':
+        '''
+        Internal function
+
+        Walks both sorted key lists once. A key only one side has is copied (or dropped, depending on the operation),
+        the containers of a shared key are combined. Pairs of array containers, the bulk of a sparse set, are put
+        aside and combined all at once as uint32 arrays
+        '''
+        keep_first = operation != "and"
+        keep_second = operation == "or"
+        index, other_index = 0, 0
+        pairs = []
+        array_keys, array_firsts, array_seconds = [], [], []
+
+        while index < len(self._keys) or other_index < len(other._keys):
+            key = self._keys[index] if index < len(self._keys) else _CONTAINER_VALUES
+            other_key = other._keys[other_index] if other_index < len(other._keys) else _CONTAINER_VALUES
+
+            if key == other_key:
+                first, second = self._containers[index], other._containers[other_index]
+                if first.kind == "array" and second.kind == "array":
+                    array_keys.append(key)
+                    array_firsts.append(first)
+                    array_seconds.append(second)
+                    container = None
+                else:
+                    container = _combine(first, second, operation)
+                index += 1
+                other_index += 1
+            elif key < other_key:
+                container = self._containers[index].copy() if keep_first else None
+                index += 1
+            else:
+                key = other_key
+                container = other._containers[other_index].copy() if keep_second else None
+                other_index += 1
+
+            if container is not None:
+                pairs.append((key, container))
+
+        result = IPv4RoaringSet()
+        if array_keys:
+            first, second = _join_arrays(array_keys, array_firsts), _join_arrays(array_keys, array_seconds)
+            if operation == "or":
+                result._build(_sorted_unique(np.concatenate((first, second))))
+            elif operation == "and":
+                result._build(first[np.isin(first, second, assume_unique=True)])
+            else:
+                result._build(first[np.isin(first, second, assume_unique=True, invert=True)])
+            pairs.extend(zip(result._keys, result._containers))
+            pairs.sort(key=lambda pair: pair[0])
+
+        result._keys = [key for key, _ in pairs]
+        result._containers = [container for _, container in pairs]
+        return result
+
+
+    # --------- Rank and select -----------
+
+    def rank(self, ip_addr: int) -> int:
+        '''
+        Returns how many addresses of the set are smaller than or equal to ip_addr
+        '''
+        cumulative = self._get_cumulative()
+        key = ip_addr >> 16
+        index = bisect_right(self._keys, key)
+        if index and self._keys[index - 1] == key:
+            return cumulative[index - 1] + self._containers[index - 1].rank(ip_addr & 0xFFFF)
+        return cumulative[index]
+
+
+    def select(self, index: int) -> int:
+        '''
+        Returns the address at position index (0 based) of the sorted set, so select(rank(ip) - 1) == ip for members
+        '''
+        cumulative = self._get_cumulative()
+        if not 0 <= index < cumulative[-1]:
+            raise IndexError("IPv4RoaringSet index out of range")
+
+        container_index = bisect_right(cumulative, index) - 1
+        value = self._containers[container_index].select(index - cumulative[container_index])
+        return (self._keys[container_index] << 16) | value
+
+
+    def count_in_range(self, start_ip: int, end_ip: int) -> int:
+        '''
+        Returns how many addresses of the set are between start_ip and end_ip (both included)
+        '''
+        if start_ip > end_ip:
+            return 0
+        return self.rank(end_ip) - (self.rank(start_ip - 1) if start_ip else 0)
+
+
+    def count_in_block(self, network: int, prefix_len: int) -> int:
+        '''
+        Returns how many addresses of the set are in <network>/<prefix_len>
+        '''
+        return self.count_in_range(IPv4Utility._get_network_ip(network, prefix_len), IPv4Utility._get_broadcast_ip(network, prefix_len))
+
+
+    def _get_cumulative(self) -> list:
+        '''
+        Internal function
+
+        Returns the number of addresses before each container (and the total last), rebuilt after a change
+        '''
+        if self._cumulative is None:
+            self._cumulative = [0]
+            for container in self._containers:
+                self._cumulative.append(self._cumulative[-1] + container.cardinality)
+        return self._cumulative
+
+
+    # --------- Output -----------
+
+    def iter_ranges(self):
+        '''
+        Yields the (start_ip, end_ip) ranges of consecutive addresses in the set, in order
+        '''
+        pending = None
+        for key, container in zip(self._keys, self._containers):
+            for start, last in container.iter_runs():
+                start_ip, end_ip = (key << 16) | start, (key << 16) | last
+                if pending is not None and pending[1] + 1 == start_ip:
+                    pending = (pending[0], end_ip)
+                    continue
+                if pending is not None:
+                    yield pending
+                pending = (start_ip, end_ip)
+
+        if pending is not None:
+            yield pending
+
+
+    def iter_blocks(self):
+        '''
+        Yields the fewest (network, prefix_len) CIDR blocks covering exactly the set
+        '''
+        return IPv4Utility._iter_blocks_from_ip_ranges(self.iter_ranges())
+
+
+    def to_cidr_blocks(self) -> list:
+        return [IPv4Utility._format_cidr_block(network, prefix_len) for network, prefix_len in self.iter_blocks()]
+
+
+    def to_array(self) -> np.ndarray:
+        '''
+        Returns the sorted addresses as a uint32 array
+        '''
+        if not self._keys:
+            return np.zeros(0, dtype=np.uint32)
+        return np.concatenate([(np.uint32(key) << np.uint32(16)) | container.to_numpy().astype(np.uint32)
+                               for key, container in zip(self._keys, self._containers)])
+
+
+    def get_size_in_bytes(self) -> int:
+        '''
+        Returns the bytes used by the container payloads and their 2 byte keys
+        '''
+        return sum(container.nbytes for container in self._containers) + 2 * len(self._keys)
+
+
+    def get_container_counts(self) -> dict:
+        counts = {"array": 0, "bitmap": 0, "run": 0}
+        for container in self._containers:
+            counts[container.kind] += 1
+        return counts
+
+
+
+def _get_int_set_size(addresses: set) -> int:
+    '''
+    Internal function
+
+    Returns the bytes used by a Python set of ints and the ints themselves
+    '''
+    return sys.getsizeof(addresses) + sum(sys.getsizeof(address) for address in addresses)
+
+
+def _benchmark(count: int = 1_000_000):
+    rng = np.random.default_rng(0)
+    samples = {
+        "sparse": rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32),
+        "dense": (np.uint32(0x0A000000) + rng.integers(0, 1 << 20, size=count, dtype=np.uint32)),
+        "blocks": IPv4RoaringSet.from_blocks((int(network) << 8, 24) for network in rng.choice(1 << 24, count >> 8, replace=False)).to_array(),
+    }
+
+    for name, addresses in samples.items():
+        # Half of the addresses, half of those moved to the neighbouring /24
+        other_addresses = addresses[rng.random(addresses.size) < 0.5]
+        other_addresses ^= rng.integers(0, 2, other_addresses.size, dtype=np.uint32) << np.uint32(8)
+        python_set, python_other = set(addresses.tolist()), set(other_addresses.tolist())
+
+        start = time.perf_counter()
+        roaring, roaring_other = IPv4RoaringSet(addresses), IPv4RoaringSet(other_addresses)
+        build_time = time.perf_counter() - start
+
+        timings = []
+        for operation in ("union", "intersection", "difference"):
+            start = time.perf_counter()
+            expected = getattr(python_set, operation)(python_other)
+            python_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = getattr(roaring, operation)(roaring_other)
+            roaring_time = time.perf_counter() - start
+
+            assert(np.array_equal(result.to_array(), np.array(sorted(expected), dtype=np.uint32)))
+            timings.append(f"{operation} {python_time * 1000:.0f} / {roaring_time * 1000:.0f} ms")
+
+        probes = rng.choice(addresses, 10_000).tolist()
+        start = time.perf_counter()
+        for probe in probes:
+            assert(roaring.select(roaring.rank(probe) - 1) == probe)
+        rank_time = time.perf_counter() - start
+
+        print(f"{name}: {len(roaring):,} addresses {roaring.get_container_counts()}")
+        print(f"  size: set {_get_int_set_size(python_set):,} bytes, roaring {roaring.get_size_in_bytes():,} bytes"
+              f" ({roaring.get_size_in_bytes() / len(roaring):.2f} per address), built in {build_time * 1000:.0f} ms")
+        print(f"  set / roaring: {', '.join(timings)}")
+        print(f"  rank + select: {len(probes) / rank_time:,.0f} per second")
+
+
+# Run from the Version-3 directory: python -m imports.ip_roaring
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,161 @@
+from collections.abc import Sequence
+
+try:
+    from imports.ip_constants import IPv4Utility
+except ImportError:
+    # Imported by the flat import modules (inputframe.py), which run with imports/ itself on the path
+    from ip_constants import IPv4Utility
+
+
+class IPv4HostSequence(Sequence):
+    '''
+    The addresses of a <network>/<prefix_len> block as a lazy sequence of ints.
+
+    Backed by a range built from the block's IPv4CIDRInfo masks, so len, indexing, slicing,
+    "in" and index (reverse lookup) are all O(1) and no address is created until it is asked for.
+    By default only the usable hosts are included (none for /31 and /32, like IPv4CIDRInfo.num_hosts)
+    '''
+    def __init__(self, network: int, prefix_len: int, usable_only: bool = True):
+        cidr_info = IPv4Utility._CIDR_INFO[prefix_len]
+        self.network = network & cidr_info.netmask.numeric
+        self.broadcast = self.network | cidr_info.wildcard.numeric
+        self.prefix_len = prefix_len
+        self.usable_only = usable_only
+
+        if not usable_only:
+            self._addresses = range(self.network, self.broadcast + 1)
+        elif cidr_info.num_hosts:
+            self._addresses = range(self.network + 1, self.broadcast)
+        else:
+            self._addresses = range(0)
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def __getitem__(self, index):
+        '''
+        An int index returns the address, a slice returns a range of addresses (still lazy)
+        '''
+        return self._addresses[index]
+
+    def __contains__(self, ip_addr):
+        return ip_addr in self._addresses
+
+    def __iter__(self):
+        return iter(self._addresses)
+
+    def __reversed__(self):
+        return reversed(self._addresses)
+
+    def index(self, ip_addr, start=0, stop=None):
+        '''
+        Returns the position of ip_addr in the sequence, raises ValueError if it is not part of it
+        '''
+        index = self._addresses.index(ip_addr)
+        if index < start or (stop is not None and index >= stop):
+            raise ValueError(f"{ip_addr} is not in the given part of the sequence")
+        return index
+
+    def count(self, ip_addr):
+        return int(ip_addr in self._addresses)
+
+    def __repr__(self):
+        hosts = "usable hosts" if self.usable_only else "addresses"
+        return f"<{type(self).__name__} {hosts} of {IPv4Utility._format_cidr_block(self.network, self.prefix_len)}>"
+
+
+
+class IPv4SubnetSequence(Sequence):
+    '''
+    The /<subnet_prefix_len> subnets of a <network>/<prefix_len> block as a lazy sequence of
+    (network, subnet_prefix_len) tuples, in address order.
+
+    Subnet networks are a stepped range (the step is the subnet size from IPv4CIDRInfo), so len,
+    indexing, slicing, "in", index and find (the subnet an address falls in) are all O(1).
+    Splitting a /8 into /30s does not build 4M entries
+    '''
+    def __init__(self, network: int, prefix_len: int, subnet_prefix_len: int):
+        assert(0 <= prefix_len <= subnet_prefix_len <= 32)
+        cidr_info = IPv4Utility._CIDR_INFO[prefix_len]
+        subnet_info = IPv4Utility._CIDR_INFO[subnet_prefix_len]
+
+        self.network = network & cidr_info.netmask.numeric
+        self.broadcast = self.network | cidr_info.wildcard.numeric
+        self.prefix_len = prefix_len
+        self.subnet_prefix_len = subnet_prefix_len
+        self._networks = range(self.network, self.broadcast + 1, subnet_info.num_addresses)
+
+    @classmethod
+    def _from_networks(cls, parent, networks: range):
+        '''
+        Internal function
+
+        Builds the view returned by slicing, sharing the parent block and subnet size
+        '''
+        view = cls.__new__(cls)
+        view.network = parent.network
+        view.broadcast = parent.broadcast
+        view.prefix_len = parent.prefix_len
+        view.subnet_prefix_len = parent.subnet_prefix_len
+        view._networks = networks
+        return view
+
+    def __len__(self):
+        return len(self._networks)
+
+    def __getitem__(self, index):
+        '''
+        An int index returns a (network, subnet_prefix_len) tuple, a slice returns a lazy view
+        '''
+        if isinstance(index, slice):
+            return IPv4SubnetSequence._from_networks(self, self._networks[index])
+        return (self._networks[index], self.subnet_prefix_len)
+
+    def __contains__(self, subnet):
+        try:
+            network, prefix_len = subnet
+        except (TypeError, ValueError):
+            return False
+        return prefix_len == self.subnet_prefix_len and network in self._networks
+
+    def __iter__(self):
+        subnet_prefix_len = self.subnet_prefix_len
+        return ((network, subnet_prefix_len) for network in self._networks)
+
+    def __reversed__(self):
+        subnet_prefix_len = self.subnet_prefix_len
+        return ((network, subnet_prefix_len) for network in reversed(self._networks))
+
+    def index(self, subnet, start=0, stop=None):
+        '''
+        Returns the position of a (network, subnet_prefix_len) tuple, raises ValueError if it is not part of the sequence
+        '''
+        if subnet not in self:
+            raise ValueError(f"{subnet} is not in the sequence")
+
+        index = self._networks.index(subnet[0])
+        if index < start or (stop is not None and index >= stop):
+            raise ValueError(f"{subnet} is not in the given part of the sequence")
+        return index
+
+    def count(self, subnet):
+        return int(subnet in self)
+
+    def find(self, ip_addr: int) -> int:
+        '''
+        Returns the position of the subnet which contains ip_addr, or -1 if no subnet in the sequence does
+        '''
+        subnet_network = IPv4Utility._get_network_ip(ip_addr, self.subnet_prefix_len)
+        if subnet_network not in self._networks:
+            return -1
+        return self._networks.index(subnet_network)
+
+    def hosts(self, index: int, usable_only: bool = True) -> IPv4HostSequence:
+        '''
+        Returns the host addresses of the subnet at index
+        '''
+        return IPv4HostSequence(self._networks[index], self.subnet_prefix_len, usable_only)
+
+    def __repr__(self):
+        return (f"<{type(self).__name__} /{self.subnet_prefix_len} subnets of "
+                f"{IPv4Utility._format_cidr_block(self.network, self.prefix_len)} ({len(self)})>")
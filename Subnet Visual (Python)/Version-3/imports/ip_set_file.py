@@ -0,0 +1,221 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from imports.ip_batch import IPv4BatchUtility
+from imports.ip_bulk_io import IPv4BulkIO
+
+
+class IPv4SetFile:
+    '''
+    A sorted set of IPv4 addresses in a compact binary file, queried straight from a memory map.
+
+    Layout (little endian, every section 4 byte aligned):
+        header      magic b"IP4S", version (uint16), reserved (uint16), /16 index entries (uint32), addresses (uint64)
+        index keys  uint32 per /16 which holds at least one address (the upper 16 bits), sorted
+        index start uint32 per /16, position of its first address
+        addresses   uint32 per address, sorted and unique
+
+    Opening only maps the file and casts memoryviews over the sections, nothing is read or copied, so it
+    takes the same time for any size of set. A query first finds the /16 of the address in the small
+    index, then runs a binary search over the addresses of that /16 only
+    '''
+    MAGIC = b"IP4S"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHIQ")
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("IPv4SetFile is little endian and memoryview.cast uses the native byte order")
+
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < self._HEADER.size:
+                raise ValueError(f"{path} is not an IPv4 set file")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, index_count, count = self._HEADER.unpack_from(self._mmap)
+        index_end = self._HEADER.size + 8 * index_count
+        if magic != self.MAGIC or version != self.VERSION or size != index_end + 4 * count:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {self.VERSION} IPv4 set file")
+
+        self._view = memoryview(self._mmap)
+        self._keys = self._view[self._HEADER.size:self._HEADER.size + 4 * index_count].cast('I')
+        self._starts = self._view[self._HEADER.size + 4 * index_count:index_end].cast('I')
+        self._addresses = self._view[index_end:].cast('I')
+
+
+    @classmethod
+    def write(cls, path, addresses) -> int:
+        '''
+        Writes the addresses (any iterable or array of ints, in any order, duplicates allowed) as a set file.
+        Returns the number of addresses in the set
+        '''
+        addresses = np.unique(np.asarray(addresses, dtype=np.int64).astype(np.uint32))
+        keys, starts = np.unique(addresses >> 16, return_index=True)
+
+        with open(path, "wb") as file:
+            file.write(cls._HEADER.pack(cls.MAGIC, cls.VERSION, 0, keys.size, addresses.size))
+            file.write(keys.astype("<u4").tobytes())
+            file.write(starts.astype("<u4").tobytes())
+            file.write(addresses.astype("<u4").tobytes())
+
+        return addresses.size
+
+
+    @classmethod
+    def write_from_text(cls, path, text_path) -> int:
+        '''
+        Converts a newline separated address list into a set file, skipping invalid lines.
+        Returns the number of addresses in the set
+        '''
+        with open(text_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return cls.write(path, [])
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as text:
+                result = IPv4BulkIO.parse_lines(text)
+        return cls.write(path, result.addresses[result.valid])
+
+
+    def __len__(self):
+        return len(self._addresses)
+
+
+    def __contains__(self, ip_addr: int) -> bool:
+        return self.contains(ip_addr)
+
+
+    def __iter__(self):
+        return iter(self._addresses)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        if self._mmap.closed:
+            return
+
+        for view in (self._keys, self._starts, self._addresses, self._view):
+            view.release()
+        self._mmap.close()
+
+
+    def contains(self, ip_addr: int) -> bool:
+        position = self._get_position(ip_addr)
+        return position < len(self._addresses) and self._addresses[position] == ip_addr
+
+
+    def count_in_block(self, network: int, prefix_len: int) -> int:
+        '''
+        Returns how many addresses of the set are in <network>/<prefix_len>
+        '''
+        assert(0 <= prefix_len <= 32)
+        start_ip = network & int(IPv4BatchUtility._NETMASKS[prefix_len])
+        end_ip = network | int(IPv4BatchUtility._WILDCARDS[prefix_len])
+        return self.count_in_range(start_ip, end_ip)
+
+
+    def count_in_range(self, start_ip: int, end_ip: int) -> int:
+        '''
+        Returns how many addresses of the set are between start_ip and end_ip (both included)
+        '''
+        if start_ip > end_ip:
+            return 0
+        return self._get_position(end_ip, right=True) - self._get_position(start_ip)
+
+
+    def iter_range(self, start_ip: int, end_ip: int):
+        '''
+        Yields the addresses of the set from start_ip to end_ip (both included) in order
+        '''
+        if start_ip > end_ip:
+            return
+        yield from self._addresses[self._get_position(start_ip):self._get_position(end_ip, right=True)]
+
+
+    def to_array(self) -> np.ndarray:
+        '''
+        Returns the addresses as a read only uint32 array over the map (no copy). close() fails while it is alive
+        '''
+        return np.frombuffer(self._addresses, dtype=np.uint32)
+
+
+    def _get_position(self, ip_addr: int, right: bool = False) -> int:
+        '''
+        Internal function
+
+        Returns where ip_addr is (or would be inserted) in the sorted addresses, after any equal address if right.
+        The index narrows the binary search down to the addresses of one /16
+        '''
+        assert(0 <= ip_addr <= 0xFFFFFFFF)
+        key = ip_addr >> 16
+        index = bisect_left(self._keys, key)
+        if index == len(self._keys):
+            return len(self._addresses)
+        if self._keys[index] != key:
+            return self._starts[index]
+
+        start = self._starts[index]
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else len(self._addresses)
+        search = bisect_right if right else bisect_left
+        return search(self._addresses, ip_addr, start, end)
+
+
+
+def _benchmark(count: int = 5_000_000, queries: int = 200_000):
+    rng = np.random.default_rng(0)
+    addresses = rng.integers(0, 1 << 32, size=count, dtype=np.uint64).astype(np.uint32)
+    probes = np.concatenate([addresses[:queries // 2], rng.integers(0, 1 << 32, size=queries // 2, dtype=np.uint64)]).tolist()
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, "addresses.txt")
+        set_path = os.path.join(directory, "addresses.ip4s")
+        with open(text_path, "wb") as file:
+            IPv4BulkIO.write_lines(addresses, file)
+        size = IPv4SetFile.write_from_text(set_path, text_path)
+
+        start = time.perf_counter()
+        with open(text_path, "rb") as file:
+            result = IPv4BulkIO.parse_lines(file.read())
+        text_set = set(result.addresses[result.valid].tolist())
+        text_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        set_file = IPv4SetFile(set_path)
+        open_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = sum(probe in set_file for probe in probes)
+        query_time = time.perf_counter() - start
+
+        assert(found == sum(probe in text_set for probe in probes))
+        assert(len(set_file) == size == len(text_set))
+        assert(set_file.count_in_block(0, 0) == size)
+
+        print(f"{size:,} addresses, {os.path.getsize(set_path):,} bytes (text {os.path.getsize(text_path):,})")
+        print(f"parse text into a set: {text_time * 1000:10.3f} ms")
+        print(f"open set file:         {open_time * 1000:10.3f} ms")
+        print(f"contains:              {queries / query_time:10,.0f} queries/s ({found:,} found)")
+        set_file.close()
+
+
+# Run from the Version-3 directory: python -m imports.ip_set_file [text file] [set file]
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        print(f"{IPv4SetFile.write_from_text(sys.argv[2], sys.argv[1]):,} addresses written to {sys.argv[2]}")
+    else:
+        _benchmark()
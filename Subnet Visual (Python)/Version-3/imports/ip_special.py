@@ -0,0 +1,80 @@
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+
+
+def _compile_special_levels() -> (tuple, tuple):
+    '''
+    Internal function
+
+    Flattens IPv4Utility._SPECIAL_IANA_LEVELS into the list of registry blocks (most specific first)
+    and, per prefix length, a sorted array of networks with the bit of each network's block
+    '''
+    blocks = []
+    levels = []
+    for netmask, level_blocks in IPv4Utility._SPECIAL_IANA_LEVELS:
+        bit_by_network = {}
+        for network, block in level_blocks.items():
+            bit_by_network[network] = 1 << len(blocks)
+            blocks.append(block)
+
+        networks = sorted(bit_by_network)
+        levels.append((np.uint32(netmask),
+                       np.array(networks, dtype=np.uint32),
+                       np.array([bit_by_network[network] for network in networks], dtype=np.uint32)))
+
+    assert(len(blocks) <= 32)
+    return tuple(blocks), tuple(levels)
+
+
+class IPv4SpecialIndex:
+    '''
+    Bulk lookup over the IANA special-purpose registry (IPv4Utility._SPECIAL_IANA_IPS).
+
+    Every registry block gets one bit, ordered from the most specific prefix, so the blocks an
+    address is part of come back as a single uint32 bitmask. Each prefix length in the registry
+    is kept as a sorted network array and searched with one vectorized binary search per level
+    '''
+    _BLOCKS, _LEVELS = _compile_special_levels()
+
+    @classmethod
+    def get_special_masks(cls, ip_addrs) -> np.ndarray:
+        '''
+        Returns a uint32 bitmask per address of the special blocks the address is part of.
+        Bit i refers to _BLOCKS[i]
+        '''
+        ip_addrs = np.asarray(ip_addrs, dtype=np.uint32)
+        masks = np.zeros(ip_addrs.shape, dtype=np.uint32)
+
+        for netmask, networks, bits in cls._LEVELS:
+            masked = ip_addrs & netmask
+            index = np.searchsorted(networks, masked)
+            np.minimum(index, len(networks) - 1, out=index)
+            masks |= np.where(networks[index] == masked, bits[index], np.uint32(0))
+
+        return masks
+
+
+    @classmethod
+    def get_most_specific(cls, ip_addrs) -> np.ndarray:
+        '''
+        Returns the index into _BLOCKS of the most specific special block for each address,
+        or -1 when the address is not special
+        '''
+        masks = cls.get_special_masks(ip_addrs)
+        lowest = masks & (~masks + np.uint32(1))
+        found = lowest != 0
+
+        index = np.full(masks.shape, -1, dtype=np.int8)
+        index[found] = np.log2(lowest[found]).astype(np.int8)
+        return index
+
+
+    @classmethod
+    def get_special_notes(cls, mask: int) -> list:
+        '''
+        Returns the registry entries of a bitmask from get_special_masks, most specific first.
+        Matches IPv4Utility._get_special_iana_ip_notes for the same address
+        '''
+        mask = int(mask)
+        return [block for index, block in enumerate(cls._BLOCKS) if mask & (1 << index)]
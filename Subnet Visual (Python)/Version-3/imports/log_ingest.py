@@ -0,0 +1,261 @@
+import mmap
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from imports.ip_constants import IPv4Utility
+from imports.ip_special import IPv4SpecialIndex
+from imports.ip_bulk_io import IPv4BulkIO
+
+
+@dataclass
+class IPv4LogChunk:
+    '''
+    The addresses found in one chunk of a log, as columns. offsets are byte offsets into the file
+    '''
+    offsets: np.ndarray
+    addresses: np.ndarray
+    ip_class: np.ndarray
+    private: np.ndarray
+    special: np.ndarray
+
+    def __len__(self):
+        return len(self.addresses)
+
+
+@dataclass
+class IPv4LogSummary:
+    bytes_scanned: int = 0
+    addresses: int = 0
+    private: int = 0
+    by_class: np.ndarray = field(default_factory=lambda: np.zeros(len(IPv4LogIngest.CLASSES), dtype=np.int64))
+    by_special: np.ndarray = field(default_factory=lambda: np.zeros(len(IPv4SpecialIndex._BLOCKS), dtype=np.int64))
+
+    def add(self, chunk: IPv4LogChunk):
+        self.addresses += len(chunk)
+        self.private += int(np.count_nonzero(chunk.private))
+        self.by_class += np.bincount(chunk.ip_class, minlength=len(IPv4LogIngest.CLASSES))
+        special = chunk.special[chunk.special >= 0]
+        self.by_special += np.bincount(special, minlength=len(IPv4SpecialIndex._BLOCKS))
+
+
+    def __str__(self):
+        lines = [f"{self.bytes_scanned:,} bytes, {self.addresses:,} addresses, {self.private:,} private (RFC1918)"]
+        lines += [f"  class {name}: {count:,}" for name, count in zip(IPv4LogIngest.CLASSES, self.by_class.tolist())]
+        lines += [f"  {block[0]:<18} {block[1]}: {count:,}"
+                  for block, count in zip(IPv4SpecialIndex._BLOCKS, self.by_special.tolist()) if count]
+        return '\n'.join(lines)
+
+
+
+class IPv4LogIngest:
+    '''
+    Pulls every IPv4 address out of large text logs and classifies them in bulk.
+
+    The file is memory mapped and walked in chunks of chunk_size bytes, so memory stays bounded whatever the
+    size of the log. Each chunk is cut after the last byte which can not be part of an address, so no address
+    is split between two chunks. Inside a chunk the candidates are the runs of digits and dots: they are
+    gathered into one newline separated buffer and validated by IPv4BulkIO.parse_lines, then annotated
+    with the class (from IPv4Utility._get_ip_class), the RFC1918 private flag and the most specific IANA
+    special block (IPv4SpecialIndex, -1 when the address is not special)
+    '''
+    CLASSES = ('A', 'B', 'C', 'D', 'E')
+
+    _CANDIDATE = np.zeros(256, dtype=bool)
+    _CANDIDATE[list(b"0123456789.")] = True
+
+    # Index into CLASSES by first octet
+    _CLASS_BY_FIRST_OCTET = np.array([ord(IPv4Utility._get_ip_class(octet << 24)[0]) - ord('A') for octet in range(256)], dtype=np.uint8)
+
+    # 10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16 (https://datatracker.ietf.org/doc/html/rfc1918)
+    _PRIVATE_BLOCKS = ((0xFF000000, 0x0A000000), (0xFFF00000, 0xAC100000), (0xFFFF0000, 0xC0A80000))
+
+    # The shortest and longest dotted quads (0.0.0.0 and 255.255.255.255)
+    _MIN_LENGTH = 7
+    _MAX_LENGTH = 15
+
+    _DOT = ord('.')
+    _NEWLINE = ord('\n')
+
+    @classmethod
+    def iter_chunks(cls, path, chunk_size: int = 64 << 20):
+        '''
+        Yields an IPv4LogChunk for every chunk_size bytes (or so) of the file at path
+        '''
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = np.frombuffer(mapped, dtype=np.uint8)
+                try:
+                    start = 0
+                    while start < data.size:
+                        end = cls._get_chunk_end(data, start, chunk_size)
+                        yield cls.scan(data[start:end], start)
+                        start = end
+                finally:
+                    # The mmap can not be closed while an array still points into it
+                    del data
+
+
+    @classmethod
+    def summarize(cls, path, chunk_size: int = 64 << 20) -> IPv4LogSummary:
+        summary = IPv4LogSummary(bytes_scanned=os.path.getsize(path))
+        for chunk in cls.iter_chunks(path, chunk_size):
+            summary.add(chunk)
+        return summary
+
+
+    @classmethod
+    def scan(cls, data, base_offset: int = 0) -> IPv4LogChunk:
+        '''
+        Returns the classified addresses in a bytes like buffer (or uint8 array). Offsets are relative to
+        base_offset. Addresses run from digit to digit: dots around one (end of a sentence, ellipses) are not part of it
+        '''
+        data = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) else data
+        firsts, lengths = IPv4BulkIO._get_runs(cls._CANDIDATE[data])
+
+        # Runs shorter than a dotted quad stay too short once trimmed
+        long_enough = lengths >= cls._MIN_LENGTH
+        firsts = firsts[long_enough]
+        ends = firsts + lengths[long_enough]
+
+        # Trim the dots around every run, then drop the runs which can not be a dotted quad
+        dotted = np.flatnonzero((data[firsts] == cls._DOT) | (data[ends - 1] == cls._DOT))
+        if dotted.size:
+            firsts[dotted], ends[dotted] = cls._trim_dots(data, firsts[dotted], ends[dotted])
+        lengths = ends - firsts
+        keep = (lengths >= cls._MIN_LENGTH) & (lengths <= cls._MAX_LENGTH)
+        firsts = firsts[keep]
+        lengths = lengths[keep]
+
+        result = IPv4BulkIO.parse_lines(cls._gather_lines(data, firsts, lengths))
+        addresses = result.addresses[result.valid]
+
+        return IPv4LogChunk(offsets=firsts[result.valid] + base_offset,
+                            addresses=addresses,
+                            ip_class=cls._CLASS_BY_FIRST_OCTET[addresses >> 24],
+                            private=cls.get_private(addresses),
+                            special=IPv4SpecialIndex.get_most_specific(addresses))
+
+
+    @classmethod
+    def get_private(cls, addresses) -> np.ndarray:
+        '''
+        Returns which addresses are in one of the RFC1918 private blocks
+        '''
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        private = np.zeros(addresses.shape, dtype=bool)
+        for netmask, network in cls._PRIVATE_BLOCKS:
+            private |= (addresses & np.uint32(netmask)) == np.uint32(network)
+        return private
+
+
+    @classmethod
+    def _trim_dots(cls, data: np.ndarray, firsts: np.ndarray, ends: np.ndarray) -> (np.ndarray, np.ndarray):
+        '''
+        Internal function
+
+        Returns the first digit and the end of the last digit of every run, an empty run where there is no digit
+        '''
+        lengths = ends - firsts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(int(lengths.sum())) + np.repeat(firsts - offsets, lengths)
+        digit = data[positions] != cls._DOT
+
+        first_digits = np.minimum.reduceat(np.where(digit, positions, data.size), offsets)
+        last_digits = np.maximum.reduceat(np.where(digit, positions, -1), offsets)
+        no_digits = first_digits > last_digits
+        return np.where(no_digits, firsts, first_digits), np.where(no_digits, firsts, last_digits + 1)
+
+
+    @classmethod
+    def _gather_lines(cls, data: np.ndarray, firsts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        '''
+        Internal function
+
+        Copies the runs at firsts into one buffer, each followed by a newline
+        '''
+        line_ends = np.cumsum(lengths + 1)
+        out = np.full(int(line_ends[-1]) if line_ends.size else 0, cls._NEWLINE, dtype=np.uint8)
+
+        # Every byte of a run moves by the same amount, the offset between its run in data and in out
+        shift = np.repeat(firsts - (line_ends - lengths - 1), lengths)
+        destinations = np.arange(shift.size) + np.repeat(np.arange(firsts.size), lengths)
+        out[destinations] = data[destinations + shift]
+        return out
+
+
+    @classmethod
+    def _get_chunk_end(cls, data: np.ndarray, start: int, chunk_size: int) -> int:
+        '''
+        Internal function
+
+        Returns where the chunk from start ends: after the last byte within chunk_size which can not be part
+        of an address. If there is none the chunk grows until the run of digits and dots it is in ends
+        '''
+        end = start + chunk_size
+        if end >= data.size:
+            return data.size
+
+        # Look at the last few bytes first, the whole chunk only if they are all digits and dots
+        for tail_start in (max(start, end - cls._MAX_LENGTH - 1), start):
+            separators = np.flatnonzero(~cls._CANDIDATE[data[tail_start:end]])
+            if separators.size:
+                return tail_start + int(separators[-1]) + 1
+
+        while end < data.size:
+            separators = np.flatnonzero(~cls._CANDIDATE[data[end:end + chunk_size]])
+            if separators.size:
+                return end + int(separators[0]) + 1
+            end += chunk_size
+
+        return data.size
+
+
+
+def _write_sample_log(path, lines: int, seed: int = 0):
+    '''
+    Internal function
+
+    Writes a web server like access log with a random client address on every line, for the benchmark
+    '''
+    rng = np.random.default_rng(seed)
+    addresses = rng.integers(0, 1 << 32, size=lines, dtype=np.uint64).astype(np.uint32)
+    text = IPv4BulkIO.format_lines(addresses).split(b'\n')[:-1]
+    with open(path, "wb") as file:
+        for i in range(0, lines, 100_000):
+            file.write(b''.join(address + b' - - [18/Oct/2026:10:00:00 +0000] "GET /index.html HTTP/1.1" 200 5120 v1.2.3\n'
+                                for address in text[i:i + 100_000]))
+    return addresses
+
+
+def _benchmark(lines: int = 2_000_000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "access.log")
+        expected = _write_sample_log(path, lines)
+
+        start = time.perf_counter()
+        summary = IPv4LogIngest.summarize(path, chunk_size=16 << 20)
+        elapsed = time.perf_counter() - start
+
+        assert(summary.addresses == lines)
+        print(summary)
+        print(f"{summary.bytes_scanned / elapsed / (1 << 20):,.0f} MiB/s, {lines / elapsed:,.0f} addresses/s")
+
+
+# Run from the Version-3 directory: python -m imports.log_ingest [log files]
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            start = time.perf_counter()
+            summary = IPv4LogIngest.summarize(path)
+            print(f"{path}: {time.perf_counter() - start:.2f}s")
+            print(summary)
+    else:
+        _benchmark()
@@ -0,0 +1,53 @@
+import time
+
+from imports.ip_constants import IPv4Utility, IPv4PrefixTable
+
+
+def _scrub_from_scratch(ip_addr: int, prefix_len: int) -> list:
+    '''
+    Internal function
+
+    The per step work of a prefix change without the table, used as the benchmark baseline
+    '''
+    network = IPv4Utility._get_network_ip(ip_addr, prefix_len)
+    broadcast = IPv4Utility._get_broadcast_ip(ip_addr, prefix_len)
+    fields = [IPv4Utility._get_address_fields(network), IPv4Utility._get_address_fields(broadcast)]
+
+    if broadcast - network > 1:
+        fields.append(IPv4Utility._get_address_fields(network + 1))
+        fields.append(IPv4Utility._get_address_fields(broadcast - 1))
+    if broadcast < 0xFFFFFFFF:
+        fields.append(IPv4Utility._get_address_fields(broadcast + 1))
+
+    return fields
+
+
+def _benchmark(ip_addr: int = 0xC0A8010A, sweeps: int = 2000):
+    steps = sweeps * 33
+
+    start = time.perf_counter()
+    for _ in range(sweeps):
+        for prefix_len in range(33):
+            _scrub_from_scratch(ip_addr, prefix_len)
+    scratch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(sweeps):
+        IPv4PrefixTable(ip_addr)
+    build_time = time.perf_counter() - start
+
+    table = IPv4PrefixTable(ip_addr)
+    start = time.perf_counter()
+    for _ in range(sweeps):
+        for prefix_len in range(33):
+            [table.get_fields(kind, prefix_len) for kind in IPv4PrefixTable._ADDRESS_KINDS]
+    lookup_time = time.perf_counter() - start
+
+    print(f"from scratch: {scratch_time / steps * 1e6:8.2f} us per prefix step")
+    print(f"table lookup: {lookup_time / steps * 1e6:8.2f} us per prefix step")
+    print(f"table build:  {build_time / sweeps * 1e6:8.2f} us per address change")
+
+
+# Run from the Version-3 directory: python -m imports.prefix_table_benchmark
+if __name__ == "__main__":
+    _benchmark()
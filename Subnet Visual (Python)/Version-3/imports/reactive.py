@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import tkinter as tk
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class ReactiveStats:
+    writes: int = 0
+    propagations: int = 0
+    recomputes: int = 0
+
+
+class Node:
+    '''
+    A value in a ReactiveGraph. Derived nodes hold the result of func called with the values of their inputs.
+    The rank is the length of the longest path from a source, so every input of a node has a lower rank
+    '''
+    def __init__(self, graph, value=None, func=None, inputs: tuple = ()):
+        self.graph = graph
+        self.value = value
+        self.func = func
+        self.inputs = inputs
+        self.dependents = []
+        self.rank = 1 + max((node.rank for node in inputs), default=-1)
+        self.order = next(graph._order)
+
+
+    def get(self):
+        return self.value
+
+
+
+class Source(Node):
+    '''
+    A node set from outside the graph (user input, a Tk variable, ...)
+    '''
+    def set(self, value):
+        self.graph._write(self, value)
+
+
+
+class ReactiveGraph:
+    '''
+    Keeps Python side state and the values derived from it in sync with a single propagation per change.
+
+    Writing a source schedules its dependents, which are recomputed in rank order (a topological order of the graph),
+    so a node only ever sees the final values of its inputs and is recomputed at most once per propagation.
+    A node whose value did not change does not schedule its own dependents.
+    Effects are derived nodes which only update the UI: they return None and never propagate further.
+
+    Writes inside a batch() are applied together when the outermost batch exits
+    '''
+    def __init__(self):
+        self.stats = ReactiveStats()
+        self._order = itertools.count()
+        self._scheduled = []
+        self._scheduled_nodes = set()
+        self._batch_depth = 0
+        self._propagating = False
+        self._variable_sources = {}
+
+
+    def source(self, value=None) -> Source:
+        return Source(self, value)
+
+
+    def derived(self, func, *inputs: Node) -> Node:
+        '''
+        Returns a node computing func(*input values), computed right away and then every time an input changes
+        '''
+        node = Node(self, func(*(node.value for node in inputs)), func, inputs)
+        for input_node in inputs:
+            input_node.dependents.append(node)
+        return node
+
+
+    def effect(self, func, *inputs: Node) -> Node:
+        '''
+        Calls func(*input values) now and every time an input changes. func should return None
+        '''
+        return self.derived(func, *inputs)
+
+
+    def variable_source(self, variable: tk.Variable) -> Source:
+        '''
+        Returns a source mirroring a Tk variable. The same variable always gives the same source,
+        so frames sharing the variable and the graph share one trace
+        '''
+        name = str(variable)
+        if name not in self._variable_sources:
+            source = self.source(variable.get())
+            variable.trace("w", lambda *args: self._write_from_variable(source, variable))
+            self._variable_sources[name] = source
+
+        return self._variable_sources[name]
+
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+
+        if self._batch_depth == 0:
+            self._propagate()
+
+
+    def _write_from_variable(self, source: Source, variable: tk.Variable):
+        '''
+        Internal function
+
+        Trace callback of variable_source. Values Tk cannot convert (e.g. an empty IntVar) are ignored
+        '''
+        try:
+            value = variable.get()
+        except (tk.TclError, ValueError):
+            return
+
+        source.set(value)
+
+
+    def _write(self, source: Source, value):
+        '''
+        Internal function
+
+        Sets a source and schedules its dependents, propagating right away unless a batch or a propagation is running
+        '''
+        if value == source.value:
+            return
+
+        source.value = value
+        self.stats.writes += 1
+        self._schedule_dependents(source)
+        self._propagate()
+
+
+    def _schedule_dependents(self, node: Node):
+        '''
+        Internal function
+        '''
+        for dependent in node.dependents:
+            if dependent not in self._scheduled_nodes:
+                self._scheduled_nodes.add(dependent)
+                heapq.heappush(self._scheduled, (dependent.rank, dependent.order, dependent))
+
+
+    def _propagate(self):
+        '''
+        Internal function
+
+        Recomputes the scheduled nodes lowest rank first. Sources written by an effect while propagating
+        (e.g. through a Tk variable trace) are picked up by the same loop
+        '''
+        if self._batch_depth or self._propagating or not self._scheduled:
+            return
+
+        self._propagating = True
+        self.stats.propagations += 1
+        try:
+            while self._scheduled:
+                _, _, node = heapq.heappop(self._scheduled)
+                self._scheduled_nodes.discard(node)
+
+                value = node.func(*(input_node.value for input_node in node.inputs))
+                self.stats.recomputes += 1
+
+                if value != node.value:
+                    node.value = value
+                    self._schedule_dependents(node)
+        finally:
+            self._scheduled.clear()
+            self._scheduled_nodes.clear()
+            self._propagating = False
@@ -0,0 +1,70 @@
+import tkinter as tk
+from dataclasses import dataclass, replace
+
+
+@dataclass
+class ShadowWriteStats:
+    real: int = 0
+    suppressed: int = 0
+
+    def reset(self) -> 'ShadowWriteStats':
+        '''
+        Returns the counts so far and starts counting again, e.g. once per user interaction
+        '''
+        counts = replace(self)
+        self.real = 0
+        self.suppressed = 0
+        return counts
+
+
+
+class ShadowVariable:
+    '''
+    Mixin for Tk variables which keeps the value on the Python side and only writes to Tcl when it changes.
+
+    A write of the value the variable already holds is dropped before it reaches Tcl, so it does not fire
+    the variable traces or make the widgets using it redraw. get() is served from the shadow as well.
+    Only use these for variables written from Python (readonly entries, labels, ...). If a widget edits
+    the variable directly the shadow goes stale, call resync() to read the value back from Tcl
+    '''
+    stats = ShadowWriteStats()
+
+    def __init__(self, master=None, value=None, name=None):
+        super().__init__(master, value, name)
+        self.resync()
+
+
+    def _normalize(self, value):
+        return value
+
+
+    def set(self, value):
+        value = self._normalize(value)
+        if value == self._shadow:
+            ShadowVariable.stats.suppressed += 1
+            return
+
+        self._shadow = value
+        ShadowVariable.stats.real += 1
+        super().set(value)
+
+
+    def get(self):
+        return self._shadow
+
+
+    def resync(self):
+        self._shadow = self._normalize(super().get())
+
+
+
+class ShadowStringVar(ShadowVariable, tk.StringVar):
+    def _normalize(self, value):
+        # Tcl stores everything as a string, so set(0) and set('0') are the same write
+        return str(value)
+
+
+
+class ShadowIntVar(ShadowVariable, tk.IntVar):
+    def _normalize(self, value):
+        return int(value)
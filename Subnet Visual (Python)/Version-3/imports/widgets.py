@@ -186,6 +186,152 @@ class CombFrame(tk.Frame):
                 cell.grid(column = i, row = 0, sticky="NSEW")
 
 
+class CanvasCombCell:
+    '''
+    Stands in for one CombFrame cell of a CanvasCombFrame. config, cget and bind act on the cell's items,
+    and interior / interior.label refer back to the cell so code written for CombFrame cells keeps working
+    '''
+    def __init__(self, comb, index: int):
+        self.comb = comb
+        self.index = index
+        self.tag = f"cell{index}"
+
+    @property
+    def interior(self):
+        return self
+
+    @property
+    def label(self):
+        return self
+
+    def configure(self, cnf=None, **kwargs):
+        self.comb.configure_cells((self.index,), **(cnf or {}), **kwargs)
+
+    def config(self, cnf=None, **kwargs):
+        self.configure(cnf, **kwargs)
+
+    def cget(self, option):
+        return self.comb.cget_cell(self.index, option)
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.comb.canvas.tag_bind(self.tag, sequence, func, add)
+
+    def unbind(self, sequence, funcid=None):
+        self.comb.canvas.tag_unbind(self.tag, sequence, funcid)
+
+    def bbox(self, *args):
+        '''
+        Returns the (x, y, width, height) of the cell on the canvas
+        '''
+        x0, y0, x1, y1 = self.comb.canvas.coords(self.comb._background_items[self.index])
+        return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+    def winfo_rootx(self):
+        return self.comb.canvas.winfo_rootx()
+
+    def winfo_rooty(self):
+        return self.comb.canvas.winfo_rooty()
+
+    def winfo_toplevel(self):
+        return self.comb.canvas.winfo_toplevel()
+
+
+
+class CanvasCombFrame(tk.Frame):
+    '''
+    CombFrame drawn on a single canvas. Every cell is a rectangle and a text item tagged "cell<index>",
+    so a row of 8 cells is 2 widgets instead of about 30.
+
+    cells holds a CanvasCombCell per cell with the CombFrame cell API. Clicks and other events bound on a cell
+    are hit tested by the canvas, and configure_cells recolors any number of cells with one itemconfigure per item type
+    '''
+    def __init__(self,
+                 parent = None,
+                 varslist: list[tk.Variable] = None,
+                 textlist: list[str] = None,
+                 bordercolor: str = None,
+                 outerborderwidths: BorderWidths = BorderWidths(1, 1, 1, 1), # Left, Right, Top, Bottom
+                 innerborderwidth: int = 1,
+                 width: str | float = 24,
+                 height: str | float = 24,
+                 font: tuple = ('TkFixedFont', 10),
+                 foreground: str = None,
+                 background: str = None,
+                 **kwargs):
+        tk.Frame.__init__(self, parent)
+
+        if not isinstance(outerborderwidths, BorderWidths):
+            outerborderwidths = BorderWidths(*outerborderwidths)
+
+        foreground = kwargs.pop("fg", foreground)
+        background = kwargs.pop("bg", background)
+        kwargs.pop("widget", None)
+
+        values = varslist if varslist else textlist
+        width = int(width)
+        height = int(height)
+        number_of_cells = len(values)
+
+        self.canvas = tk.Canvas(self,
+                                width=outerborderwidths.left + (number_of_cells * width) + ((number_of_cells - 1) * innerborderwidth) + outerborderwidths.right,
+                                height=outerborderwidths.top + height + outerborderwidths.bottom,
+                                background=bordercolor, bd=0, highlightthickness=0)
+        self.canvas.grid(row=0, column=0, sticky="NSEW")
+
+        self.cells = []
+        self._background_items = []
+        self._text_items = []
+
+        for i in range(number_of_cells):
+            x = outerborderwidths.left + (i * (width + innerborderwidth))
+            y = outerborderwidths.top
+            tag = f"cell{i}"
+
+            self._background_items.append(self.canvas.create_rectangle(x, y, x + width, y + height, fill=background, outline="", tags=("comb_background", tag)))
+
+            text = values[i].get() if varslist else values[i]
+            self._text_items.append(self.canvas.create_text(x + (width / 2), y + (height / 2), text=text, fill=foreground, font=font,
+                                                            justify=kwargs.get("justify", tk.CENTER), tags=("comb_text", tag)))
+            self.cells.append(CanvasCombCell(self, i))
+
+            if varslist:
+                varslist[i].trace("w", lambda *args, i=i, var=varslist[i]: self.canvas.itemconfigure(self._text_items[i], text=var.get()))
+
+
+    def configure_cells(self, indices=None, **kwargs):
+        '''
+        Sets the options of several cells at once, all cells by default.
+        foreground/fg, text and font apply to the text items, background/bg to the cell rectangles
+        '''
+        if indices is None:
+            cells = ""
+        elif indices:
+            cells = "&&(" + "||".join(f"cell{i}" for i in indices) + ")"
+        else:
+            return
+
+        text_options = {option: kwargs[option] for option in ("text", "font") if option in kwargs}
+        foreground = kwargs.get("foreground", kwargs.get("fg"))
+        background = kwargs.get("background", kwargs.get("bg"))
+
+        if foreground is not None:
+            text_options["fill"] = foreground
+
+        if text_options:
+            self.canvas.itemconfigure("comb_text" + cells, **text_options)
+        if background is not None:
+            self.canvas.itemconfigure("comb_background" + cells, fill=background)
+
+
+    def cget_cell(self, index: int, option: str):
+        if option in ("background", "bg"):
+            return self.canvas.itemcget(self._background_items[index], "fill")
+        if option in ("foreground", "fg"):
+            return self.canvas.itemcget(self._text_items[index], "fill")
+        return self.canvas.itemcget(self._text_items[index], option)
+
+
+
 class LabeledEntryFrame(tk.Frame):
     def __init__(self, parent=None, label_text="Label", styles=WidgetStyle, textvariable=tk.Variable, **kwargs):
         super().__init__(parent, background=styles.background)
@@ -356,6 +502,14 @@ class PrefixLengthSlider(tk.Frame):
         self.slider_pos = tk.IntVar(value=0)
         self.is_dragging = False
 
+        # Drag events are coalesced into one update per frame (ms)
+        self.frame_delay = 16
+        self._drag_x = None
+        self._drag_job = None
+
+        # Value the canvas currently shows, so only the items whose state changed are recolored
+        self._drawn_value = None
+
         self.colors = colors
 
         self.draw_scale()
@@ -367,50 +521,47 @@ class PrefixLengthSlider(tk.Frame):
 
 
     def draw_scale(self):
+        '''
+        Creates every canvas item once. The scale segments are tagged "segment<i>", the ticks and their labels "tick<i>"
+        and the knob "knob" / "knob_text". Value changes only move and recolor these items (_update_value)
+        '''
         self.canvas.delete("all")
 
         interval = self.scale_length / self.range
+        y = self.slider_center
+
         for i in range(self.min_value, self.max_value):
-            x = (i - self.min_value) * self.scale_factor + self.padding
+            x = self._get_x(i)
+            self.canvas.create_line(x, y, x + interval, y, fill=self.colors.off_colors[i // self.major_interval], width=self.line_width, tags=f"segment{i}")
 
-            self.canvas.create_line(x, self.slider_center, x + interval, self.slider_center, fill=self.colors.off_colors[i // self.major_interval], width=self.line_width)
+        for i in range(self.min_value, self.max_value + 1):
+            x = self._get_x(i)
+            tick_y = 35
+            off_color = self.colors.off_colors[(i - 1) // self.major_interval]
 
-        if not self.slider:
-            self.slider_pos.set(self.min_value)
-            x = self.padding
-        else:
-            x = (self.slider_pos.get() - self.min_value) * self.scale_factor + self.padding
+            if i % self.major_interval == 0:
+                self.canvas.create_line(x, tick_y - self.major_tick_length, x, tick_y, fill=off_color, tags=f"tick{i}")
+                self.canvas.create_text(x, tick_y - (20 + self.major_tick_length), text=str(i), font=('TkFixedFont', 10), anchor="n", fill=off_color, tags=f"tick{i}")
+            elif i % self.minor_interval == 0:
+                self.canvas.create_line(x, tick_y - self.minor_tick_length, x, tick_y, fill=off_color, tags=f"tick{i}")
 
-        y = self.slider_center
-        current_color = self.colors.on_colors[(self.slider_pos.get() - 1) // self.major_interval]
-        y_min = y - (self.line_width / 2)
-        y_max = y + (self.line_width / 2)
+        x = self._get_x(self.slider_pos.get())
+        self.slider = self.canvas.create_oval(x - self.slider_radius, y - self.slider_radius,
+                                              x + self.slider_radius, y + self.slider_radius,
+                                              fill=self.colors.slider_color, width=3, tags="knob")
+        self.canvas.create_text(x, y, font=('TkFixedFont', 10), tags="knob_text")
 
-        for i in range(self.min_value, self.max_value):
-            x_1 = (i - self.min_value) * self.scale_factor + self.padding
+        self._drawn_value = None
+        self._update_value()
 
-            if x_1 > x:
-                break
 
-            self.canvas.create_rectangle(x_1, y_min, x_1 + interval, y_max, fill=self.colors.on_colors[i // self.major_interval], outline="")
+    def _get_x(self, value):
+        return (value - self.min_value) * self.scale_factor + self.padding
 
 
-        self.slider = self.canvas.create_oval(x - self.slider_radius, y - self.slider_radius,
-                                              x + self.slider_radius, y + self.slider_radius,
-                                              fill=self.colors.slider_color, outline=current_color, width=3)
-        self.canvas.create_text(x, y, text=self.slider_pos.get(), font=('TkFixedFont', 10), fill=current_color)
-        
-        for i in range(self.min_value, self.max_value + 1):
-            x = (i - self.min_value) * self.scale_factor + self.padding
-            y = 35
-            current_color = self.colors.on_colors[(i - 1) // self.major_interval] if i == self.slider_pos.get() else self.colors.off_colors[(i - 1) // self.major_interval]
-            
-            if i % self.major_interval == 0:
-                self.canvas.create_line(x, y - self.major_tick_length, x, y, fill=current_color)
-                y -= (20 + self.major_tick_length)
-                self.canvas.create_text(x, y, text=str(i), font=('TkFixedFont', 10), anchor="n", fill=current_color)
-            elif i % self.minor_interval == 0:
-                self.canvas.create_line(x, y - self.minor_tick_length, x, y, fill=current_color)
+    def _get_value(self, x):
+        x = max(self.padding, min(x, self.max_x))
+        return int(((x - self.padding) / self.scale_factor) + self.min_value)
         
 
     def move_slider(self, event):
@@ -419,25 +570,289 @@ class PrefixLengthSlider(tk.Frame):
         if slider_coordinates[0] <= x <= slider_coordinates[2] and slider_coordinates[1] <= y <= slider_coordinates[3]:
             self.is_dragging = True
         else:
-            x = max(self.padding, min(x, self.max_x))
-            self.slider_pos.set(int(((x - self.padding) / self.scale_factor) + self.min_value))
-            self.draw_scale() 
+            self.slider_pos.set(self._get_value(x))
 
 
     def drag_slider(self, event):
         if self.is_dragging:
-            x = event.x
-            x = max(self.padding, min(x, self.max_x))
-            self.slider_pos.set(int(((x - self.padding) / self.scale_factor) + self.min_value))
-            self.draw_scale()
+            self._drag_x = event.x
+            if self._drag_job is None:
+                self._drag_job = self.after(self.frame_delay, self._apply_drag)
+
+
+    def _apply_drag(self):
+        self._drag_job = None
+        if self._drag_x is not None:
+            self.slider_pos.set(self._get_value(self._drag_x))
+            self._drag_x = None
 
 
     def stop_drag(self, event):
+        if self._drag_job is not None:
+            self.after_cancel(self._drag_job)
+            self._apply_drag()
+
         self.is_dragging = False
 
     
     def _update_value(self, *args):
-        self.draw_scale()
+        '''
+        Moves the knob and recolors the segments between the old and the new value and the two ticks which changed
+        '''
+        value = self.slider_pos.get()
+        old_value = self._drawn_value
+        if value == old_value:
+            return
+
+        self._drawn_value = value
+
+        x = self._get_x(value)
+        y = self.slider_center
+        current_color = self.colors.on_colors[(value - 1) // self.major_interval]
+
+        self.canvas.coords("knob", x - self.slider_radius, y - self.slider_radius, x + self.slider_radius, y + self.slider_radius)
+        self.canvas.itemconfigure("knob", outline=current_color)
+        self.canvas.coords("knob_text", x, y)
+        self.canvas.itemconfigure("knob_text", text=value, fill=current_color)
+
+        # Segments left of the knob are on
+        if old_value is None:
+            changed = range(self.min_value, self.max_value)
+        else:
+            changed = range(min(value, old_value), min(max(value, old_value), self.max_value))
+
+        for i in changed:
+            colors = self.colors.on_colors if i < value else self.colors.off_colors
+            self.canvas.itemconfigure(f"segment{i}", fill=colors[i // self.major_interval])
+
+        if old_value is not None:
+            self.canvas.itemconfigure(f"tick{old_value}", fill=self.colors.off_colors[(old_value - 1) // self.major_interval])
+        self.canvas.itemconfigure(f"tick{value}", fill=current_color)
+
+
+
+class VirtualListView(tk.Frame):
+    '''
+    A scrolling list on a Canvas which only materializes the rows in view.
+
+    rows is any sequence supporting len() and indexing (a range, IPv4SubnetSequence, ...) and format_row turns
+    one row into its text, so rows are computed on demand and never stored. The canvas holds a fixed pool of
+    text items, one per visible row plus one for the partially scrolled row, which are moved and relabelled
+    as the view scrolls. Row <i> always goes to item i % pool size, so scrolling by a row only relabels one item.
+    Memory and redraw cost are the same for 10 rows or 4 billion.
+
+    The scroll position is kept in pixels for smooth wheel scrolling. find_row(text) returns the index of the
+    row matching a search (or -1) and backs the search entry, jump_to() and search()
+    '''
+    def __init__(self,
+                 parent=None,
+                 rows=(),
+                 format_row=str,
+                 find_row=None,
+                 on_select=None,
+                 visible_rows: int = 10,
+                 row_height: int = 18,
+                 width: int = 200,
+                 font=('TkFixedFont', 10),
+                 foreground: str = "systemTextColor",
+                 background: str = "systemTextBackgroundColor",
+                 highlight: str = "#BD86FF",
+                 search_bar: bool = True,
+                 **kwargs):
+        super().__init__(parent, **kwargs)
+        self.rows = rows
+        self.format_row = format_row
+        self.find_row = find_row
+        self.on_select = on_select
+        self.row_height = row_height
+        self.foreground = foreground
+        self.highlight = highlight
+
+        self.selected = None
+        self._offset = 0
+        self._row_items = []
+        self._item_rows = []
+
+        self.search_text = tk.StringVar()
+        if search_bar:
+            self.search_entry = tk.Entry(self, textvariable=self.search_text, font=font, width=1)
+            self.search_entry.grid(row=0, column=0, columnspan=2, sticky="EW")
+            self.search_entry.bind("<Return>", lambda event: self.search(self.search_text.get()))
+
+        self.canvas = tk.Canvas(self, width=width, height=visible_rows * row_height, background=background, bd=0, highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="NSEW")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, sticky="NS")
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.canvas.create_rectangle(0, 0, 0, 0, fill=highlight, width=0, state=tk.HIDDEN, tags="selection")
+        self._font = font
+        self._resize_pool(visible_rows + 1)
+
+        self.canvas.bind("<Configure>", lambda event: self._resize_pool(event.height // self.row_height + 2))
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_pixels(-self.row_height))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_pixels(self.row_height))
+        self.canvas.bind("<Button-1>", self._on_click)
+
+        self._redraw()
+
+
+    def set_rows(self, rows, format_row=None, find_row=None, selected=None):
+        '''
+        Shows a new sequence of rows, scrolled to the selected row (or the top)
+        '''
+        self.rows = rows
+        if format_row is not None:
+            self.format_row = format_row
+        if find_row is not None:
+            self.find_row = find_row
+
+        self._offset = 0
+        self._item_rows = [None] * len(self._row_items)
+        self.selected = None
+        if selected is not None and 0 <= selected < len(rows):
+            self.select(selected, notify=False)
+        else:
+            self._redraw()
+
+
+    def yview(self, *args):
+        '''
+        Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" | "pages")
+        '''
+        if not args:
+            total = self._get_total_height()
+            return (self._offset / total, min(1.0, (self._offset + self._get_view_height()) / total)) if total else (0.0, 1.0)
+
+        if args[0] == tk.MOVETO:
+            self._scroll_to(int(float(args[1]) * self._get_total_height()))
+        elif args[0] == tk.SCROLL:
+            step = self._get_view_height() if args[2] == tk.PAGES else self.row_height
+            self.scroll_pixels(int(args[1]) * step)
+
+
+    def scroll_pixels(self, pixels: int):
+        self._scroll_to(self._offset + pixels)
+
+
+    def see(self, index: int):
+        '''
+        Scrolls the least amount needed to show the row at index completely
+        '''
+        top = index * self.row_height
+        bottom = top + self.row_height - self._get_view_height()
+        if top < self._offset:
+            self._scroll_to(top)
+        elif bottom > self._offset:
+            self._scroll_to(bottom)
+
+
+    def select(self, index: int, notify: bool = True):
+        '''
+        Highlights the row at index and scrolls it into view. on_select(index) is called if notify is set
+        '''
+        self.selected = index
+        self.see(index)
+        self._redraw()
+
+        if notify and self.on_select:
+            self.on_select(index)
+
+
+    def jump_to(self, text: str) -> int:
+        '''
+        Selects the row find_row returns for text, e.g. the subnet containing an address. Returns its index or -1
+        '''
+        index = self.find_row(text) if self.find_row else -1
+        if index >= 0:
+            self.select(index)
+        return index
+
+
+    def search(self, text: str) -> int:
+        '''
+        jump_to for the search entry, which turns red when nothing matches
+        '''
+        index = self.jump_to(text.strip())
+        if hasattr(self, "search_entry"):
+            self.search_entry.config(foreground=self.foreground if index >= 0 else "red")
+        return index
+
+
+    def _get_total_height(self) -> int:
+        return len(self.rows) * self.row_height
+
+
+    def _get_view_height(self) -> int:
+        return (len(self._row_items) - 1) * self.row_height
+
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, self._get_total_height() - self._get_view_height()))
+        if offset != self._offset:
+            self._offset = offset
+            self._redraw()
+
+
+    def _resize_pool(self, size: int):
+        '''
+        Internal function
+
+        Grows or shrinks the pool of row items to fit the canvas height
+        '''
+        size = max(size, 2)
+        while len(self._row_items) < size:
+            self._row_items.append(self.canvas.create_text(4, 0, anchor="nw", font=self._font, fill=self.foreground, tags="row"))
+
+        while len(self._row_items) > size:
+            self.canvas.delete(self._row_items.pop())
+
+        self._item_rows = [None] * size
+        self._scroll_to(self._offset)
+        self._redraw()
+
+
+    def _redraw(self):
+        '''
+        Internal function
+
+        Places the pool over the rows in view. Items which already show their row keep their text, only their position moves
+        '''
+        first = self._offset // self.row_height
+        shift = self._offset % self.row_height
+        count = len(self.rows)
+        size = len(self._row_items)
+
+        for index in range(first, first + size):
+            slot = index % size
+            item = self._row_items[slot]
+            if self._item_rows[slot] != index:
+                self._item_rows[slot] = index
+                self.canvas.itemconfigure(item, text=self.format_row(self.rows[index]) if index < count else "")
+            self.canvas.coords(item, 4, (index - first) * self.row_height - shift)
+
+        if self.selected is not None and first <= self.selected < first + len(self._row_items):
+            y = (self.selected - first) * self.row_height - shift
+            self.canvas.coords("selection", 0, y, self.canvas.winfo_width(), y + self.row_height)
+            self.canvas.itemconfigure("selection", state=tk.NORMAL)
+        else:
+            self.canvas.itemconfigure("selection", state=tk.HIDDEN)
+
+        self.scrollbar.set(*self.yview())
+
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas, both scroll about a row per notch
+        steps = event.delta / 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_pixels(int(-steps * self.row_height))
+
+
+    def _on_click(self, event):
+        index = (self._offset + event.y) // self.row_height
+        if index < len(self.rows):
+            self.select(index)
 
 
 
@@ -462,7 +877,7 @@ class Tooltip:
         x += self.widget.winfo_rootx() + 25
         y += self.widget.winfo_rooty() + 25
 
-        self.tooltip = tk.Toplevel(self.widget)
+        self.tooltip = tk.Toplevel(self.widget.winfo_toplevel())
         self.tooltip.wm_overrideredirect(True)
         self.tooltip.wm_geometry(f"+{x}+{y}")
 
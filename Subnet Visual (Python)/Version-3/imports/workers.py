@@ -0,0 +1,332 @@
+import itertools
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from imports.ip_constants import IPv4Utility
+
+
+class JobCancelled(Exception):
+    '''
+    Raised by JobContext.check() inside a job which was cancelled or superseded
+    '''
+    pass
+
+
+@dataclass
+class JobRunnerStats:
+    submitted: int = 0
+    delivered: int = 0
+    discarded: int = 0
+    polls: int = 0
+
+
+class Job:
+    '''
+    One submission to a TkJobRunner. Jobs share a key (e.g. "subnets") when a newer one replaces an older one:
+    submitting a job cancels the running job with the same key, and anything the older job still sends is discarded
+    '''
+    def __init__(self, key, generation: int, on_result=None, on_progress=None, on_error=None):
+        self.key = key
+        self.generation = generation
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.futures = []
+        self.failed = False
+        self._cancel_event = threading.Event()
+
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+
+    def cancel(self):
+        '''
+        Asks the job to stop. Chunks which have not started yet are dropped, running thread jobs stop at their next check()
+        '''
+        self._cancel_event.set()
+        for future in self.futures:
+            future.cancel()
+
+
+    def fail(self):
+        '''
+        Drops the chunks which have not started yet after one of them raised. Unlike cancel(),
+        the job stays current so the error still reaches on_error
+        '''
+        self.failed = True
+        for future in self.futures:
+            future.cancel()
+
+
+    def __repr__(self):
+        state = "cancelled" if self.cancelled else "failed" if self.failed else "active"
+        return f"<{type(self).__name__} {self.key!r} #{self.generation} {state}>"
+
+
+
+class JobContext:
+    '''
+    Passed as the first argument to thread jobs, to report progress and notice cancellation from the worker thread
+    '''
+    def __init__(self, runner, job: Job):
+        self._runner = runner
+        self._job = job
+
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job.cancelled
+
+
+    def check(self):
+        '''
+        Raises JobCancelled if the job was cancelled, call it regularly in long loops
+        '''
+        if self._job.cancelled:
+            raise JobCancelled()
+
+
+    def progress(self, done: int, total: int):
+        '''
+        Reports progress to the job's on_progress. Cheap to call often, only the latest report per poll reaches Tk
+        '''
+        self._runner._post(self._job, "progress", (done, total))
+
+
+
+class TkJobRunner:
+    '''
+    Runs computations off the Tk mainloop and hands their results back to it.
+
+    Tk may only be used from the thread running the mainloop, so workers never call back directly:
+    they put (job, kind, payload) messages on a queue which the mainloop drains every poll_interval ms
+    with after(). Polling only runs while jobs are outstanding.
+
+    submit() runs func(context, *args) on a thread pool, for work which checks for cancellation and reports progress itself.
+    submit_chunks() runs func(*chunk) for every chunk on a process pool (created on first use), for CPU bound work
+    which the GIL would otherwise serialize. Progress is the number of finished chunks and cancelling drops pending chunks.
+
+    Callbacks (on_result, on_progress, on_error) always run on the mainloop, and only for the newest job of a key
+    '''
+    def __init__(self, widget: tk.Misc, max_threads: int = None, max_processes: int = None, poll_interval: int = 20):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.max_processes = max_processes
+        self.stats = JobRunnerStats()
+
+        self._threads = ThreadPoolExecutor(max_threads, thread_name_prefix="TkJobRunner")
+        self._processes = None
+        self._queue = queue.SimpleQueue()
+        self._jobs = {}
+        self._generation = itertools.count(1)
+        self._poll_job = None
+
+
+    def submit(self, key, func, *args, on_result=None, on_progress=None, on_error=None) -> Job:
+        '''
+        Runs func(context, *args) on the thread pool, replacing any job with the same key.
+        on_result(result), on_progress(done, total) and on_error(exception) are called on the mainloop
+        '''
+        job = self._new_job(key, on_result, on_progress, on_error)
+        job.futures.append(self._threads.submit(self._run_thread_job, job, func, args))
+        return job
+
+
+    def submit_chunks(self, key, func, chunks, combine=None, on_result=None, on_progress=None, on_error=None) -> Job:
+        '''
+        Runs func(*chunk) for every chunk on the process pool, replacing any job with the same key.
+        func and the chunks must be picklable (func defined at module level).
+        on_result gets combine(results) with the results in chunk order, the list of results if combine is None
+        '''
+        job = self._new_job(key, on_result, on_progress, on_error)
+        chunks = list(chunks)
+        results = [None] * len(chunks)
+        remaining = [len(chunks)]
+        lock = threading.Lock()
+
+        if not chunks:
+            self._post(job, "result", combine(results) if combine else results)
+            return job
+
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(self.max_processes)
+
+        def chunk_done(future, index):
+            # Called from the pool's management thread, so it only touches the job and the queue
+            if future.cancelled() or job.cancelled or job.failed:
+                return
+
+            error = future.exception()
+            if error is not None:
+                with lock:
+                    if job.failed:
+                        return
+                    job.fail()
+                self._post(job, "error", error)
+                return
+
+            with lock:
+                results[index] = future.result()
+                remaining[0] -= 1
+                done = len(chunks) - remaining[0]
+
+            self._post(job, "progress", (done, len(chunks)))
+            if done == len(chunks):
+                try:
+                    self._post(job, "result", combine(results) if combine else results)
+                except Exception as error:
+                    self._post(job, "error", error)
+
+        for index, chunk in enumerate(chunks):
+            future = self._processes.submit(func, *chunk)
+            job.futures.append(future)
+            future.add_done_callback(lambda future, index=index: chunk_done(future, index))
+
+        return job
+
+
+    def cancel(self, key):
+        '''
+        Cancels the job with this key, if any. Its callbacks are not called anymore
+        '''
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+
+    def shutdown(self):
+        '''
+        Cancels every job and stops the pools, e.g. from the window's WM_DELETE_WINDOW handler
+        '''
+        for key in list(self._jobs):
+            self.cancel(key)
+
+        if self._poll_job is not None:
+            self.widget.after_cancel(self._poll_job)
+            self._poll_job = None
+
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+    def _new_job(self, key, on_result, on_progress, on_error) -> Job:
+        '''
+        Internal function
+
+        Cancels the job the new one supersedes and makes sure the queue is being polled
+        '''
+        self.cancel(key)
+
+        job = Job(key, next(self._generation), on_result, on_progress, on_error)
+        self._jobs[key] = job
+        self.stats.submitted += 1
+
+        if self._poll_job is None:
+            self._poll_job = self.widget.after(self.poll_interval, self._poll)
+
+        return job
+
+
+    def _run_thread_job(self, job: Job, func, args):
+        '''
+        Internal function
+
+        Runs on a worker thread
+        '''
+        if job.cancelled:
+            return
+
+        try:
+            result = func(JobContext(self, job), *args)
+        except JobCancelled:
+            return
+        except Exception as error:
+            self._post(job, "error", error)
+            return
+
+        self._post(job, "result", result)
+
+
+    def _post(self, job: Job, kind: str, payload):
+        '''
+        Internal function
+
+        Thread safe, the message is delivered on the next poll
+        '''
+        self._queue.put((job, kind, payload))
+
+
+    def _is_current(self, job: Job) -> bool:
+        '''
+        Internal function
+        '''
+        return not job.cancelled and self._jobs.get(job.key) is job
+
+
+    def _poll(self):
+        '''
+        Internal function
+
+        Drains the queue on the mainloop. Progress is coalesced to the latest report of each job,
+        messages from cancelled or superseded jobs are dropped
+        '''
+        self._poll_job = None
+        self.stats.polls += 1
+
+        messages = []
+        while True:
+            try:
+                messages.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        latest_progress = {}
+        for job, kind, payload in messages:
+            if kind == "progress":
+                latest_progress[job] = payload
+
+        for job, kind, payload in messages:
+            if not self._is_current(job):
+                self.stats.discarded += 1
+                continue
+
+            if kind == "progress":
+                progress = latest_progress.pop(job, None)
+                if progress is not None and job.on_progress:
+                    job.on_progress(*progress)
+                continue
+
+            # A job ends with its result or its error
+            del self._jobs[job.key]
+            self.stats.delivered += 1
+            callback = job.on_result if kind == "result" else job.on_error
+            if callback:
+                callback(payload)
+
+        # A callback which submitted a job has already scheduled the next poll
+        if self._jobs and self._poll_job is None:
+            self._poll_job = self.widget.after(self.poll_interval, self._poll)
+
+
+
+# --------- Jobs -----------
+
+def ip_ranges_to_blocks_job(context: JobContext, ip_ranges) -> list:
+    '''
+    Thread job returning the CIDR blocks (as strings) covering every (start_ip, end_ip) range, in order
+    '''
+    ip_ranges = list(ip_ranges)
+    blocks = []
+
+    for done, (start_ip, end_ip) in enumerate(ip_ranges, 1):
+        context.check()
+        blocks.extend(IPv4Utility._get_blocks_from_ip_range(start_ip, end_ip))
+        context.progress(done, len(ip_ranges))
+
+    return blocks
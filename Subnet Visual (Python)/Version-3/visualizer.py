@@ -6,6 +6,8 @@ from imports.widgets import *
 from imports.ip_fields_dataclasses import *
 from imports.input_handler import *
 from imports.ip_constants import *
+from imports.shadow_vars import *
+from imports.workers import TkJobRunner
 
 _BACKGROUND = "#212121"
 _TEXT = "#FFFFFF"
@@ -18,6 +20,10 @@ class CIDRVisualizer(tk.Tk):
         self.title("CIDR Visualizer")
         self.geometry(_ROOT_GEOMETRY)
 
+        # Range to block decompositions run here so they never block the mainloop
+        self.jobs = TkJobRunner(self)
+        self.protocol("WM_DELETE_WINDOW", self._close)
+
         self.fields = IPv4SummaryFields(
             ip=self._init_ip_fields(),
             netmask=self._init_ip_fields(),
@@ -33,12 +39,12 @@ class CIDRVisualizer(tk.Tk):
                                             special_notes=[]
                                             ),
 
-            block=IPv4SummaryBlockFields(cidr_notation=tk.StringVar(),
-                                         network_bits=tk.IntVar(),
-                                         host_bits=tk.IntVar(value=32),
-                                         total_addresses=tk.IntVar(),
-                                         usable_hosts=tk.IntVar(),
-                                         mask_map=[tk.StringVar(value='H') for _ in range(32)]
+            block=IPv4SummaryBlockFields(cidr_notation=ShadowStringVar(),
+                                         network_bits=ShadowIntVar(),
+                                         host_bits=ShadowIntVar(value=32),
+                                         total_addresses=ShadowIntVar(),
+                                         usable_hosts=ShadowIntVar(),
+                                         mask_map=[ShadowStringVar(value='H') for _ in range(32)]
                                          ),
 
             subnet=IPv4SubnetFields(prefix_length=tk.StringVar(),
@@ -49,7 +55,7 @@ class CIDRVisualizer(tk.Tk):
                                     subnet_map=[tk.StringVar(value='H') for _ in range(32)]
                                     )
         )
-        self.input_frame = InputHandler(self)
+        self.input_frame = InputHandler(self, self.jobs)
         self.input_frame.grid(row=0, column=0, sticky="NSEW")
         
         # self.update()
@@ -60,15 +66,21 @@ class CIDRVisualizer(tk.Tk):
         self.mainloop()
         
 
+    def _close(self):
+        self.jobs.shutdown()
+        self.destroy()
+
+
     def _init_ip_fields(self):
+        # Summary fields are only written from Python, so unchanged values are not written to Tcl again
         return IPv4SummaryAddressFields(
-            dotted_decimal=tk.StringVar(value='0.0.0.0'),
-            dotted_binary=tk.StringVar(value='00000000.00000000.00000000.00000000'),
-            dotted_hex=tk.StringVar(value='00.00.00.00'),
-            numeric=tk.StringVar(value=0),
-            binary_bits=[tk.StringVar(value=0) for _ in range(32)],
-            decimal_octets=[tk.StringVar(value=0) for _ in range(4)],
-            hex_octets=[tk.StringVar(value='00') for _ in range(4)]
+            dotted_decimal=ShadowStringVar(value='0.0.0.0'),
+            dotted_binary=ShadowStringVar(value='00000000.00000000.00000000.00000000'),
+            dotted_hex=ShadowStringVar(value='00.00.00.00'),
+            numeric=ShadowStringVar(value=0),
+            binary_bits=[ShadowStringVar(value=0) for _ in range(32)],
+            decimal_octets=[ShadowStringVar(value=0) for _ in range(4)],
+            hex_octets=[ShadowStringVar(value='00') for _ in range(4)]
         )
 
 if __name__ == "__main__":